@@ -1,7 +1,11 @@
+from collections import OrderedDict
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Dict, Optional
+import hmac
+import ipaddress
+import time
 
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Request, status
 from jose import JWTError, jwt
 from fastapi.security import OAuth2PasswordBearer
 from backend.config import Settings
@@ -11,11 +15,63 @@ from backend.models import Token, TokenData, UserInDB
 # Token endpoint is no longer used for password login, but kept for OAuth2 compatibility
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/token")
 
+class UserCache:
+    """
+    Short-lived, bounded LRU cache of users keyed by email (the token subject), so
+    protected routes don't read the user document on every request. Routes that
+    update a user invalidate it; other workers see the update once the TTL expires.
+    """
+
+    def __init__(self, cache_size: int = Settings.USER_CACHE_SIZE, ttl: float = Settings.USER_CACHE_TTL):
+        self.cache_size = cache_size
+        self.ttl = ttl
+        # email -> (expires at, user)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, email: str) -> Optional[UserInDB]:
+        entry = self._cache.get(email)
+        if entry is None or entry[0] <= time.monotonic():
+            if entry is not None:
+                del self._cache[email]
+            self.misses += 1
+            return None
+        self._cache.move_to_end(email)
+        self.hits += 1
+        return entry[1]
+
+    def set(self, email: str, user: UserInDB) -> None:
+        self._cache[email] = (time.monotonic() + self.ttl, user)
+        self._cache.move_to_end(email)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def invalidate(self, email: str) -> None:
+        self._cache.pop(email, None)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached": len(self._cache),
+        }
+
+# Create singleton instance
+user_cache = UserCache()
+
 async def get_user(email: str) -> Optional[UserInDB]:
+    user = user_cache.get(email)
+    if user is not None:
+        return user
     user_dict = await user_collection.find_one({"email": email})
     if user_dict:
         user_dict['id'] = str(user_dict['_id'])
-        return UserInDB(**user_dict)
+        user = UserInDB(**user_dict)
+        user_cache.set(email, user)
+        return user
     return None
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None) -> str:
@@ -51,4 +107,22 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
 async def get_current_active_user(current_user: UserInDB = Depends(get_current_user)) -> UserInDB:
     if current_user.disabled:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+
+def is_loopback_address(host: Optional[str]) -> bool:
+    try:
+        return ipaddress.ip_address(host).is_loopback
+    except (TypeError, ValueError):
+        return False
+
+async def require_internal_access(request: Request) -> None:
+    # operational endpoints (/metrics, /api/cache-stats): with METRICS_TOKEN set only that bearer token
+    # is accepted, without one only clients on this machine. Private addresses don't count as internal,
+    # behind a router (e.g. Heroku's) every public request arrives from one
+    if Settings.METRICS_TOKEN:
+        authorization = request.headers.get("authorization", "")
+        if hmac.compare_digest(authorization.encode(), f"Bearer {Settings.METRICS_TOKEN}".encode()):
+            return
+    elif request.client is not None and is_loopback_address(request.client.host):
+        return
+    raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed")
\ No newline at end of file
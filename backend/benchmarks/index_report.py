@@ -0,0 +1,156 @@
+"""
+Recall, latency and memory report for the FAISS index types supported by VectorSearchManager.
+
+Every configuration is compared against the exact flat index on the same catalog vectors,
+so the numbers can be used to pick TITLE_INDEX_TYPE / CODE_INDEX_TYPE and the
+IVF_NPROBE / HNSW_EF_SEARCH / RERANK_OVERFETCH settings for our catalog size.
+Quantized types are measured with and without exact re-ranking; "index MB" is what
+every worker holds in private memory, the re-rank vectors are memory-mapped and shared.
+
+Run from the repository root:
+    python -m backend.benchmarks.index_report --index code --output index_report.md
+"""
+import argparse
+import asyncio
+import time
+from typing import Dict, List, Tuple
+
+import faiss
+import numpy as np
+
+from backend.vector_search import create_index, rerank, set_search_params
+
+# (index type, parameters) pairs that are measured, flat is always the baseline
+CONFIGS: List[Tuple[str, Dict]] = [
+    ("flat", {}),
+    *[("ivf_flat", {"nprobe": nprobe}) for nprobe in (1, 4, 8, 16, 32, 64)],
+    *[("hnsw", {"ef_search": ef}) for ef in (16, 32, 64, 128, 256)],
+    *[("ivf_pq", {"nprobe": nprobe, "rerank": rerank}) for nprobe in (8, 16, 32, 64) for rerank in (False, True)],
+    *[(index_type, {"rerank": rerank}) for index_type in ("sq_fp16", "sq8", "pq") for rerank in (False, True)],
+]
+
+async def load_embeddings(use_code_embedding: bool) -> np.ndarray:
+    """Read and normalize the catalog embeddings the same way build_index does."""
+    from backend.database import course_collection
+
+    embedding_field = "code_embeddings" if use_code_embedding else "title_embedding"
+    courses = await course_collection.find(
+        {embedding_field: {"$exists": True}},
+        {"_id": 0, embedding_field: 1}
+    ).to_list(length=None)
+
+    vectors = []
+    for course in courses:
+        value = course.get(embedding_field)
+        if not value:
+            continue
+        vectors.extend(value if use_code_embedding else [value])
+
+    matrix = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix[norms[:, 0] > 0] / norms[norms[:, 0] > 0]
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+def measure(index, queries: np.ndarray, k: int, exact_vectors=None,
+            overfetch: int = 4) -> Tuple[np.ndarray, List[float]]:
+    """
+    Search one query at a time (like the API does) and record per-query latency.
+    With exact_vectors, overfetch * k candidates are re-ranked with exact scores.
+    """
+    latencies = []
+    results = np.empty((len(queries), k), dtype=np.int64)
+    for i, query in enumerate(queries):
+        start = time.perf_counter()
+        if exact_vectors is None:
+            _, I = index.search(query[None, :], k)
+        else:
+            _, I = index.search(query[None, :], k * overfetch)
+            _, I = rerank(query[None, :], I, exact_vectors)
+        latencies.append(time.perf_counter() - start)
+        results[i] = I[0, :k]
+    return results, latencies
+
+def index_memory_mb(index) -> float:
+    # the serialized size is a close estimate of what the index holds in memory
+    return faiss.serialize_index(index).nbytes / 2**20
+
+def recall_at_k(found: np.ndarray, truth: np.ndarray) -> float:
+    hits = sum(len(set(f[f >= 0]) & set(t)) for f, t in zip(found, truth))
+    return hits / truth.size
+
+def run_report(vectors: np.ndarray, n_queries: int, k: int, seed: int = 0) -> List[Dict]:
+    """Hold out n_queries vectors as queries and measure every configuration on the rest."""
+    rng = np.random.default_rng(seed)
+    order = rng.permutation(len(vectors))
+    queries = vectors[order[:n_queries]]
+    base = np.ascontiguousarray(vectors[order[n_queries:]])
+    dimension = base.shape[1]
+
+    rows = []
+    truth = None
+    built = {}
+    for index_type, params in CONFIGS:
+        # search-time parameters don't need a rebuild, so reuse the trained index
+        if index_type not in built:
+            start = time.perf_counter()
+            index = create_index(index_type, dimension, len(base))
+            if not index.is_trained:
+                index.train(base)
+            index.add(base)
+            built[index_type] = (index, time.perf_counter() - start)
+        index, build_seconds = built[index_type]
+        set_search_params(index, params)
+
+        exact_vectors = (lambda ids: base[ids]) if params.get("rerank") else None
+        found, latencies = measure(index, queries, k, exact_vectors)
+        if truth is None:
+            truth = found
+        rows.append({
+            "index_type": index_type,
+            "params": params,
+            "build_seconds": build_seconds,
+            "index_mb": index_memory_mb(index),
+            "rerank_mb": base.nbytes / 2**20 if params.get("rerank") else 0.0,
+            f"recall@{k}": recall_at_k(found, truth),
+            "p50_ms": percentile_ms(latencies, 50),
+            "p95_ms": percentile_ms(latencies, 95),
+            "mean_ms": float(np.mean(latencies) * 1000),
+        })
+    return rows
+
+def format_report(rows: List[Dict], n_vectors: int, k: int) -> str:
+    lines = [
+        f"Index report: {n_vectors} vectors, recall@{k} against the flat index",
+        "",
+        f"| index | params | build (s) | index MB | re-rank MB (shared) | recall@{k} | p50 (ms) | p95 (ms) | mean (ms) |",
+        "|---|---|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        params = ", ".join(f"{key}={value}" for key, value in row["params"].items()) or "-"
+        lines.append(
+            f"| {row['index_type']} | {params} | {row['build_seconds']:.2f} | "
+            f"{row['index_mb']:.1f} | {row['rerank_mb']:.1f} | "
+            f"{row[f'recall@{k}']:.3f} | {row['p50_ms']:.3f} | {row['p95_ms']:.3f} | {row['mean_ms']:.3f} |"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--index", choices=["title", "code"], default="code")
+    parser.add_argument("--queries", type=int, default=200, help="number of held-out query vectors")
+    parser.add_argument("--k", type=int, default=54, help="neighbors per query (search() asks for k * 3)")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    vectors = asyncio.run(load_embeddings(args.index == "code"))
+    rows = run_report(vectors, args.queries, args.k)
+    report = format_report(rows, len(vectors) - args.queries, args.k)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,135 @@
+"""
+Serialization time and payload size of the /courses, /search-courses and /roadmap
+responses, with FastAPI's default JSON path (jsonable_encoder + json.dumps) against
+the app's ORJSONResponse, and the body sizes after gzip and brotli compression.
+
+Payloads are synthetic but shaped like the real responses (18 courses per page and
+search, a 4-year roadmap).
+
+Run from the repository root:
+    python -m backend.benchmarks.serialization --repeat 2000
+"""
+import argparse
+import random
+import time
+import zlib
+from datetime import datetime, timedelta
+from typing import Callable, Dict, List
+
+from bson import ObjectId
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+from backend.compression import Compressor, brotli
+from backend.config import Settings
+from backend.responses import ORJSONResponse
+
+WORDS = (
+    "introduction advanced topics in computer science data structures algorithms statistics "
+    "organic chemistry linear algebra calculus microeconomics psychology research methods "
+    "american history literature seminar laboratory principles of design systems theory"
+).split()
+
+def course_title(rng: random.Random) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(rng.randint(2, 6))).title()
+
+def courses_payload(rng: random.Random) -> Dict:
+    courses = [{"id": str(ObjectId()), "title": course_title(rng), "credits": rng.choice((1, 2, 3, 4))}
+               for _ in range(18)]
+    return {"courses": courses, "has_more": True, "next_cursor": "ZmFrZWN1cnNvcjEy", "total": 7412}
+
+def search_payload(rng: random.Random) -> List[Dict]:
+    return [{"id": str(ObjectId()), "title": course_title(rng), "credits": rng.choice((1, 2, 3, 4)),
+             "similarity": rng.uniform(0.3, 1.0)} for _ in range(18)]
+
+def roadmap_payload(rng: random.Random) -> List[Dict]:
+    added_at = datetime(2025, 1, 1)
+    return [{"id": str(ObjectId()), "title": course_title(rng), "credits": rng.choice((1, 2, 3, 4)),
+             "year": 2025 + i // 10, "term": rng.choice(("Fall", "Spring", "Summer")),
+             "addedAt": added_at + timedelta(minutes=i)} for i in range(40)]
+
+PAYLOADS: Dict[str, Callable[[random.Random], object]] = {
+    "/courses": courses_payload,
+    "/search-courses": search_payload,
+    "/roadmap": roadmap_payload,
+}
+
+def fastapi_default(content) -> bytes:
+    # what a route returning a dict costs with FastAPI's default JSONResponse
+    return JSONResponse(jsonable_encoder(content)).body
+
+def orjson_default_class(content) -> bytes:
+    # a route returning a dict with ORJSONResponse as the default class
+    return ORJSONResponse(jsonable_encoder(content)).body
+
+def orjson_direct(content) -> bytes:
+    # a route returning ORJSONResponse itself
+    return ORJSONResponse(content).body
+
+SERIALIZERS = {
+    "fastapi default": fastapi_default,
+    "orjson (default class)": orjson_default_class,
+    "orjson (returned directly)": orjson_direct,
+}
+
+def time_us(serialize, content, repeat: int) -> float:
+    start = time.perf_counter()
+    for _ in range(repeat):
+        serialize(content)
+    return (time.perf_counter() - start) / repeat * 1e6
+
+def compressed_size(body: bytes, encoding: str) -> int:
+    return len(Compressor(encoding, Settings.GZIP_LEVEL, Settings.BROTLI_QUALITY).compress(body, last=True))
+
+def run_report(repeat: int, seed: int = 0) -> List[Dict]:
+    rng = random.Random(seed)
+    rows = []
+    for endpoint, make_payload in PAYLOADS.items():
+        content = make_payload(rng)
+        body = orjson_direct(content)
+        row = {
+            "endpoint": endpoint,
+            "bytes": len(body),
+            "gzip_bytes": compressed_size(body, "gzip"),
+            "br_bytes": compressed_size(body, "br") if brotli is not None else None,
+        }
+        for name, serialize in SERIALIZERS.items():
+            row[name] = time_us(serialize, content, repeat)
+        start = time.perf_counter()
+        for _ in range(repeat):
+            zlib.compress(body, Settings.GZIP_LEVEL)
+        row["gzip_us"] = (time.perf_counter() - start) / repeat * 1e6
+        rows.append(row)
+    return rows
+
+def format_report(rows: List[Dict], repeat: int) -> str:
+    names = list(SERIALIZERS)
+    lines = [
+        f"Serialization report: mean of {repeat} runs, times in microseconds",
+        "",
+        "| endpoint | " + " | ".join(names) + " | speedup | bytes | gzip bytes | br bytes | gzip time |",
+        "|---|" + "---|" * (len(names) + 5),
+    ]
+    for row in rows:
+        br_bytes = row["br_bytes"] if row["br_bytes"] is not None else "n/a (brotli not installed)"
+        lines.append(
+            f"| {row['endpoint']} | " + " | ".join(f"{row[name]:.1f}" for name in names) +
+            f" | {row[names[0]] / row[names[-1]]:.1f}x | {row['bytes']} | {row['gzip_bytes']} | {br_bytes} |"
+            f" {row['gzip_us']:.1f} |"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--repeat", type=int, default=2000, help="serializations per payload and method")
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+
+    report = format_report(run_report(args.repeat), args.repeat)
+    print(report)
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report + "\n")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,538 @@
+"""
+Reproducible benchmark of VectorSearchManager on synthetic catalogs.
+
+A catalog the size of ours (about 9.3k title and 10.9k code vectors) is generated
+at each --scale, with 1536-d embeddings from a deterministic fake provider:
+every token has a fixed random vector and a text embeds to the normalized sum of
+its tokens, so titles that share words are close like real embeddings are. The
+catalog is served by an in-memory stand-in for the courses collection (mongomock
+would hold the 100x catalog as tens of GB of Python floats), and every index
+configuration is built through build_index as the app builds it.
+
+Each (scale, index, configuration) run happens in a fresh process so its peak RSS
+is its own, and reports:
+    build and artifact load time, catalog and peak RSS, p50/p95/p99 latency of
+    single searches, throughput with 1..N concurrent clients, recall@k of the
+    courses found against an exact search
+
+With --providers, the embedding providers are compared instead: time to embed the
+catalog titles, latency of single query embeddings (the network hop of the hosted
+API against a local model) and overlap@k of the courses each provider's vectors
+find with those of the first provider. --real-catalog uses the course titles in
+MongoDB, which is the comparison that says something about quality; the fake
+provider only gives a latency floor.
+
+Results are saved as JSON under --output-dir with the commit and library versions,
+and --compare prints the change against an earlier results file.
+
+Run from the repository root:
+    python -m backend.benchmarks.suite --scale 1 10 --index title code
+    python -m backend.benchmarks.suite --configs flat hnsw:HNSW_EF_SEARCH=128 --compare benchmark_results/suite-20250101-120000.json
+    python -m backend.benchmarks.suite --providers openai onnx --real-catalog
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import multiprocessing
+import os
+import platform
+import subprocess
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+from bson import ObjectId
+
+from backend.embeddings import EmbeddingProvider
+
+# today's catalog, scale 1
+BASE_COURSES = 9300
+BASE_CODE_VECTORS = 10900
+DIMENSION = 1536
+VOCABULARY_SIZE = 4000
+DEPARTMENTS = 150
+
+# index configurations measured by default, as (index type, settings overrides)
+CONFIGS: List[Tuple[str, Dict]] = [
+    ("flat", {}),
+    ("ivf_flat", {"IVF_NPROBE": 16}),
+    ("hnsw", {"HNSW_EF_SEARCH": 64}),
+    ("sq8", {"RERANK_OVERFETCH": 4}),
+    ("ivf_pq", {"IVF_NPROBE": 32, "RERANK_OVERFETCH": 4}),
+]
+
+class FakeEmbeddingProvider(EmbeddingProvider):
+    """Deterministic stand-in for the embeddings API, see the module docstring."""
+    name = "fake"
+
+    def __init__(self, dimension: int = DIMENSION, seed: int = 0):
+        self.dimension = dimension
+        self.seed = seed
+        self._tokens: Dict[str, np.ndarray] = {}
+
+    def token_vector(self, token: str) -> np.ndarray:
+        vector = self._tokens.get(token)
+        if vector is None:
+            digest = hashlib.blake2b(f"{self.seed}:{token}".encode(), digest_size=8).digest()
+            rng = np.random.default_rng(int.from_bytes(digest, "little"))
+            vector = self._tokens[token] = rng.standard_normal(self.dimension).astype(np.float32)
+        return vector
+
+    def embed_many(self, texts: Iterable[str]) -> np.ndarray:
+        texts = list(texts)
+        vectors = np.zeros((len(texts), self.dimension), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for token in text.upper().split():
+                vectors[row] += self.token_vector(token)
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        np.divide(vectors, norms, out=vectors, where=norms > 0)
+        return vectors
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        return self.embed_many(texts)
+
+def title_queries(titles: List[str], n: int, rng: np.random.Generator) -> List[str]:
+    """Search texts like users type them: one to three words of a course title."""
+    queries = []
+    for ordinal in rng.integers(0, len(titles), n):
+        words = titles[ordinal].split()
+        size = min(len(words), int(rng.integers(1, 4)))
+        queries.append(" ".join(rng.choice(words, size, replace=False)))
+    return queries
+
+class SyntheticCatalog:
+    """
+    Courses with titles drawn from a Zipf-distributed vocabulary and one or two
+    designations ("DEPT017 345"); course ordinal i has ObjectId i.
+    """
+
+    def __init__(self, scale: float, provider: FakeEmbeddingProvider, seed: int = 0):
+        self.scale = scale
+        self.provider = provider
+        rng = np.random.default_rng(seed)
+        self.n_courses = max(1, round(BASE_COURSES * scale))
+        cross_listed = min(self.n_courses, round((BASE_CODE_VECTORS - BASE_COURSES) * scale))
+
+        weights = 1.0 / np.arange(1, VOCABULARY_SIZE + 1) ** 1.1
+        lengths = rng.integers(2, 7, self.n_courses)
+        words = rng.choice(VOCABULARY_SIZE, size=int(lengths.sum()), p=weights / weights.sum())
+        bounds = np.concatenate([[0], np.cumsum(lengths)])
+        self.titles = [" ".join(f"W{word}" for word in words[start:end]) for start, end in zip(bounds[:-1], bounds[1:])]
+
+        designation_counts = np.ones(self.n_courses, dtype=np.int64)
+        designation_counts[rng.choice(self.n_courses, cross_listed, replace=False)] = 2
+        departments = rng.integers(0, DEPARTMENTS, int(designation_counts.sum()))
+        numbers = rng.integers(100, 1000, int(designation_counts.sum()))
+        self.designations = [f"DEPT{department:03d} {number}" for department, number in zip(departments, numbers)]
+        # course ordinal of every designation, in course order like build_index reads them
+        self.code_ordinals = np.repeat(np.arange(self.n_courses), designation_counts)
+        self._vectors: Dict[bool, np.ndarray] = {}
+
+    @staticmethod
+    def course_id(ordinal: int) -> ObjectId:
+        return ObjectId(int(ordinal).to_bytes(12, "big"))
+
+    @staticmethod
+    def ordinal(course_id: str) -> int:
+        return int(course_id, 16)
+
+    def vectors(self, use_code_embedding: bool) -> np.ndarray:
+        if use_code_embedding not in self._vectors:
+            texts = self.designations if use_code_embedding else self.titles
+            self._vectors[use_code_embedding] = np.concatenate([
+                self.provider.embed_many(texts[start:start + 10000]) for start in range(0, len(texts), 10000)
+            ])
+        return self._vectors[use_code_embedding]
+
+    def vector_ordinals(self, use_code_embedding: bool) -> np.ndarray:
+        return self.code_ordinals if use_code_embedding else np.arange(self.n_courses)
+
+    def queries(self, n: int, use_code_embedding: bool, seed: int = 1) -> List[str]:
+        """Title queries, or designations with a partial number ("DEPT017 3")."""
+        rng = np.random.default_rng(seed)
+        if not use_code_embedding:
+            return title_queries(self.titles, n, rng)
+        queries = []
+        for ordinal in rng.integers(0, self.n_courses, n):
+            department, number = self.designations[int(np.searchsorted(self.code_ordinals, ordinal))].split()
+            queries.append(f"{department} {number[:rng.integers(1, 4)]}")
+        return queries
+
+class SyntheticCursor:
+    def __init__(self, documents):
+        self._documents = documents
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        try:
+            return next(self._documents)
+        except StopIteration:
+            raise StopAsyncIteration
+
+    async def to_list(self, length: Optional[int] = None) -> List[Dict]:
+        documents = list(self._documents)
+        return documents[:length] if length else documents
+
+class SyntheticCourseCollection:
+    """
+    The part of the Motor courses collection build_index uses (count_documents,
+    the vector count aggregate and find with a projection), serving the catalog.
+    Embeddings are handed out as lists of floats, as documents decoded from BSON are.
+    """
+
+    def __init__(self, catalog: SyntheticCatalog):
+        self.catalog = catalog
+
+    async def count_documents(self, filter: Dict) -> int:
+        return self.catalog.n_courses
+
+    def aggregate(self, pipeline: List[Dict]) -> SyntheticCursor:
+        # only the code vector count of VectorSearchManager._count_vectors
+        return SyntheticCursor(iter([{"_id": None, "total": len(self.catalog.code_ordinals)}]))
+
+    def find(self, filter: Dict, projection: Dict, batch_size: int = 0) -> SyntheticCursor:
+        return SyntheticCursor(self._documents("code_embeddings" in projection))
+
+    def _documents(self, use_code_embedding: bool):
+        vectors = self.catalog.vectors(use_code_embedding)
+        if not use_code_embedding:
+            for ordinal in range(self.catalog.n_courses):
+                yield {"_id": self.catalog.course_id(ordinal), "title_embedding": vectors[ordinal].tolist()}
+            return
+        starts = np.searchsorted(self.catalog.code_ordinals, np.arange(self.catalog.n_courses + 1))
+        for ordinal in range(self.catalog.n_courses):
+            yield {
+                "_id": self.catalog.course_id(ordinal),
+                "code_embeddings": vectors[starts[ordinal]:starts[ordinal + 1]].tolist(),
+            }
+
+def exact_top_courses(catalog: SyntheticCatalog, queries: np.ndarray, use_code_embedding: bool, k: int) -> List[set]:
+    """
+    The k best courses of each query by exact inner product, a course scoring with
+    its best vector. Ties (courses with the same title) are broken arbitrarily, which
+    keeps even the flat index slightly below a recall of 1.
+    """
+    vectors = catalog.vectors(use_code_embedding)
+    ordinals = catalog.vector_ordinals(use_code_embedding)
+    starts = np.searchsorted(ordinals, np.arange(catalog.n_courses))
+    truth = []
+    for start in range(0, len(queries), 16):
+        scores = queries[start:start + 16] @ vectors.T
+        per_course = np.maximum.reduceat(scores, starts, axis=1)
+        top = np.argpartition(-per_course, min(k, catalog.n_courses - 1), axis=1)[:, :k]
+        truth.extend(set(row.tolist()) for row in top)
+    return truth
+
+def current_rss_mb() -> float:
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 2**20
+    except (OSError, ValueError, AttributeError):
+        return 0.0
+
+def percentile_ms(samples: List[float], q: float) -> float:
+    return float(np.percentile(samples, q) * 1000)
+
+def measure_throughput(manager, queries: np.ndarray, k: int, use_code_embedding: bool,
+                       clients: int, duration: float) -> Dict:
+    """
+    Searches per second with clients searching at once, each in its own thread
+    and event loop. FAISS and numpy release the GIL while searching, the Python
+    around them does not.
+    """
+    latencies: List[float] = []
+    lock = threading.Lock()
+    deadline = time.perf_counter() + duration
+
+    async def client(offset: int) -> None:
+        own = []
+        position = offset
+        while time.perf_counter() < deadline:
+            start = time.perf_counter()
+            await manager.search(queries[position % len(queries)], k=k, use_code_embedding=use_code_embedding)
+            own.append(time.perf_counter() - start)
+            position += clients
+        with lock:
+            latencies.extend(own)
+
+    start = time.perf_counter()
+    threads = [threading.Thread(target=asyncio.run, args=(client(offset),)) for offset in range(clients)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    return {"clients": clients, "qps": len(latencies) / elapsed, "p95_ms": percentile_ms(latencies, 95)}
+
+def run_configuration(scale: float, index_type: str, kind: str, overrides: Dict, n_queries: int, k: int,
+                      concurrency: List[int], duration: float, seed: int) -> Dict:
+    """One measurement, meant to run in its own process (settings are overridden in place)."""
+    import logging
+    logging.basicConfig(level=logging.WARNING)
+    from backend.config import Settings
+    from backend.index_artifacts import ArtifactStore
+    from backend.vector_search import VectorSearchManager, peak_rss_mb
+
+    for key, value in overrides.items():
+        setattr(Settings, key, value)
+    use_code_embedding = index_type == "code"
+
+    provider = FakeEmbeddingProvider(seed=seed)
+    catalog = SyntheticCatalog(scale, provider, seed)
+    collection = SyntheticCourseCollection(catalog)
+    catalog.vectors(use_code_embedding)
+    query_texts = catalog.queries(n_queries, use_code_embedding, seed + 1)
+    queries = provider.embed_many(query_texts)
+    truth = exact_top_courses(catalog, queries, use_code_embedding, k)
+    catalog_rss = current_rss_mb()
+
+    async def measure() -> Dict:
+        with tempfile.TemporaryDirectory() as root:
+            manager = VectorSearchManager()
+            manager.store = ArtifactStore(root, keep=1)
+            manager.title_index_type = manager.code_index_type = kind
+            start = time.perf_counter()
+            await manager.build_index(collection, use_code_embedding, use_cache=False)
+            build_seconds = time.perf_counter() - start
+
+            # what another worker pays to pick up the published index
+            reader = VectorSearchManager()
+            reader.store = manager.store
+            reader.title_index_type = reader.code_index_type = kind
+            start = time.perf_counter()
+            await reader._load_artifact(use_code_embedding)
+            load_seconds = time.perf_counter() - start
+
+            latencies, hits = [], 0
+            for query, expected in zip(queries, truth):
+                start = time.perf_counter()
+                results = await manager.search(query, k=k, use_code_embedding=use_code_embedding)
+                latencies.append(time.perf_counter() - start)
+                hits += len({catalog.ordinal(result["id"]) for result in results} & expected)
+
+            loop = asyncio.get_running_loop()
+            throughput = [
+                await loop.run_in_executor(
+                    None, measure_throughput, manager, queries, k, use_code_embedding, clients, duration
+                )
+                for clients in concurrency
+            ]
+            return {
+                "vectors": manager.snapshots[index_type].ntotal,
+                "build_seconds": build_seconds,
+                "load_seconds": load_seconds,
+                "p50_ms": percentile_ms(latencies, 50),
+                "p95_ms": percentile_ms(latencies, 95),
+                "p99_ms": percentile_ms(latencies, 99),
+                f"recall@{k}": hits / sum(len(expected) for expected in truth),
+                "throughput": throughput,
+            }
+
+    row = {"scale": scale, "index": index_type, "index_type": kind, "params": overrides, "courses": catalog.n_courses}
+    row.update(asyncio.run(measure()))
+    row["catalog_rss_mb"] = catalog_rss
+    row["peak_rss_mb"] = peak_rss_mb()
+    return row
+
+def parse_config(text: str) -> Tuple[str, Dict]:
+    """'ivf_flat:IVF_NPROBE=32,IVF_NLIST=256' -> ('ivf_flat', {'IVF_NPROBE': 32, 'IVF_NLIST': 256})"""
+    kind, _, params = text.partition(":")
+    overrides = {}
+    for pair in filter(None, params.split(",")):
+        key, _, value = pair.partition("=")
+        overrides[key.strip()] = int(value) if value.strip().lstrip("-").isdigit() else float(value)
+    return kind, overrides
+
+def environment() -> Dict:
+    import faiss
+    try:
+        commit = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True).stdout.strip()
+    except OSError:
+        commit = None
+    return {
+        "commit": commit or None,
+        "python": platform.python_version(),
+        "numpy": np.__version__,
+        "faiss": getattr(faiss, "__version__", None),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+    }
+
+def run_suite(scales: List[float], indexes: List[str], configs: List[Tuple[str, Dict]], n_queries: int, k: int,
+              concurrency: List[int], duration: float, seed: int = 0) -> List[Dict]:
+    rows = []
+    context = multiprocessing.get_context("spawn")
+    for scale in scales:
+        for index_type in indexes:
+            for kind, overrides in configs:
+                # a fresh process per run, so peak RSS and FAISS state don't leak between runs
+                with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+                    row = executor.submit(
+                        run_configuration, scale, index_type, kind, overrides,
+                        n_queries, k, concurrency, duration, seed
+                    ).result()
+                rows.append(row)
+                print(format_row(row, k), flush=True)
+    return rows
+
+def config_label(row: Dict) -> str:
+    params = ", ".join(f"{key}={value}" for key, value in row["params"].items())
+    return f"{row['index_type']} ({params})" if params else row["index_type"]
+
+def format_row(row: Dict, k: int) -> str:
+    throughput = " ".join(f"{run['clients']}:{run['qps']:.0f}" for run in row["throughput"])
+    return (
+        f"| {row['scale']:g}x | {row['index']} | {config_label(row)} | {row['vectors']} | "
+        f"{row['build_seconds']:.2f} | {row['load_seconds']:.3f} | {row['catalog_rss_mb']:.0f} | {row['peak_rss_mb']:.0f} | "
+        f"{row['p50_ms']:.3f} | {row['p95_ms']:.3f} | {row['p99_ms']:.3f} | {throughput} | {row[f'recall@{k}']:.3f} |"
+    )
+
+def format_header(k: int) -> str:
+    return "\n".join([
+        f"| scale | index | configuration | vectors | build (s) | load (s) | catalog MB | peak RSS MB | "
+        f"p50 (ms) | p95 (ms) | p99 (ms) | qps by clients | recall@{k} |",
+        "|---|---|---|---|---|---|---|---|---|---|---|---|---|",
+    ])
+
+def format_comparison(rows: List[Dict], previous: Dict, k: int) -> str:
+    """p95, throughput and recall against an earlier results file, for the runs both have."""
+    def key(row):
+        return row["scale"], row["index"], config_label(row)
+    before = {key(row): row for row in previous["runs"]}
+    lines = [
+        f"Compared with {previous['environment'].get('commit')} ({previous['created_at']})",
+        "",
+        f"| scale | index | configuration | p95 (ms) | best qps | recall@{k} | build (s) |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        old = before.get(key(row))
+        if old is None or f"recall@{k}" not in old:
+            continue
+        best_qps = max(run["qps"] for run in row["throughput"])
+        old_best_qps = max(run["qps"] for run in old["throughput"])
+        lines.append(
+            f"| {row['scale']:g}x | {row['index']} | {config_label(row)} | "
+            f"{old['p95_ms']:.3f} -> {row['p95_ms']:.3f} | {old_best_qps:.0f} -> {best_qps:.0f} | "
+            f"{old[f'recall@{k}']:.3f} -> {row[f'recall@{k}']:.3f} | "
+            f"{old['build_seconds']:.2f} -> {row['build_seconds']:.2f} |"
+        )
+    return "\n".join(lines)
+
+async def load_titles() -> List[str]:
+    from backend.database import course_collection
+    courses = await course_collection.find({"title": {"$exists": True}}, {"_id": 0, "title": 1}).to_list(length=None)
+    return [course["title"] for course in courses if course.get("title")]
+
+async def compare_providers(names: List[str], titles: List[str], n_queries: int, k: int, seed: int = 0) -> List[Dict]:
+    """Embedding cost and agreement of each provider on the same titles and queries, see the module docstring."""
+    from backend.embeddings import create_provider
+
+    queries = title_queries(titles, n_queries, np.random.default_rng(seed + 1))
+    rows, reference = [], None
+    for name in names:
+        provider = FakeEmbeddingProvider(seed=seed) if name == "fake" else create_provider(name)
+        try:
+            start = time.perf_counter()
+            catalog = np.concatenate([
+                await provider.embed_texts(titles[position:position + 256]) for position in range(0, len(titles), 256)
+            ])
+            catalog_seconds = time.perf_counter() - start
+
+            latencies, query_vectors = [], []
+            for query in queries:
+                start = time.perf_counter()
+                query_vectors.append((await provider.embed_texts([query]))[0])
+                latencies.append(time.perf_counter() - start)
+        finally:
+            await provider.close()
+
+        scores = np.asarray(query_vectors) @ catalog.T
+        top = np.argpartition(-scores, min(k, len(titles) - 1), axis=1)[:, :k]
+        found = [set(row.tolist()) for row in top]
+        if reference is None:
+            reference = found
+        rows.append({
+            "provider": provider.name,
+            "dimension": int(catalog.shape[1]),
+            "catalog_texts_per_second": len(titles) / catalog_seconds,
+            "query_p50_ms": percentile_ms(latencies, 50),
+            "query_p95_ms": percentile_ms(latencies, 95),
+            "query_p99_ms": percentile_ms(latencies, 99),
+            f"overlap@{k}": sum(len(a & b) for a, b in zip(found, reference)) / sum(len(b) for b in reference),
+        })
+    return rows
+
+def format_provider_report(rows: List[Dict], n_titles: int, k: int) -> str:
+    lines = [
+        f"Embedding providers: {n_titles} catalog titles, overlap@{k} with {rows[0]['provider']}",
+        "",
+        f"| provider | dimension | catalog texts/s | query p50 (ms) | query p95 (ms) | query p99 (ms) | overlap@{k} |",
+        "|---|---|---|---|---|---|---|",
+    ]
+    for row in rows:
+        lines.append(
+            f"| {row['provider']} | {row['dimension']} | {row['catalog_texts_per_second']:.0f} | "
+            f"{row['query_p50_ms']:.2f} | {row['query_p95_ms']:.2f} | {row['query_p99_ms']:.2f} | "
+            f"{row[f'overlap@{k}']:.3f} |"
+        )
+    return "\n".join(lines)
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--scale", type=float, nargs="+", default=[1, 10],
+                        help="catalog sizes relative to today's (100 needs about 16 GB of memory)")
+    parser.add_argument("--index", nargs="+", choices=["title", "code"], default=["title", "code"])
+    parser.add_argument("--configs", nargs="+", type=parse_config,
+                        help="index configurations as type[:SETTING=value,...], default: " +
+                             " ".join(kind for kind, _ in CONFIGS))
+    parser.add_argument("--queries", type=int, default=500, help="queries for latency and recall")
+    parser.add_argument("--k", type=int, default=18, help="courses per search, as the API asks for")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16], help="concurrent clients")
+    parser.add_argument("--duration", type=float, default=5.0, help="seconds per throughput measurement")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--output-dir", default="benchmark_results", help="where the JSON results are saved")
+    parser.add_argument("--compare", help="an earlier results file to compare against")
+    parser.add_argument("--providers", nargs="+", choices=["fake", "openai", "onnx"],
+                        help="compare these embedding providers instead of index configurations")
+    parser.add_argument("--real-catalog", action="store_true",
+                        help="compare providers on the course titles in MongoDB instead of synthetic ones")
+    args = parser.parse_args()
+
+    created_at = datetime.now()
+    rows, provider_rows = [], []
+    if args.providers:
+        titles = (asyncio.run(load_titles()) if args.real_catalog
+                  else SyntheticCatalog(args.scale[0], FakeEmbeddingProvider(seed=args.seed), args.seed).titles)
+        provider_rows = asyncio.run(compare_providers(args.providers, titles, args.queries, args.k, args.seed))
+        print(format_provider_report(provider_rows, len(titles), args.k))
+    else:
+        print(format_header(args.k))
+        rows = run_suite(args.scale, args.index, args.configs or CONFIGS, args.queries, args.k,
+                         args.concurrency, args.duration, args.seed)
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    path = os.path.join(args.output_dir, f"suite-{created_at:%Y%m%d-%H%M%S}.json")
+    with open(path, "w") as f:
+        json.dump({
+            "created_at": created_at.isoformat(),
+            "environment": environment(),
+            "arguments": {key: value for key, value in vars(args).items() if key not in ("output_dir", "compare")},
+            "runs": rows,
+            "providers": provider_rows,
+        }, f, indent=2)
+    print(f"\nSaved {path}")
+
+    if args.compare:
+        with open(args.compare) as f:
+            print("\n" + format_comparison(rows, json.load(f), args.k))
+
+if __name__ == "__main__":
+    main()
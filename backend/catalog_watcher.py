@@ -0,0 +1,87 @@
+import asyncio
+import inspect
+import logging
+from typing import Callable, List, Optional
+
+from pymongo.errors import OperationFailure, PyMongoError
+
+# MongoDB answers with this code when change streams are used on a standalone server
+CHANGE_STREAMS_UNSUPPORTED = 40573
+# the resume token is older than the oplog, the stream has to start over from now
+CHANGE_STREAM_HISTORY_LOST = 286
+
+class CatalogWatcher:
+    """
+    Follows course_collection through a MongoDB change stream and hands every
+    insert / update / replace / delete event to the subscribed handlers.
+
+    Change streams need a replica set (Atlas always is one, locally use a
+    single-node replica set: mongod --replSet rs0 and rs.initiate()).
+    """
+
+    def __init__(self):
+        self._handlers: List[Callable] = []
+        self._task: Optional[asyncio.Task] = None
+        self._resume_token = None
+
+    def subscribe(self, handler: Callable) -> None:
+        """Register a handler called with each change event, it can be a plain function or a coroutine."""
+        if handler not in self._handlers:
+            self._handlers.append(handler)
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, course_collection) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self._run(course_collection))
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def _dispatch(self, change: dict) -> None:
+        for handler in self._handlers:
+            try:
+                result = handler(change)
+                if inspect.isawaitable(result):
+                    await result
+            except Exception as e:
+                logging.error(f"Catalog change handler {handler} failed: {e}", exc_info=True)
+
+    async def _run(self, course_collection) -> None:
+        pipeline = [{"$match": {"operationType": {"$in": ["insert", "update", "replace", "delete"]}}}]
+        while True:
+            try:
+                async with course_collection.watch(
+                    pipeline,
+                    full_document="updateLookup",
+                    resume_after=self._resume_token,
+                ) as stream:
+                    logging.info("Watching course catalog for changes")
+                    async for change in stream:
+                        self._resume_token = stream.resume_token
+                        await self._dispatch(change)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code == CHANGE_STREAMS_UNSUPPORTED:
+                    logging.warning("MongoDB does not support change streams here, catalog changes need a rebuild")
+                    return
+                if e.code == CHANGE_STREAM_HISTORY_LOST:
+                    logging.warning("Catalog change stream history lost, changes since then need a rebuild")
+                    self._resume_token = None
+                logging.error(f"Catalog change stream failed, retrying: {e}")
+                await asyncio.sleep(5)
+            except PyMongoError as e:
+                logging.error(f"Catalog change stream failed, retrying: {e}")
+                await asyncio.sleep(5)
+
+# Create singleton instance
+catalog_watcher = CatalogWatcher()
@@ -0,0 +1,138 @@
+import zlib
+from typing import Dict, Optional
+
+from starlette.datastructures import Headers, MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+try:
+    import brotli
+except ImportError:  # brotli is optional, responses are gzipped without it
+    brotli = None
+
+# content types worth compressing, images, fonts and archives are compressed already
+COMPRESSIBLE_TYPES = (
+    "text/", "application/json", "application/javascript", "application/xml",
+    "image/svg+xml", "application/manifest+json",
+)
+
+def supported_encodings() -> tuple:
+    # in order of preference when the client accepts several equally
+    return ("br", "gzip") if brotli is not None else ("gzip",)
+
+def negotiate_encoding(accept_encoding: str, available: tuple) -> Optional[str]:
+    """The available encoding the Accept-Encoding header prefers, None for identity."""
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        if not coding:
+            continue
+        weight = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                weight = float(params[2:])
+            except ValueError:
+                weight = 0.0
+        weights[coding] = weight
+    best, best_weight = None, 0.0
+    for coding in available:
+        weight = weights.get(coding, weights.get("*", 0.0))
+        if weight > best_weight:
+            best, best_weight = coding, weight
+    return best
+
+class Compressor:
+    """Incremental gzip or brotli compression of one response body."""
+
+    def __init__(self, encoding: str, gzip_level: int, brotli_quality: int):
+        self.encoding = encoding
+        if encoding == "br":
+            self._brotli = brotli.Compressor(quality=brotli_quality)
+        else:
+            # wbits=31 writes a gzip header and trailer
+            self._zlib = zlib.compressobj(gzip_level, zlib.DEFLATED, 31)
+
+    def compress(self, data: bytes, last: bool) -> bytes:
+        if self.encoding == "br":
+            out = self._brotli.process(data)
+            return out + (self._brotli.finish() if last else self._brotli.flush())
+        out = self._zlib.compress(data)
+        return out + self._zlib.flush(zlib.Z_FINISH if last else zlib.Z_SYNC_FLUSH)
+
+class CompressionMiddleware:
+    """
+    Compresses responses with brotli or gzip, whichever the client prefers
+    (brotli only when the brotli package is installed). Bodies below
+    minimum_size, non-text content types and responses that already have a
+    Content-Encoding (e.g. precompressed static files) are passed through.
+    """
+
+    def __init__(self, app: ASGIApp, minimum_size: int = 1024, gzip_level: int = 6, brotli_quality: int = 4):
+        self.app = app
+        self.minimum_size = minimum_size
+        self.gzip_level = gzip_level
+        self.brotli_quality = brotli_quality
+        self.encodings = supported_encodings()
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        encoding = negotiate_encoding(Headers(scope=scope).get("accept-encoding", ""), self.encodings)
+        if encoding is None:
+            await self.app(scope, receive, send)
+            return
+
+        start_message: Optional[Message] = None
+        compressor: Optional[Compressor] = None
+
+        async def send_compressed(message: Message) -> None:
+            nonlocal start_message, compressor
+            if message["type"] == "http.response.start":
+                # held back until the first body chunk shows whether to compress
+                start_message = message
+                return
+            if message["type"] != "http.response.body":
+                await send(message)
+                return
+            body = message.get("body", b"")
+            more_body = message.get("more_body", False)
+
+            if start_message is not None:
+                headers = MutableHeaders(raw=start_message["headers"])
+                compressible = (
+                    start_message["status"] not in (204, 206, 304)
+                    and "content-encoding" not in headers
+                    and headers.get("content-type", "").startswith(COMPRESSIBLE_TYPES)
+                    and (more_body or len(body) >= self.minimum_size)
+                )
+                if compressible:
+                    compressor = Compressor(encoding, self.gzip_level, self.brotli_quality)
+                    headers["Content-Encoding"] = encoding
+                    headers.add_vary_header("Accept-Encoding")
+                    # the compressed bytes are a different representation, so a strong ETag becomes weak
+                    etag = headers.get("etag")
+                    if etag and not etag.startswith("W/"):
+                        headers["ETag"] = f"W/{etag}"
+                    if more_body:
+                        del headers["Content-Length"]
+                    else:
+                        body = compressor.compress(body, last=True)
+                        headers["Content-Length"] = str(len(body))
+                        compressor = None
+                        message = {**message, "body": body}
+                elif "content-encoding" not in headers and start_message["status"] not in (204, 304):
+                    headers.add_vary_header("Accept-Encoding")
+                await send(start_message)
+                start_message = None
+                if compressor is not None:
+                    message = {**message, "body": compressor.compress(body, last=not more_body)}
+                await send(message)
+                return
+
+            if compressor is not None:
+                message = {**message, "body": compressor.compress(body, last=not more_body)}
+            await send(message)
+
+        await self.app(scope, receive, send_compressed)
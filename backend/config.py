@@ -19,9 +19,103 @@ class Settings:
 
     # SMTP settings for GoDaddy
     SMTP_HOST: str = os.getenv("SMTP_HOST")
-    SMTP_PORT: int = int(os.getenv("SMTP_PORT"))
+    SMTP_PORT: int = int(os.getenv("SMTP_PORT", "587"))
     SMTP_USERNAME: str = os.getenv("SMTP_USERNAME")
     SMTP_PASSWORD: str = os.getenv("SMTP_PASSWORD")
+    # set to "false" for a local SMTP sink in development and tests,
+    # e.g. SMTP_HOST=localhost SMTP_PORT=1025 with "python -m aiosmtpd -n -l localhost:1025"
+    # (login is skipped when there is no username or password)
+    SMTP_STARTTLS: bool = os.getenv("SMTP_STARTTLS", "true").lower() == "true"
+    # seconds to wait on the SMTP server before giving up on a connection
+    SMTP_TIMEOUT: float = float(os.getenv("SMTP_TIMEOUT", "30"))
+    # outbound email queue: parallel SMTP connections, queued messages before enqueueing fails,
+    # and how often a failed delivery is retried (after MAIL_RETRY_BACKOFF seconds, doubling each time)
+    MAIL_CONCURRENCY: int = int(os.getenv("MAIL_CONCURRENCY", "2"))
+    MAIL_QUEUE_SIZE: int = int(os.getenv("MAIL_QUEUE_SIZE", "1000"))
+    MAIL_MAX_RETRIES: int = int(os.getenv("MAIL_MAX_RETRIES", "3"))
+    MAIL_RETRY_BACKOFF: float = float(os.getenv("MAIL_RETRY_BACKOFF", "2"))
+
+    # signed-in users are cached for a few seconds (and at most this many) instead of being read on every request
+    USER_CACHE_SIZE: int = int(os.getenv("USER_CACHE_SIZE", "1000"))
+    USER_CACHE_TTL: float = float(os.getenv("USER_CACHE_TTL", "30"))
+    # responses of at least this many bytes are compressed (brotli or gzip, as the client prefers),
+    # with these gzip levels (1-9) and brotli qualities (0-11)
+    COMPRESSION_MINIMUM_SIZE: int = int(os.getenv("COMPRESSION_MINIMUM_SIZE", "1024"))
+    GZIP_LEVEL: int = int(os.getenv("GZIP_LEVEL", "6"))
+    BROTLI_QUALITY: int = int(os.getenv("BROTLI_QUALITY", "4"))
+    # /metrics and /api/cache-stats expose internal timings and cache sizes. With a token they need
+    # "Authorization: Bearer <token>"; without one they only answer clients on the same machine
+    # (loopback), so scraping a deployment behind a router needs the token
+    METRICS_TOKEN: str = os.getenv("METRICS_TOKEN", "")
+    # explain() the hot per-user queries at startup and refuse to start if one would scan a whole collection
+    DB_PLAN_CHECK: bool = os.getenv("DB_PLAN_CHECK", "false").lower() == "true"
+    # query embeddings: size of the in-memory LRU cache, and an optional SQLite file
+    # that caches embeddings across workers and restarts ("" turns it off)
+    EMBEDDING_CACHE_SIZE: int = int(os.getenv("EMBEDDING_CACHE_SIZE", "2048"))
+    EMBEDDING_DISK_CACHE: str = os.getenv("EMBEDDING_DISK_CACHE", "")
+    # course titles and credits cached to hydrate search results: number of courses, and seconds
+    # before an entry is re-read (catalog changes drop entries right away when the change stream runs)
+    COURSE_SUMMARY_CACHE_SIZE: int = int(os.getenv("COURSE_SUMMARY_CACHE_SIZE", "10000"))
+    COURSE_SUMMARY_CACHE_TTL: float = float(os.getenv("COURSE_SUMMARY_CACHE_TTL", "3600"))
+    # seconds the total course count of the catalog listing is reused before it is counted again
+    COURSE_COUNT_CACHE_TTL: float = float(os.getenv("COURSE_COUNT_CACHE_TTL", "300"))
+    # total size in bytes of the rendered course detail responses kept in memory
+    COURSE_DETAIL_CACHE_BYTES: int = int(os.getenv("COURSE_DETAIL_CACHE_BYTES", str(16 * 1024 * 1024)))
+    # seconds before a cached course detail response is re-read, in case the change stream isn't running
+    COURSE_DETAIL_CACHE_TTL: float = float(os.getenv("COURSE_DETAIL_CACHE_TTL", "3600"))
+    # where query and catalog embeddings come from: "openai" (text-embedding-3-small over the API)
+    # or "onnx", a local sentence-embedding model (needs onnxruntime and tokenizers installed).
+    # The two live in different vector spaces, so switching rebuilds the indexes from the course texts
+    EMBEDDING_PROVIDER: str = os.getenv("EMBEDDING_PROVIDER", "openai")
+    # the local model: .onnx file, its tokenizer.json (default: next to the model), texts per
+    # inference batch, inference threads per worker and tokens per text
+    LOCAL_EMBEDDING_MODEL: str = os.getenv("LOCAL_EMBEDDING_MODEL", "models/all-MiniLM-L6-v2/model.onnx")
+    LOCAL_EMBEDDING_TOKENIZER: str = os.getenv("LOCAL_EMBEDDING_TOKENIZER", "")
+    LOCAL_EMBEDDING_BATCH_SIZE: int = int(os.getenv("LOCAL_EMBEDDING_BATCH_SIZE", "32"))
+    LOCAL_EMBEDDING_THREADS: int = int(os.getenv("LOCAL_EMBEDDING_THREADS", "2"))
+    LOCAL_EMBEDDING_MAX_LENGTH: int = int(os.getenv("LOCAL_EMBEDDING_MAX_LENGTH", "128"))
+    # connection pool size and request timeout (seconds) for the embeddings API
+    EMBEDDING_MAX_CONNECTIONS: int = int(os.getenv("EMBEDDING_MAX_CONNECTIONS", "20"))
+    EMBEDDING_TIMEOUT: float = float(os.getenv("EMBEDDING_TIMEOUT", "10"))
+
+    # designation queries ("COMP SCI 300") are answered from the course code index,
+    # set this to fill the remaining result slots with vector search results as well
+    CODE_LOOKUP_FILL: bool = os.getenv("CODE_LOOKUP_FILL", "false").lower() == "true"
+
+    # FAISS index settings for vector search
+    # each index (title / code) can use its own index type:
+    # "flat" (exact brute force), "ivf_flat", "hnsw", "ivf_pq",
+    # or the compressed "sq_fp16" (float16), "sq8" (int8) and "pq" (product quantized)
+    TITLE_INDEX_TYPE: str = os.getenv("TITLE_INDEX_TYPE", "flat")
+    CODE_INDEX_TYPE: str = os.getenv("CODE_INDEX_TYPE", "flat")
+    # number of IVF clusters, 0 means derive it from the number of vectors (about 4 * sqrt(n))
+    IVF_NLIST: int = int(os.getenv("IVF_NLIST", "0"))
+    # how many IVF clusters are scanned per query, higher is slower but more accurate
+    IVF_NPROBE: int = int(os.getenv("IVF_NPROBE", "16"))
+    # HNSW graph degree and the size of the candidate lists used when building / searching
+    HNSW_M: int = int(os.getenv("HNSW_M", "32"))
+    HNSW_EF_CONSTRUCTION: int = int(os.getenv("HNSW_EF_CONSTRUCTION", "80"))
+    HNSW_EF_SEARCH: int = int(os.getenv("HNSW_EF_SEARCH", "64"))
+    # product quantizer layout for "ivf_pq", PQ_M must divide the embedding dimension (1536)
+    PQ_M: int = int(os.getenv("PQ_M", "96"))
+    PQ_NBITS: int = int(os.getenv("PQ_NBITS", "8"))
+    # quantized index types ("sq_fp16", "sq8", "pq", "ivf_pq") fetch this many times more candidates,
+    # which are re-ranked with exact scores from the full-precision vectors
+    RERANK_OVERFETCH: int = int(os.getenv("RERANK_OVERFETCH", "4"))
+    # how many vectors are read from MongoDB and added to the index at a time while building
+    INDEX_BUILD_BATCH_SIZE: int = int(os.getenv("INDEX_BUILD_BATCH_SIZE", "512"))
+    # keep the indexes in sync with course changes through a MongoDB change stream (needs a replica set)
+    CATALOG_WATCH_ENABLED: bool = os.getenv("CATALOG_WATCH_ENABLED", "true").lower() == "true"
+    # seconds to wait after a catalog change before publishing a new version of the changed index
+    INDEX_CACHE_FLUSH_DELAY: float = float(os.getenv("INDEX_CACHE_FLUSH_DELAY", "5"))
+    # directory of the versioned index artifacts, shared by all workers on the machine
+    INDEX_ARTIFACT_DIR: str = os.getenv("INDEX_ARTIFACT_DIR", "index_artifacts")
+    # how many versions of each index are kept on disk
+    INDEX_ARTIFACT_KEEP: int = int(os.getenv("INDEX_ARTIFACT_KEEP", "2"))
+    # seconds between checks for a newer index version published by another worker
+    INDEX_ARTIFACT_POLL_INTERVAL: float = float(os.getenv("INDEX_ARTIFACT_POLL_INTERVAL", "10"))
+    # seconds a worker waits at startup for another worker to publish an index before building it itself
+    INDEX_ARTIFACT_WAIT: float = float(os.getenv("INDEX_ARTIFACT_WAIT", "300"))
 
 # for testing
 # if __name__ == "__main__":
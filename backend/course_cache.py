@@ -0,0 +1,233 @@
+import asyncio
+import hashlib
+import logging
+import time
+from collections import OrderedDict
+from typing import Dict, Iterable, Optional
+
+from bson import ObjectId
+
+from backend.config import Settings
+from backend.responses import dumps
+
+# the fields search results show for each course
+SUMMARY_FIELDS = ("title", "credits")
+# the fields of the course detail page
+DETAIL_FIELDS = (
+    "title", "course_designation", "credits", "description", "last_taught",
+    "learning_outcomes", "repeatable", "requisites",
+)
+
+def changes_fields(change: Dict, fields: Iterable[str]) -> bool:
+    """Whether a change stream event can change any of the given top-level fields."""
+    if change["operationType"] != "update":
+        return True
+    description = change.get("updateDescription", {})
+    changed_fields = list(description.get("updatedFields", {})) + description.get("removedFields", [])
+    return any(field.split(".")[0] in fields for field in changed_fields)
+
+class CourseSummaryCache:
+    """
+    Bounded LRU cache of the title and credits of courses, used to hydrate search
+    results. Misses are fetched together in one projected $in query. Entries are
+    dropped on catalog changes, and expire after a TTL in case the change stream
+    isn't running.
+    """
+
+    def __init__(self, cache_size: int = Settings.COURSE_SUMMARY_CACHE_SIZE,
+                 ttl: float = Settings.COURSE_SUMMARY_CACHE_TTL):
+        self.cache_size = cache_size
+        self.ttl = ttl
+        # course id -> (expires at, summary)
+        self._cache: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def _remember(self, course_id: str, summary: Dict) -> None:
+        self._cache[course_id] = (time.monotonic() + self.ttl, summary)
+        self._cache.move_to_end(course_id)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def get_many(self, course_collection, course_ids: Iterable[str]) -> Dict[str, Dict]:
+        """Summaries of the given courses keyed by course id, courses that don't exist are left out."""
+        found: Dict[str, Dict] = {}
+        missing = []
+        now = time.monotonic()
+        for course_id in dict.fromkeys(course_ids):
+            entry = self._cache.get(course_id)
+            if entry is not None and entry[0] > now:
+                self._cache.move_to_end(course_id)
+                found[course_id] = entry[1]
+            else:
+                missing.append(course_id)
+        self.hits += len(found)
+        self.misses += len(missing)
+
+        if missing:
+            courses = await course_collection.find(
+                {"_id": {"$in": [ObjectId(course_id) for course_id in missing]}},
+                {"_id": 1, **{field: 1 for field in SUMMARY_FIELDS}}
+            ).to_list(length=None)
+            for course in courses:
+                course_id = str(course.pop("_id"))
+                self._remember(course_id, course)
+                found[course_id] = course
+        return found
+
+    def invalidate(self, course_id: str) -> None:
+        self._cache.pop(course_id, None)
+
+    def apply_change(self, change: Dict) -> None:
+        """Drop the summary of a course changed in course_collection (a change stream event)."""
+        if not changes_fields(change, SUMMARY_FIELDS):
+            return
+        course_id = str(change["documentKey"]["_id"])
+        if course_id in self._cache:
+            logging.debug(f"Dropped cached summary of course {course_id}")
+        self.invalidate(course_id)
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached": len(self._cache),
+        }
+
+class CourseCountCache:
+    """
+    The number of courses in the catalog, counted at most once per TTL. An expired
+    count is still returned while a fresh one is counted in the background, and
+    catalog inserts and deletes mark it expired.
+    """
+
+    def __init__(self, ttl: float = Settings.COURSE_COUNT_CACHE_TTL):
+        self.ttl = ttl
+        self._count = None
+        self._expires_at = 0.0
+        # bumped by every invalidation, a count that started before one stays expired
+        self._generation = 0
+        self._refresh_task = None
+
+    async def _refresh(self, course_collection) -> int:
+        generation = self._generation
+        self._count = await course_collection.count_documents({})
+        if generation == self._generation:
+            self._expires_at = time.monotonic() + self.ttl
+        return self._count
+
+    def _start_refresh(self, course_collection) -> asyncio.Task:
+        # concurrent callers share one count
+        if self._refresh_task is None or self._refresh_task.done():
+            self._refresh_task = asyncio.create_task(self._refresh(course_collection))
+        return self._refresh_task
+
+    async def get(self, course_collection) -> int:
+        if self._count is None:
+            return await self._start_refresh(course_collection)
+        if time.monotonic() >= self._expires_at:
+            self._start_refresh(course_collection)
+        return self._count
+
+    def invalidate(self) -> None:
+        self._generation += 1
+        self._expires_at = 0.0
+
+    def apply_change(self, change: Dict) -> None:
+        """Expire the count when a course_collection change stream event adds or removes a course."""
+        if change["operationType"] in ("insert", "delete"):
+            self.invalidate()
+
+class CachedCourse:
+    """
+    The rendered JSON body of a course detail response and its ETag. Courses have
+    no modification time, so there is no Last-Modified; a time of caching would
+    differ between workers and after every eviction.
+    """
+
+    def __init__(self, body: bytes, expires_at: float):
+        self.body = body
+        # the ETag is a hash of the body, so every worker gives the same document version the same tag
+        self.etag = f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"'
+        self.expires_at = expires_at
+
+class CourseDetailCache:
+    """
+    LRU cache of rendered course detail responses, bounded by the total size of
+    the cached bodies. Entries are dropped when the change stream reports an
+    update to one of the detail fields, and expire after a TTL in case the change
+    stream isn't running.
+    """
+
+    def __init__(self, max_bytes: int = Settings.COURSE_DETAIL_CACHE_BYTES,
+                 ttl: float = Settings.COURSE_DETAIL_CACHE_TTL):
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._cache: "OrderedDict[str, CachedCourse]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        # bumped by every change, a document read before a change isn't cached
+        self._generation = 0
+
+    def _remember(self, course_id: str, course: CachedCourse) -> None:
+        self.invalidate(course_id)
+        if len(course.body) > self.max_bytes:
+            return
+        self._cache[course_id] = course
+        self.bytes += len(course.body)
+        while self.bytes > self.max_bytes:
+            _, evicted = self._cache.popitem(last=False)
+            self.bytes -= len(evicted.body)
+
+    async def get(self, course_collection, course_id: str) -> Optional[CachedCourse]:
+        """The course's detail response, None if there is no such course."""
+        course = self._cache.get(course_id)
+        if course is not None and course.expires_at > time.monotonic():
+            self._cache.move_to_end(course_id)
+            self.hits += 1
+            return course
+        self.misses += 1
+
+        generation = self._generation
+        document = await course_collection.find_one(
+            {"_id": ObjectId(course_id)},
+            {"_id": 1, **{field: 1 for field in DETAIL_FIELDS}}
+        )
+        if document is None:
+            return None
+        document["id"] = str(document.pop("_id"))
+        # rendered the way the app's default ORJSONResponse renders it
+        course = CachedCourse(dumps(document), time.monotonic() + self.ttl)
+        if generation == self._generation:
+            self._remember(course_id, course)
+        return course
+
+    def invalidate(self, course_id: str) -> None:
+        course = self._cache.pop(course_id, None)
+        if course is not None:
+            self.bytes -= len(course.body)
+
+    def apply_change(self, change: Dict) -> None:
+        """Drop the cached details of a course changed in course_collection (a change stream event)."""
+        if changes_fields(change, DETAIL_FIELDS):
+            self._generation += 1
+            self.invalidate(str(change["documentKey"]["_id"]))
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.misses
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0,
+            "cached": len(self._cache),
+            "bytes": self.bytes,
+            "max_bytes": self.max_bytes,
+        }
+
+# Create singleton instances
+course_summary_cache = CourseSummaryCache()
+course_count_cache = CourseCountCache()
+course_detail_cache = CourseDetailCache()
@@ -0,0 +1,167 @@
+import asyncio
+import logging
+import re
+from bisect import bisect_left
+from typing import Dict, List, Optional, Tuple
+
+# a designation is one or more subjects separated by "/" followed by a course number,
+# e.g. "COMP SCI 300" or "E C E/COMP SCI 352" (cross-listed)
+DESIGNATION_PATTERN = re.compile(r"^\s*(?P<subjects>[A-Z&][A-Z& /]*?)\s*(?P<number>\d{1,3}[A-Z]?)\b")
+# a query that is nothing but a subject and a (possibly partial) course number, e.g. "CS 30"
+QUERY_PATTERN = re.compile(r"^\s*(?P<subject>[A-Z&][A-Z& ]*?)\s*(?P<number>\d{1,3}[A-Z]?)\s*$")
+
+# common short names students type, mapped to the normalized subject used in designations
+SUBJECT_ALIASES = {
+    "CS": "COMPSCI",
+    "COMPUTERSCIENCE": "COMPSCI",
+    "ECONOMICS": "ECON",
+    "STATS": "STAT",
+    "STATISTICS": "STAT",
+    "MATHEMATICS": "MATH",
+    "PSYCHOLOGY": "PSYCH",
+    "CHEMISTRY": "CHEM",
+    "BIO": "BIOLOGY",
+    "ENGLISH": "ENGL",
+    "ACCOUNTING": "ACCTIS",
+    "MECHENG": "ME",
+    "ELECENG": "ECE",
+}
+
+# similarity reported for exact and prefix matches, so they sort above vector search results
+EXACT_SIMILARITY = 1.0
+PREFIX_SIMILARITY = 0.95
+
+def normalize_subject(subject: str) -> str:
+    # spacing isn't consistent ("E C E" vs "ECE"), so subjects are compared without spaces
+    subject = re.sub(r"\s+", "", subject.upper())
+    return SUBJECT_ALIASES.get(subject, subject)
+
+def parse_designation(designation: str) -> List[Tuple[str, str]]:
+    """All (subject, number) codes of a designation, one per cross-listed subject."""
+    match = DESIGNATION_PATTERN.match(designation.upper())
+    if not match:
+        return []
+    number = match.group("number")
+    subjects = [normalize_subject(subject) for subject in match.group("subjects").split("/")]
+    return [(subject, number) for subject in subjects if subject]
+
+class CourseCodeIndex:
+    """
+    In-memory index over course designations and their cross-listed codes.
+    Answers "COMP SCI 300" / "CS 300" / "COMP SCI 30" style queries with exact
+    and prefix matches without any embedding or vector search.
+    """
+
+    def __init__(self):
+        # course id -> its (subject, number) codes, and code -> course ids
+        self._codes_of: Dict[str, List[Tuple[str, str]]] = {}
+        self._courses: Dict[Tuple[str, str], List[str]] = {}
+        # sorted "SUBJECT NUMBER" keys and subjects for prefix matching with bisect, re-sorted
+        # off the event loop after changes while lookups keep using the previous ones
+        self._keys: List[str] = []
+        self._subjects: List[str] = []
+        self._dirty = False
+        self._sort_task = None
+
+    def __len__(self) -> int:
+        return len(self._codes_of)
+
+    async def build(self, course_collection) -> None:
+        self._codes_of, self._courses = {}, {}
+        async for course in course_collection.find(
+            {"course_designation": {"$exists": True}},
+            {"_id": 1, "course_designation": 1}
+        ):
+            self._add(str(course["_id"]), course.get("course_designation"))
+        await self._resort()
+        logging.info(f"Course code index built with {len(self._keys)} codes for {len(self)} courses")
+
+    def _add(self, course_id: str, designation: Optional[str]) -> None:
+        codes = parse_designation(designation) if designation else []
+        if not codes:
+            return
+        self._codes_of[course_id] = codes
+        for code in codes:
+            self._courses.setdefault(code, []).append(course_id)
+        self._dirty = True
+
+    def _remove(self, course_id: str) -> None:
+        for code in self._codes_of.pop(course_id, []):
+            course_ids = self._courses.get(code, [])
+            if course_id in course_ids:
+                course_ids.remove(course_id)
+            if not course_ids:
+                self._courses.pop(code, None)
+        self._dirty = True
+
+    def _schedule_sort(self) -> None:
+        # a burst of changes is sorted in together
+        if self._dirty and (self._sort_task is None or self._sort_task.done()):
+            self._sort_task = asyncio.create_task(self._resort())
+
+    async def _resort(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._dirty:
+            self._dirty = False
+            self._keys, self._subjects = await loop.run_in_executor(None, self._sorted, list(self._courses))
+
+    @staticmethod
+    def _sorted(codes: List[Tuple[str, str]]) -> Tuple[List[str], List[str]]:
+        return (
+            sorted(f"{subject} {number}" for subject, number in codes),
+            sorted({subject for subject, _ in codes}),
+        )
+
+    def apply_change(self, change: Dict) -> None:
+        """Keep the index in sync with a course_collection change stream event."""
+        course_id = str(change["documentKey"]["_id"])
+        if change["operationType"] == "update":
+            description = change.get("updateDescription", {})
+            changed_fields = list(description.get("updatedFields", {})) + description.get("removedFields", [])
+            if "course_designation" not in changed_fields:
+                return
+        self._remove(course_id)
+        course = change.get("fullDocument")
+        if change["operationType"] != "delete" and course:
+            self._add(course_id, course.get("course_designation"))
+        self._schedule_sort()
+
+    def _prefixed(self, sorted_values: List[str], prefix: str) -> List[str]:
+        start = bisect_left(sorted_values, prefix)
+        end = start
+        while end < len(sorted_values) and sorted_values[end].startswith(prefix):
+            end += 1
+        return sorted_values[start:end]
+
+    def lookup(self, query: str, limit: int = 18) -> List[Dict]:
+        """
+        Courses matching a subject + number query, exact matches first, then courses
+        whose number starts with the query's number, then subjects that start with
+        the query's subject. Returns [] when the query doesn't look like a course code.
+        """
+        match = QUERY_PATTERN.match(query.upper())
+        if not match:
+            return []
+        subject = normalize_subject(match.group("subject"))
+        number = match.group("number")
+        
+        results: Dict[str, float] = {}
+        def collect(codes, similarity):
+            for code in codes:
+                for course_id in self._courses.get(code, []):
+                    results.setdefault(course_id, similarity)
+        
+        collect([(subject, number)], EXACT_SIMILARITY)
+        for key in self._prefixed(self._keys, f"{subject} {number}"):
+            collect([tuple(key.split(" "))], PREFIX_SIMILARITY)
+        for other_subject in self._prefixed(self._subjects, subject):
+            for key in self._prefixed(self._keys, f"{other_subject} {number}"):
+                collect([tuple(key.split(" "))], PREFIX_SIMILARITY)
+        
+        return [
+            {'id': course_id, 'similarity': similarity}
+            for course_id, similarity in list(results.items())[:limit]
+        ]
+
+# Create singleton instance
+course_code_index = CourseCodeIndex()
@@ -0,0 +1,211 @@
+import asyncio
+import heapq
+import logging
+import re
+from array import array
+from bisect import bisect_left
+from typing import Dict, List, Tuple
+
+from backend.course_codes import QUERY_PATTERN, SUBJECT_ALIASES, normalize_subject, parse_designation
+
+# most suggestions a single request may ask for
+MAX_SUGGESTIONS = 20
+# prefixes matching more entries than this are ranked once and remembered until the catalog changes
+SCAN_LIMIT = 256
+# at most this many broad prefixes are remembered, the rest are ranked per request
+MAX_BROAD_PREFIXES = 4096
+# words that don't start a suggestion on their own, "intro to programming" shouldn't match "TO"
+STOPWORDS = frozenset({"A", "AN", "AND", "FOR", "IN", "OF", "ON", "THE", "TO", "WITH"})
+
+# what a prefix matched, best first: a designation, the start of the title, a later word of the title
+DESIGNATION_MATCH, TITLE_MATCH, WORD_MATCH = 0, 1, 2
+# parts of a course's search text are separated by a character a query never contains
+SEPARATOR = "\x00"
+
+def normalize_text(text: str) -> str:
+    """Upper-cased letters, digits and "&" with single spaces, for titles, designations and queries alike."""
+    return " ".join(re.sub(r"[^A-Z0-9&]+", " ", text.upper()).split())
+
+class CourseSuggestIndex:
+    """
+    Typeahead over course titles and designations.
+
+    Every course has one normalized search text, its codes, designation and title
+    joined by SEPARATOR. The index is a sorted array of entries, each a course
+    ordinal and an offset into that text where a designation, the title or a word
+    of the title starts, so a prefix query is two bisects over the suffixes
+    starting at those offsets. No key strings are kept besides the texts.
+    """
+
+    def __init__(self):
+        # course id -> (title, designation), the source of truth the arrays are rebuilt from after changes
+        self._courses: Dict[str, Tuple[str, str]] = {}
+        # per course ordinal
+        self._ids: List[str] = []
+        self._titles: List[str] = []
+        self._designations: List[str] = []
+        self._texts: List[str] = []
+        # sorted entries (ordinal << 16 | offset) and the rank of each, lower is better
+        self._entries = array("Q")
+        self._scores = array("I")
+        # prefix -> its best MAX_SUGGESTIONS (score, ordinal), for prefixes too broad to rank per request
+        self._broad: Dict[str, List[Tuple[int, int]]] = {}
+        # changes are sorted in off the event loop, queries keep using the previous arrays until then
+        self._dirty = False
+        self._sort_task = None
+
+    def __len__(self) -> int:
+        return len(self._courses)
+
+    async def build(self, course_collection) -> None:
+        self._courses = {}
+        async for course in course_collection.find({}, {"_id": 1, "title": 1, "course_designation": 1}):
+            self._add(str(course["_id"]), course)
+        await self._resort()
+        logging.info(f"Course suggest index built with {len(self._entries)} entries for {len(self)} courses")
+
+    def _add(self, course_id: str, course: Dict) -> None:
+        title = course.get("title") or ""
+        designation = course.get("course_designation") or ""
+        if not (normalize_text(title) or normalize_text(designation)):
+            return
+        self._courses[course_id] = (title, designation)
+        self._dirty = True
+
+    def _remove(self, course_id: str) -> None:
+        if self._courses.pop(course_id, None) is not None:
+            self._dirty = True
+
+    def apply_change(self, change: Dict) -> None:
+        """Keep the index in sync with a course_collection change stream event."""
+        course_id = str(change["documentKey"]["_id"])
+        if change["operationType"] == "update":
+            description = change.get("updateDescription", {})
+            changed_fields = list(description.get("updatedFields", {})) + description.get("removedFields", [])
+            if "title" not in changed_fields and "course_designation" not in changed_fields:
+                return
+        self._remove(course_id)
+        course = change.get("fullDocument")
+        if change["operationType"] != "delete" and course:
+            self._add(course_id, course)
+        self._schedule_sort()
+
+    def _schedule_sort(self) -> None:
+        # a burst of changes is sorted in together
+        if self._dirty and (self._sort_task is None or self._sort_task.done()):
+            self._sort_task = asyncio.create_task(self._resort())
+
+    async def _resort(self) -> None:
+        loop = asyncio.get_running_loop()
+        while self._dirty:
+            self._dirty = False
+            arrays = await loop.run_in_executor(None, self._sorted, dict(self._courses))
+            # swapped in one step between two queries
+            self._ids, self._titles, self._designations, self._texts, self._entries, self._scores = arrays
+            self._broad = {}
+
+    @staticmethod
+    def _sorted(courses: Dict[str, Tuple[str, str]]) -> tuple:
+        """The per-course lists and the sorted entries and scores of courses, runs in an executor."""
+        ids, titles, designations, texts = [], [], [], []
+        entries, scores = [], []
+        for ordinal, (course_id, (title, designation)) in enumerate(courses.items()):
+            # "COMPSCI 300" for each cross-listed subject, then the designation as written, then the title
+            parts = [f"{subject} {number}" for subject, number in parse_designation(designation)]
+            parts.append(normalize_text(designation))
+            starts, offset = [], 0
+            for part in parts:
+                if part:
+                    starts.append((offset, DESIGNATION_MATCH))
+                offset += len(part) + len(SEPARATOR)
+            normalized_title = normalize_text(title)
+            for position, word in enumerate(normalized_title.split(" ")):
+                if position == 0:
+                    starts.append((offset, TITLE_MATCH))
+                elif word not in STOPWORDS:
+                    starts.append((offset, WORD_MATCH))
+                offset += len(word) + 1
+            text = SEPARATOR.join(parts + [normalized_title])
+            # shorter titles first within a kind of match, "Calculus" before "Calculus and Analytic Geometry"
+            length = min(len(title), 1023)
+            for start, kind in starts:
+                if start < 1 << 16 and start < len(text):
+                    entries.append(ordinal << 16 | start)
+                    scores.append(kind << 10 | length)
+            ids.append(course_id)
+            titles.append(title)
+            designations.append(designation)
+            texts.append(text)
+
+        order = sorted(range(len(entries)), key=lambda i: texts[entries[i] >> 16][entries[i] & 0xFFFF:])
+        return (
+            ids, titles, designations, texts,
+            array("Q", (entries[i] for i in order)),
+            array("I", (scores[i] for i in order)),
+        )
+
+    def _suffix(self, entry: int) -> str:
+        return self._texts[entry >> 16][entry & 0xFFFF:]
+
+    def _rank(self, start: int, end: int, limit: int) -> List[Tuple[int, int]]:
+        # a course can match a prefix more than once (title and a word of it), it counts with its best match
+        best: Dict[int, int] = {}
+        entries, scores = self._entries, self._scores
+        for i in range(start, end):
+            ordinal = entries[i] >> 16
+            score = scores[i]
+            if score < best.get(ordinal, 1 << 32):
+                best[ordinal] = score
+        ranked = heapq.nsmallest(limit, best, key=lambda ordinal: (best[ordinal], self._titles[ordinal]))
+        return [(best[ordinal], ordinal) for ordinal in ranked]
+
+    def _matches(self, prefix: str, limit: int) -> List[Tuple[int, int]]:
+        """The best (score, ordinal) of the courses matching prefix."""
+        start = bisect_left(self._entries, prefix, key=self._suffix)
+        end = bisect_left(self._entries, prefix + "\uffff", lo=start, key=self._suffix)
+        if end - start <= SCAN_LIMIT:
+            return self._rank(start, end, limit)
+        ranked = self._broad.get(prefix)
+        if ranked is None:
+            ranked = self._rank(start, end, MAX_SUGGESTIONS)
+            if len(self._broad) < MAX_BROAD_PREFIXES:
+                self._broad[prefix] = ranked
+        return ranked[:limit]
+
+    def _prefixes(self, query: str) -> List[str]:
+        prefixes = [query]
+        # "CS 30" finds "COMPSCI 300", and "CS" the COMPSCI courses
+        match = QUERY_PATTERN.match(query)
+        if match:
+            prefixes.append(f"{normalize_subject(match.group('subject'))} {match.group('number')}")
+        alias = SUBJECT_ALIASES.get(query.replace(" ", ""))
+        if alias:
+            prefixes.append(f"{alias} ")
+        return prefixes
+
+    def suggest(self, query: str, limit: int = 8) -> List[Dict]:
+        """Courses whose designation, title or a word of the title starts with the query, best matches first."""
+        normalized = normalize_text(query)
+        if not normalized:
+            return []
+        # a trailing space means the last word is complete, "CALC " shouldn't match "CALCULUS"
+        if query[-1:].isspace():
+            normalized += " "
+        limit = min(limit, MAX_SUGGESTIONS)
+
+        scores: Dict[int, int] = {}
+        for prefix in dict.fromkeys(self._prefixes(normalized)):
+            for score, ordinal in self._matches(prefix, limit):
+                scores[ordinal] = min(score, scores.get(ordinal, score))
+        ranked = sorted(scores, key=lambda ordinal: (scores[ordinal], self._titles[ordinal]))[:limit]
+        return [
+            {
+                "id": self._ids[ordinal],
+                "title": self._titles[ordinal],
+                "course_designation": self._designations[ordinal],
+            }
+            for ordinal in ranked
+        ]
+
+# Create singleton instance
+course_suggest_index = CourseSuggestIndex()
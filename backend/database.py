@@ -1,7 +1,9 @@
 from motor.motor_asyncio import AsyncIOMotorClient
 from backend.config import Settings
+from backend.metrics import mongo_command_metrics
 
-client = AsyncIOMotorClient(Settings.MONGODB_URI)
+# the listener records the latency of every command for /metrics
+client = AsyncIOMotorClient(Settings.MONGODB_URI, event_listeners=[mongo_command_metrics])
 db = client.uwmatch  # Database name
 user_collection = db.users
 course_collection = db.courses
@@ -0,0 +1,113 @@
+"""
+MongoDB indexes the app's queries rely on, created at startup, and a query plan
+check that fails when one of the hot queries would scan a whole collection.
+
+    python -m backend.db_indexes          # create the indexes and check the plans
+"""
+import asyncio
+import logging
+import sys
+from typing import Dict, List, Tuple
+
+from pymongo import ASCENDING, IndexModel
+from pymongo.errors import OperationFailure
+
+# indexes of each collection, by collection name
+INDEXES: Dict[str, List[IndexModel]] = {
+    "users": [
+        # auth.get_user and every auth route look users up by email
+        IndexModel([("email", ASCENDING)], name="email_unique", unique=True),
+        # sign-ups that were never verified are removed once their verification token expires,
+        # the partial filter keeps the index away from verified users that still carry a token
+        IndexModel(
+            [("token_expiration", ASCENDING)], name="token_expiration_ttl", expireAfterSeconds=0,
+            partialFilterExpression={"verified": False},
+        ),
+    ],
+    "saved_courses": [
+        # save_course toggles on (user_id, course_id), get_saved_courses filters on user_id alone
+        IndexModel([("user_id", ASCENDING), ("course_id", ASCENDING)], name="user_course_unique", unique=True),
+    ],
+    "roadmap": [
+        # change_roadmap upserts on all four fields, get_roadmap filters on userId alone
+        IndexModel(
+            [("userId", ASCENDING), ("courseId", ASCENDING), ("year", ASCENDING), ("term", ASCENDING)],
+            name="user_course_term_unique", unique=True,
+        ),
+    ],
+}
+
+# the filters of the hot per-user queries, with placeholder values
+HOT_QUERIES: List[Tuple[str, Dict]] = [
+    ("users", {"email": "student@wisc.edu"}),
+    ("saved_courses", {"user_id": "user", "course_id": "course"}),
+    ("saved_courses", {"user_id": "user"}),
+    ("roadmap", {"userId": "user"}),
+    ("roadmap", {"userId": "user", "courseId": "course", "year": 2025, "term": "Fall"}),
+]
+
+class CollectionScanError(RuntimeError):
+    """Raised when a hot query's winning plan is a collection scan."""
+
+async def ensure_indexes(db) -> None:
+    """
+    Create the declared indexes, existing ones are left alone. They are created one
+    at a time: create_indexes fails as a whole, so duplicates blocking one unique
+    index would also keep e.g. the users TTL index from being created.
+    """
+    for collection_name, indexes in INDEXES.items():
+        for index in indexes:
+            name = index.document["name"]
+            try:
+                await db[collection_name].create_indexes([index])
+                logging.info(f"Index {collection_name}.{name} is in place")
+            except OperationFailure as e:
+                # e.g. duplicates that block a unique index, the app still works without it
+                logging.error(f"Could not create the index {collection_name}.{name}: {e}")
+
+def plan_stages(plan: Dict) -> List[str]:
+    """All stage names of an explain() plan tree."""
+    stages = [plan["stage"]] if "stage" in plan else []
+    for value in plan.values():
+        children = value if isinstance(value, list) else [value]
+        for child in children:
+            if isinstance(child, dict):
+                stages.extend(plan_stages(child))
+    return stages
+
+async def check_query_plans(db) -> Dict[str, List[str]]:
+    """
+    Explain every hot query and raise CollectionScanError if any of them would use
+    a COLLSCAN. Returns the stages of each query's winning plan.
+    """
+    plans, scans = {}, []
+    for collection_name, query in HOT_QUERIES:
+        explanation = await db.command({
+            "explain": {"find": collection_name, "filter": query},
+            "verbosity": "queryPlanner",
+        })
+        stages = plan_stages(explanation["queryPlanner"]["winningPlan"])
+        description = f"{collection_name} {sorted(query)}"
+        plans[description] = stages
+        if "COLLSCAN" in stages:
+            scans.append(description)
+    if scans:
+        raise CollectionScanError(f"Queries without a usable index: {'; '.join(scans)}")
+    return plans
+
+async def main() -> int:
+    from backend.database import db
+
+    await ensure_indexes(db)
+    try:
+        plans = await check_query_plans(db)
+    except CollectionScanError as e:
+        print(e)
+        return 1
+    for description, stages in plans.items():
+        print(f"{description}: {' <- '.join(stages)}")
+    return 0
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    sys.exit(asyncio.run(main()))
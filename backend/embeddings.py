@@ -0,0 +1,355 @@
+import asyncio
+import logging
+from abc import ABC, abstractmethod
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+import httpx
+import numpy as np
+from openai import AsyncOpenAI
+
+from backend.config import Settings
+from backend.singleflight import SingleFlight
+
+try:
+    import onnxruntime
+    from tokenizers import Tokenizer
+except ImportError:  # only the local provider needs them
+    onnxruntime = Tokenizer = None
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+def normalize_query(text: str) -> str:
+    """Queries are embedded upper-cased with collapsed whitespace, this is also the cache key."""
+    return " ".join(text.upper().split())
+
+class DiskEmbeddingCache:
+    """
+    SQLite file holding query embeddings, shared by all workers on the machine
+    and kept across restarts. Calls are blocking, run them in an executor.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        # sqlite connections can't be shared between threads, so each executor thread opens its own
+        self._local = threading.local()
+
+    def _connection(self) -> sqlite3.Connection:
+        connection = getattr(self._local, "connection", None)
+        if connection is None:
+            connection = sqlite3.connect(self.path, timeout=5)
+            connection.execute("PRAGMA journal_mode=WAL")
+            connection.execute(
+                "CREATE TABLE IF NOT EXISTS embeddings ("
+                "model TEXT NOT NULL, text TEXT NOT NULL, embedding BLOB NOT NULL, "
+                "PRIMARY KEY (model, text))"
+            )
+            self._local.connection = connection
+        return connection
+
+    def get(self, model: str, text: str) -> Optional[np.ndarray]:
+        row = self._connection().execute(
+            "SELECT embedding FROM embeddings WHERE model = ? AND text = ?", (model, text)
+        ).fetchone()
+        return np.frombuffer(row[0], dtype=np.float32) if row else None
+
+    def set(self, model: str, text: str, embedding: np.ndarray) -> None:
+        connection = self._connection()
+        connection.execute(
+            "INSERT OR REPLACE INTO embeddings (model, text, embedding) VALUES (?, ?, ?)",
+            (model, text, embedding.astype(np.float32).tobytes()),
+        )
+        connection.commit()
+
+class EmbeddingProvider(ABC):
+    """
+    Turns texts into embeddings. name identifies the vector space: query caches
+    and published indexes are kept apart per name, so indexes built with one
+    provider are never searched with another provider's queries.
+
+    has_stored_embeddings is True when the courses carry this provider's catalog
+    vectors (title_embedding and code_embeddings); otherwise the indexes embed the
+    course titles and designations themselves when they are built.
+    """
+    name: str
+    dimension: int
+    has_stored_embeddings = False
+
+    @abstractmethod
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        """Embeddings of the texts as a (len(texts), dimension) float32 array, in input order."""
+
+    async def load(self) -> None:
+        """Get ready to embed (e.g. load a model), called at startup so the first search doesn't wait for it."""
+
+    async def close(self) -> None:
+        pass
+
+class OpenAIEmbeddingProvider(EmbeddingProvider):
+    """text-embedding-3-small over the API, the client keeps a pool of open connections."""
+    has_stored_embeddings = True
+
+    def __init__(self, model: str = EMBEDDING_MODEL, dimension: int = 1536):
+        self.name = model
+        self.dimension = dimension
+        self._client: Optional[AsyncOpenAI] = None
+
+    @property
+    def client(self) -> AsyncOpenAI:
+        # created on first use so importing this module doesn't require an API key
+        if self._client is None:
+            self._client = AsyncOpenAI(
+                api_key=os.getenv('OPENAI_API_KEY'),
+                http_client=httpx.AsyncClient(
+                    limits=httpx.Limits(
+                        max_connections=Settings.EMBEDDING_MAX_CONNECTIONS,
+                        max_keepalive_connections=Settings.EMBEDDING_MAX_CONNECTIONS,
+                    ),
+                    timeout=httpx.Timeout(Settings.EMBEDDING_TIMEOUT),
+                ),
+            )
+        return self._client
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        response = await self.client.embeddings.create(input=texts, model=self.name)
+        embeddings = np.empty((len(texts), self.dimension), dtype=np.float32)
+        for item in response.data:
+            embeddings[item.index] = item.embedding
+        return embeddings
+
+    async def close(self) -> None:
+        if self._client is not None:
+            await self._client.close()
+            self._client = None
+
+class OnnxEmbeddingProvider(EmbeddingProvider):
+    """
+    A sentence-embedding model exported to ONNX (e.g. all-MiniLM-L6-v2) run on the
+    CPU of this worker, with its tokenizer.json from the Hugging Face tokenizers
+    library. Texts are embedded in batches on a small thread pool; onnxruntime
+    releases the GIL, so concurrent batches run in parallel. Token embeddings are
+    mean-pooled over the attention mask and normalized.
+    """
+
+    def __init__(self, model_path: str, tokenizer_path: str = "", batch_size: int = 32,
+                 threads: int = 2, max_length: int = 128):
+        if onnxruntime is None:
+            raise RuntimeError("The onnx embedding provider needs the onnxruntime and tokenizers packages")
+        self.name = f"onnx:{os.path.splitext(os.path.basename(model_path))[0]}"
+        self.model_path = model_path
+        self.tokenizer_path = tokenizer_path or os.path.join(os.path.dirname(model_path), "tokenizer.json")
+        self.batch_size = batch_size
+        self.threads = threads
+        self.max_length = max_length
+        self._session = None
+        self._tokenizer = None
+        self._dimension = None
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="embeddings")
+        self._load_lock = threading.Lock()
+
+    def _load(self) -> None:
+        # loaded at startup by load(), importing this module doesn't pay for it
+        with self._load_lock:
+            if self._session is not None:
+                return
+            options = onnxruntime.SessionOptions()
+            # parallelism comes from the thread pool, one thread per batch avoids oversubscribing the CPU
+            options.intra_op_num_threads = 1
+            session = onnxruntime.InferenceSession(self.model_path, options, providers=["CPUExecutionProvider"])
+            tokenizer = Tokenizer.from_file(self.tokenizer_path)
+            tokenizer.enable_truncation(self.max_length)
+            tokenizer.enable_padding()
+            self._tokenizer = tokenizer
+            self._session = session
+            size = session.get_outputs()[0].shape[-1]
+            self._dimension = size if isinstance(size, int) else self._embed_batch(["dimension"]).shape[1]
+            logging.info(f"Loaded embedding model {self.model_path} ({self._dimension} dimensions)")
+
+    async def load(self) -> None:
+        if self._session is None:
+            await asyncio.get_running_loop().run_in_executor(self._executor, self._load)
+
+    @property
+    def dimension(self) -> int:
+        if self._session is None:
+            # only without load() having run, e.g. in scripts
+            self._load()
+        return self._dimension
+
+    def _embed_batch(self, texts: List[str]) -> np.ndarray:
+        # runs in the executor
+        encodings = self._tokenizer.encode_batch(texts)
+        input_ids = np.array([encoding.ids for encoding in encodings], dtype=np.int64)
+        attention_mask = np.array([encoding.attention_mask for encoding in encodings], dtype=np.int64)
+        feeds = {"input_ids": input_ids, "attention_mask": attention_mask}
+        if any(model_input.name == "token_type_ids" for model_input in self._session.get_inputs()):
+            feeds["token_type_ids"] = np.zeros_like(input_ids)
+        output = self._session.run(None, feeds)[0]
+        if output.ndim == 3:
+            # (batch, tokens, dimension) token embeddings, mean-pooled over the real tokens
+            mask = attention_mask[:, :, None].astype(np.float32)
+            output = (output * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        output = output.astype(np.float32)
+        norms = np.linalg.norm(output, axis=1, keepdims=True)
+        np.divide(output, norms, out=output, where=norms > 0)
+        return output
+
+    async def embed_texts(self, texts: List[str]) -> np.ndarray:
+        await self.load()
+        loop = asyncio.get_running_loop()
+        batches = await asyncio.gather(*[
+            loop.run_in_executor(self._executor, self._embed_batch, texts[start:start + self.batch_size])
+            for start in range(0, len(texts), self.batch_size)
+        ])
+        return np.concatenate(batches) if batches else np.empty((0, self.dimension), dtype=np.float32)
+
+    async def close(self) -> None:
+        self._executor.shutdown(wait=False)
+
+def create_provider(name: str = Settings.EMBEDDING_PROVIDER) -> EmbeddingProvider:
+    """The embedding provider this deployment is configured with (EMBEDDING_PROVIDER)."""
+    if name == "openai":
+        return OpenAIEmbeddingProvider()
+    if name == "onnx":
+        return OnnxEmbeddingProvider(
+            Settings.LOCAL_EMBEDDING_MODEL,
+            Settings.LOCAL_EMBEDDING_TOKENIZER,
+            batch_size=Settings.LOCAL_EMBEDDING_BATCH_SIZE,
+            threads=Settings.LOCAL_EMBEDDING_THREADS,
+            max_length=Settings.LOCAL_EMBEDDING_MAX_LENGTH,
+        )
+    raise ValueError(f"Unknown embedding provider {name!r}, expected 'openai' or 'onnx'")
+
+class EmbeddingService:
+    """
+    Async query embeddings from the configured provider, with a bounded in-memory
+    LRU cache and an optional on-disk cache.
+    """
+
+    def __init__(self, provider: EmbeddingProvider, cache_size: int = Settings.EMBEDDING_CACHE_SIZE,
+                 disk_cache_path: str = Settings.EMBEDDING_DISK_CACHE):
+        self.provider = provider
+        self.cache_size = cache_size
+        self._cache: "OrderedDict[tuple, np.ndarray]" = OrderedDict()
+        self._disk_cache = DiskEmbeddingCache(disk_cache_path) if disk_cache_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+        self._pending = SingleFlight("embedding")
+
+    @property
+    def model(self) -> str:
+        # cache entries are keyed by the provider, embeddings of different spaces never mix
+        return self.provider.name
+
+    def _remember(self, key: tuple, embedding: np.ndarray) -> None:
+        self._cache[key] = embedding
+        self._cache.move_to_end(key)
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    async def embed(self, text: str) -> np.ndarray:
+        """Embedding (float32 array) of the normalized query text."""
+        text = normalize_query(text)
+        key = (self.model, text)
+        
+        embedding = self._cache.get(key)
+        if embedding is not None:
+            self._cache.move_to_end(key)
+            self.hits += 1
+            return embedding
+        
+        # concurrent misses of the same query share one disk lookup and provider call
+        return await self._pending.do(key, lambda: self._load(key))
+
+    async def _load(self, key: tuple) -> np.ndarray:
+        model, text = key
+        embedding = None
+        loop = asyncio.get_running_loop()
+        if self._disk_cache:
+            try:
+                embedding = await loop.run_in_executor(None, self._disk_cache.get, model, text)
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding disk cache read failed: {e}")
+            if embedding is not None:
+                self.disk_hits += 1
+                self._remember(key, embedding)
+                return embedding
+        
+        self.misses += 1
+        embedding = (await self.provider.embed_texts([text]))[0]
+        self._remember(key, embedding)
+        if self._disk_cache:
+            try:
+                await loop.run_in_executor(None, self._disk_cache.set, model, text, embedding)
+            except sqlite3.Error as e:
+                logging.warning(f"Embedding disk cache write failed: {e}")
+        return embedding
+
+    async def embed_many(self, texts: List[str]) -> List[np.ndarray]:
+        """Embeddings of several queries, the ones not cached are fetched in a single API request."""
+        keys = [(self.model, normalize_query(text)) for text in texts]
+        found: Dict[tuple, np.ndarray] = {}
+        missing = []
+        for key in dict.fromkeys(keys):
+            embedding = self._cache.get(key)
+            if embedding is not None:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                found[key] = embedding
+            else:
+                missing.append(key)
+        
+        loop = asyncio.get_running_loop()
+        if missing and self._disk_cache:
+            still_missing = []
+            for key in missing:
+                try:
+                    embedding = await loop.run_in_executor(None, self._disk_cache.get, *key)
+                except sqlite3.Error as e:
+                    logging.warning(f"Embedding disk cache read failed: {e}")
+                    embedding = None
+                if embedding is not None:
+                    self.disk_hits += 1
+                    self._remember(key, embedding)
+                    found[key] = embedding
+                else:
+                    still_missing.append(key)
+            missing = still_missing
+        
+        if missing:
+            self.misses += len(missing)
+            embeddings = await self.provider.embed_texts([text for _, text in missing])
+            for key, embedding in zip(missing, embeddings):
+                found[key] = embedding
+                self._remember(key, found[key])
+                if self._disk_cache:
+                    try:
+                        await loop.run_in_executor(None, self._disk_cache.set, *key, found[key])
+                    except sqlite3.Error as e:
+                        logging.warning(f"Embedding disk cache write failed: {e}")
+        
+        return [found[key] for key in keys]
+
+    def stats(self) -> Dict:
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits + self.disk_hits) / lookups if lookups else 0.0,
+            "cached": len(self._cache),
+        }
+
+    async def load(self) -> None:
+        await self.provider.load()
+
+    async def close(self) -> None:
+        await self.provider.close()
+
+# Create singleton instance
+embedding_service = EmbeddingService(create_provider())
@@ -0,0 +1,198 @@
+import fcntl
+import json
+import logging
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+import faiss
+import numpy as np
+
+# bumped whenever the layout of a version directory changes, older artifacts are ignored
+ARTIFACT_FORMAT = 1
+
+INDEX_FILE = "index.faiss"
+ORDINALS_FILE = "ordinals.npy"
+COURSES_FILE = "courses.json"
+VECTORS_FILE = "vectors.npy"
+META_FILE = "meta.json"
+CURRENT_FILE = "CURRENT"
+
+class MmapFlatIndex:
+    """
+    Exact inner-product search over a (memory-mapped) vector matrix.
+    Used instead of IndexFlatIP for artifacts so every worker searches the same
+    page-cache copy of vectors.npy; vector ids are row numbers.
+    """
+
+    is_trained = True
+
+    def __init__(self, vectors: np.ndarray):
+        self.vectors = vectors
+        self.d = vectors.shape[1]
+
+    @property
+    def ntotal(self) -> int:
+        return len(self.vectors)
+
+    def search(self, queries: np.ndarray, k: int):
+        k = min(k, self.ntotal)
+        scores = queries @ self.vectors.T
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        D = np.take_along_axis(scores, top, axis=1)
+        order = np.argsort(-D, axis=1, kind="stable")
+        return np.take_along_axis(D, order, axis=1), np.take_along_axis(top, order, axis=1).astype(np.int64)
+
+class Artifact:
+    """One loaded version of an index: the index, its id tables and metadata."""
+
+    def __init__(self, version: str, index, vector_ordinals: np.ndarray, course_table: List[str],
+                 vectors: Optional[np.ndarray], meta: Dict):
+        self.version = version
+        self.index = index
+        self.vector_ordinals = vector_ordinals
+        self.course_table = course_table
+        self.vectors = vectors
+        self.meta = meta
+
+class ArtifactStore:
+    """
+    Versioned on-disk index artifacts shared by all workers of a deployment.
+
+    Each index ("title", "code") gets a directory with one subdirectory per version
+    and a CURRENT file naming the live one. A version is written completely under a
+    temporary name and published by renaming it and replacing CURRENT, so readers
+    never see a half-written version. Files are memory-mapped on load, workers that
+    load the same version share its pages through the OS page cache.
+    """
+
+    def __init__(self, root: str, keep: int = 2):
+        self.root = root
+        # versions kept on disk, older ones are removed when a new version is published
+        self.keep = keep
+        self._publisher_lock = None
+
+    def _index_dir(self, name: str) -> str:
+        return os.path.join(self.root, name)
+
+    @contextmanager
+    def _locked(self, name: str):
+        # serializes publishers of the same index across processes
+        os.makedirs(self._index_dir(name), exist_ok=True)
+        with open(os.path.join(self._index_dir(name), ".lock"), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def try_become_publisher(self) -> bool:
+        """
+        Take the store-wide publisher lock without blocking. Only the worker holding it
+        builds and publishes indexes, the others load what it publishes. The lock is
+        released when the process exits, so another worker can take over.
+        """
+        if self._publisher_lock is not None:
+            return True
+        os.makedirs(self.root, exist_ok=True)
+        lock_file = open(os.path.join(self.root, ".publisher"), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            return False
+        self._publisher_lock = lock_file
+        return True
+
+    def current_version(self, name: str) -> Optional[str]:
+        try:
+            with open(os.path.join(self._index_dir(name), CURRENT_FILE)) as f:
+                return f.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def publish(self, name: str, index, vector_ordinals: np.ndarray, course_table: List[str],
+                vectors: Optional[np.ndarray], meta: Dict) -> str:
+        """Write a new version and make it the current one, returns the version name."""
+        with self._locked(name):
+            index_dir = self._index_dir(name)
+            version = f"v{int(time.time() * 1000)}-{os.getpid()}"
+            tmp_dir = os.path.join(index_dir, f".tmp-{version}")
+            os.makedirs(tmp_dir)
+            try:
+                if index is not None:
+                    faiss.write_index(index, os.path.join(tmp_dir, INDEX_FILE))
+                np.save(os.path.join(tmp_dir, ORDINALS_FILE), np.asarray(vector_ordinals, dtype=np.int32))
+                if vectors is not None:
+                    np.save(os.path.join(tmp_dir, VECTORS_FILE), vectors)
+                with open(os.path.join(tmp_dir, COURSES_FILE), "w") as f:
+                    json.dump(course_table, f)
+                with open(os.path.join(tmp_dir, META_FILE), "w") as f:
+                    json.dump({**meta, "format": ARTIFACT_FORMAT, "version": version}, f)
+                os.rename(tmp_dir, os.path.join(index_dir, version))
+            except BaseException:
+                shutil.rmtree(tmp_dir, ignore_errors=True)
+                raise
+
+            current_tmp = os.path.join(index_dir, f"{CURRENT_FILE}.tmp")
+            with open(current_tmp, "w") as f:
+                f.write(version)
+            os.replace(current_tmp, os.path.join(index_dir, CURRENT_FILE))
+            self._prune(index_dir, version)
+        return version
+
+    def _prune(self, index_dir: str, current: str) -> None:
+        # workers still using an old version keep their mappings after its files are unlinked
+        versions = sorted(
+            (entry for entry in os.listdir(index_dir) if entry.startswith("v") and entry != current),
+            key=lambda entry: int(entry[1:].split("-")[0]),
+        )
+        for version in versions[:max(0, len(versions) - (self.keep - 1))]:
+            shutil.rmtree(os.path.join(index_dir, version), ignore_errors=True)
+
+    def load(self, name: str, version: Optional[str] = None, expected: Dict = None) -> Optional[Artifact]:
+        """
+        Memory-map a version (the current one by default). Returns None if there is no
+        version, or its metadata doesn't match the expected values (format, model, ...).
+        Raises FileNotFoundError if the version was pruned while it was being loaded.
+        """
+        version = version or self.current_version(name)
+        if version is None:
+            return None
+        version_dir = os.path.join(self._index_dir(name), version)
+        with open(os.path.join(version_dir, META_FILE)) as f:
+            meta = json.load(f)
+        mismatched = {
+            key: meta.get(key)
+            for key, value in {"format": ARTIFACT_FORMAT, **(expected or {})}.items()
+            if meta.get(key) != value
+        }
+        if mismatched:
+            logging.info(f"Ignoring index artifact {name}/{version}, it doesn't match the settings: {mismatched}")
+            return None
+
+        vectors_file = os.path.join(version_dir, VECTORS_FILE)
+        vectors = np.load(vectors_file, mmap_mode="r") if os.path.exists(vectors_file) else None
+        index_file = os.path.join(version_dir, INDEX_FILE)
+        if os.path.exists(index_file):
+            # IVF inverted lists are mapped from the file, other index types are read into memory
+            try:
+                index = faiss.read_index(index_file, faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY)
+            except RuntimeError:
+                # FAISS reports a file that disappeared as a generic error
+                if not os.path.exists(index_file):
+                    raise FileNotFoundError(index_file)
+                raise
+        else:
+            index = MmapFlatIndex(vectors)
+        # ordinals are copied since catalog changes tombstone entries in place
+        vector_ordinals = np.load(os.path.join(version_dir, ORDINALS_FILE))
+        with open(os.path.join(version_dir, COURSES_FILE)) as f:
+            course_table = json.load(f)
+        return Artifact(version, index, vector_ordinals, course_table, vectors, meta)
+
+    def read_writable_index(self, name: str, version: str):
+        """Read a version's FAISS index fully into memory, so vectors can be added to it."""
+        return faiss.read_index(os.path.join(self._index_dir(name), version, INDEX_FILE))
@@ -0,0 +1,145 @@
+import asyncio
+import logging
+import smtplib
+from concurrent.futures import ThreadPoolExecutor
+from email.message import Message
+from typing import Dict, List, Optional
+
+from backend.config import Settings
+
+# failures that won't go away by sending again
+PERMANENT_ERRORS = (smtplib.SMTPRecipientsRefused, smtplib.SMTPNotSupportedError)
+
+def is_permanent(error: Exception) -> bool:
+    if isinstance(error, PERMANENT_ERRORS):
+        return True
+    # 5xx replies are permanent, 4xx ones (greylisting, rate limits) are worth retrying
+    return isinstance(error, smtplib.SMTPResponseException) and 500 <= error.smtp_code < 600
+
+class MailQueueFull(Exception):
+    """Raised when a message is enqueued while the outbound queue is full."""
+
+class Mailer:
+    """
+    Outbound email queue. Routes enqueue messages and return right away; a few
+    background senders deliver them, each over its own SMTP connection that stays
+    open (STARTTLS and login happen once) and is re-opened when the server drops it.
+    smtplib is blocking, so the SMTP exchanges run in a dedicated thread pool.
+    Failed deliveries are retried with exponential backoff.
+    """
+
+    def __init__(self, concurrency: int = Settings.MAIL_CONCURRENCY, queue_size: int = Settings.MAIL_QUEUE_SIZE,
+                 max_retries: int = Settings.MAIL_MAX_RETRIES, retry_backoff: float = Settings.MAIL_RETRY_BACKOFF):
+        self.concurrency = concurrency
+        self.queue_size = queue_size
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self._queue: Optional[asyncio.Queue] = None
+        self._senders: List[asyncio.Task] = []
+        self._executor: Optional[ThreadPoolExecutor] = None
+        # one SMTP connection per sender, only used from that sender's executor calls
+        self._connections: List[Optional[smtplib.SMTP]] = [None] * concurrency
+        self.sent = 0
+        self.failed = 0
+        self.retries = 0
+
+    @property
+    def running(self) -> bool:
+        return bool(self._senders)
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._executor = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="mailer")
+        self._senders = [asyncio.create_task(self._sender(slot)) for slot in range(self.concurrency)]
+        logging.info(f"Started {self.concurrency} mail senders")
+
+    async def stop(self, timeout: float = 10.0) -> None:
+        """Deliver what is still queued (up to timeout seconds), then close the connections."""
+        if not self.running:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logging.warning(f"Dropping {self._queue.qsize()} undelivered emails at shutdown")
+        for task in self._senders:
+            task.cancel()
+        await asyncio.gather(*self._senders, return_exceptions=True)
+        self._senders = []
+        for slot in range(self.concurrency):
+            self._disconnect(slot)
+        self._executor.shutdown(wait=False)
+        self._executor = None
+
+    def enqueue(self, message: Message) -> None:
+        """Queue a message for delivery, the senders are started on first use."""
+        self.start()
+        try:
+            self._queue.put_nowait(message)
+        except asyncio.QueueFull:
+            raise MailQueueFull(f"{self._queue.qsize()} emails are already waiting to be sent")
+
+    @staticmethod
+    def connect() -> smtplib.SMTP:
+        server = smtplib.SMTP(Settings.SMTP_HOST, Settings.SMTP_PORT, timeout=Settings.SMTP_TIMEOUT)
+        # a local sink for development and tests usually speaks plain SMTP without authentication
+        if Settings.SMTP_STARTTLS:
+            server.starttls()
+        if Settings.SMTP_USERNAME and Settings.SMTP_PASSWORD:
+            server.login(Settings.SMTP_USERNAME, Settings.SMTP_PASSWORD)
+        return server
+
+    def _disconnect(self, slot: int) -> None:
+        server, self._connections[slot] = self._connections[slot], None
+        if server is not None:
+            try:
+                server.quit()
+            except (smtplib.SMTPException, OSError):
+                server.close()
+
+    def _send(self, slot: int, message: Message) -> None:
+        # runs in the executor
+        if self._connections[slot] is None:
+            self._connections[slot] = self.connect()
+        try:
+            self._connections[slot].send_message(message)
+        except smtplib.SMTPServerDisconnected:
+            # servers close idle connections, reconnect once before counting it as a failure
+            self._connections[slot] = self.connect()
+            self._connections[slot].send_message(message)
+
+    async def _sender(self, slot: int) -> None:
+        loop = asyncio.get_running_loop()
+        while True:
+            message = await self._queue.get()
+            try:
+                for attempt in range(self.max_retries + 1):
+                    try:
+                        await loop.run_in_executor(self._executor, self._send, slot, message)
+                        self.sent += 1
+                        break
+                    except Exception as e:
+                        # start over with a fresh connection, the old one may be in any state
+                        await loop.run_in_executor(self._executor, self._disconnect, slot)
+                        if is_permanent(e) or attempt == self.max_retries:
+                            self.failed += 1
+                            logging.error(f"Failed to send email to {message['To']}: {e}")
+                            break
+                        self.retries += 1
+                        delay = self.retry_backoff * 2 ** attempt
+                        logging.warning(f"Sending email to {message['To']} failed ({e}), retrying in {delay:.0f}s")
+                        await asyncio.sleep(delay)
+            finally:
+                self._queue.task_done()
+
+    def stats(self) -> Dict:
+        return {
+            "queued": self._queue.qsize() if self._queue else 0,
+            "sent": self.sent,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
+
+# Create singleton instance
+mailer = Mailer()
@@ -1,12 +1,23 @@
-from fastapi import FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.staticfiles import StaticFiles
-from fastapi.responses import FileResponse
+from fastapi.responses import PlainTextResponse
 
+from backend import singleflight
+from backend.auth import require_internal_access, user_cache
+from backend.compression import CompressionMiddleware
 from backend.config import Settings
+from backend.course_cache import course_detail_cache, course_summary_cache
+from backend.database import db
+from backend.db_indexes import check_query_plans, ensure_indexes
+from backend.embeddings import embedding_service
+from backend.mailer import mailer
+from backend.metrics import metrics
+from backend.responses import ORJSONResponse
 from backend.routers import api_router
+from backend.static_files import StaticFrontend
+from backend.vector_search import vector_search
 
-app = FastAPI()
+app = FastAPI(default_response_class=ORJSONResponse)
 
 # Add CORS middleware
 app.add_middleware(
@@ -17,21 +28,75 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# Compress JSON and text responses with brotli or gzip
+app.add_middleware(
+    CompressionMiddleware,
+    minimum_size=Settings.COMPRESSION_MINIMUM_SIZE,
+    gzip_level=Settings.GZIP_LEVEL,
+    brotli_quality=Settings.BROTLI_QUALITY,
+)
+
 # Include API router
 app.include_router(api_router, prefix="/api")
 
+# Create the MongoDB indexes the per-user queries need
+@app.on_event("startup")
+async def create_db_indexes():
+    await ensure_indexes(db)
+    if Settings.DB_PLAN_CHECK:
+        await check_query_plans(db)
+
+# Deliver the emails that are still queued before the worker exits
+@app.on_event("shutdown")
+async def stop_mailer():
+    await mailer.stop()
+
+# Index sizes and cache hit rates are read from their owners when /metrics is scraped
+CACHES = {
+    "course_details": course_detail_cache,
+    "course_summaries": course_summary_cache,
+    "embeddings": embedding_service,
+    "users": user_cache,
+}
+
+def cache_samples(field: str):
+    return [({"cache": name}, cache.stats()[field]) for name, cache in CACHES.items()]
+
+def index_samples(field: str):
+    return [({"index": index_type}, float(status[field])) for index_type, status in vector_search.status().items()]
+
+metrics.gauge("cache_hits_total", "Lookups answered by an in-process cache.", lambda: cache_samples("hits"), "counter")
+metrics.gauge("cache_misses_total", "Lookups an in-process cache could not answer.", lambda: cache_samples("misses"), "counter")
+metrics.gauge("cache_hit_ratio", "Share of lookups answered by an in-process cache since startup.", lambda: cache_samples("hit_rate"))
+metrics.gauge("cache_entries", "Entries held by an in-process cache.", lambda: cache_samples("cached"))
+metrics.gauge("vector_index_vectors", "Live vectors in the search index, including the delta of live edits.", lambda: index_samples("vectors"))
+metrics.gauge("vector_index_tombstones", "Vectors of deleted or edited courses still in the search index until the next publish.",
+              lambda: index_samples("tombstones"))
+metrics.gauge("vector_index_version", "Version of the search index this worker serves.", lambda: index_samples("version"))
+metrics.gauge("vector_index_building", "Whether the search index is being rebuilt.", lambda: index_samples("building"))
+metrics.gauge("singleflight_executed_total", "Searches, query embeddings and index rebuilds that did the work.",
+              lambda: [({"group": name}, group.executed) for name, group in singleflight.groups.items()], "counter")
+metrics.gauge("singleflight_coalesced_total", "Calls that shared the result of an identical call already running.",
+              lambda: [({"group": name}, group.coalesced) for name, group in singleflight.groups.items()], "counter")
+metrics.gauge("mail_queue_length", "Emails waiting to be sent.", lambda: [({}, mailer.stats()["queued"])])
+
+@app.get("/metrics", response_class=PlainTextResponse, dependencies=[Depends(require_internal_access)])
+async def get_metrics():
+    # Prometheus text exposition format
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4")
+
 # If there's no environment variable named ENV, default it to 'development'
 ENV = Settings.ENV
 
 if ENV == 'production':
-    # Serve static files first
-    app.mount("/assets", StaticFiles(directory="frontend/dist/assets"), name="static")
+    # index.html is kept in memory, the other files are served with their precompressed variants
+    static_frontend = StaticFrontend("frontend/dist")
 
-    @app.get("/{full_path:path}")
-    async def serve_spa(full_path: str):
+    # HEAD as well, for uptime checks and CDN revalidation
+    @app.api_route("/{full_path:path}", methods=["GET", "HEAD"])
+    async def serve_spa(full_path: str, request: Request):
         if full_path.startswith("api/"):
             raise HTTPException(status_code=404, detail="API route not found")
-        return FileResponse("frontend/dist/index.html")
-
-    # Mount the root last
-    app.mount("/", StaticFiles(directory="frontend/dist", html=True), name="frontend")
\ No newline at end of file
+        # files of the build are served as they are, every other path is a client-side route
+        response = static_frontend.file_response(request, full_path)
+        return response if response is not None else static_frontend.index_response(request)
@@ -0,0 +1,186 @@
+"""
+In-process metrics of this worker in the Prometheus text exposition format,
+served at /metrics.
+
+Histograms are recorded on the request path (search stages, MongoDB commands);
+gauges are collected when /metrics is scraped, from the stats() of the caches
+and the status() of the vector indexes, so they cost nothing in between.
+"""
+import bisect
+import math
+import threading
+import time
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from pymongo import monitoring
+
+# upper bounds in seconds, from a cached lookup (tens of microseconds) to a slow embeddings request
+LATENCY_BUCKETS = (
+    0.00005, 0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01,
+    0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0,
+)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+def escape_label_value(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def format_labels(labels: Labels, extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(labels) + ([extra] if extra else [])
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{escape_label_value(value)}"' for name, value in pairs) + "}"
+
+def format_value(value: float) -> str:
+    if math.isinf(value):
+        return "+Inf" if value > 0 else "-Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+class Histogram:
+    """
+    Cumulative histogram with one series per label combination. observe() is
+    called from the event loop and from pymongo's monitoring threads, so the
+    series are updated under a lock.
+    """
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [count per bucket (+Inf last), sum]
+        self._series: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def _labels(self, labels: Dict[str, str]) -> Labels:
+        return tuple((name, str(labels[name])) for name in self.labelnames)
+
+    def observe(self, value: float, **labels: str) -> None:
+        key = self._labels(labels)
+        position = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(key)
+            if series is None:
+                series = self._series[key] = [[0] * (len(self.buckets) + 1), 0.0]
+            series[0][position] += 1
+            series[1] += value
+
+    @contextmanager
+    def time(self, **labels: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.observe(time.perf_counter() - start, **labels)
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            series = [(key, list(counts), total) for key, (counts, total) in self._series.items()]
+        for key, counts, total in sorted(series):
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), counts):
+                cumulative += count
+                lines.append(f"{self.name}_bucket{format_labels(key, ('le', format_value(bound)))} {cumulative}")
+            lines.append(f"{self.name}_sum{format_labels(key)} {format_value(total)}")
+            lines.append(f"{self.name}_count{format_labels(key)} {cumulative}")
+        return lines
+
+class Counter:
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels: str) -> None:
+        key = tuple((name, str(labels[name])) for name in self.labelnames)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            values = sorted(self._values.items())
+        lines.extend(f"{self.name}{format_labels(key)} {format_value(value)}" for key, value in values)
+        return lines
+
+class Gauge:
+    """
+    A metric whose samples are read from collect() at scrape time. metric_type
+    is "counter" for totals some other object keeps, such as cache hits.
+    """
+
+    def __init__(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+                 metric_type: str = "gauge"):
+        self.name = name
+        self.help = help
+        self.collect = collect
+        self.metric_type = metric_type
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.help}", f"# TYPE {self.name} {self.metric_type}"]
+        for labels, value in self.collect():
+            lines.append(f"{self.name}{format_labels(tuple(labels.items()))} {format_value(value)}")
+        return lines
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, object] = {}
+
+    def register(self, metric):
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric {metric.name} is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (), buckets: Sequence[float] = LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, help, labelnames, buckets))
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, help, labelnames))
+
+    def gauge(self, name: str, help: str, collect: Callable[[], Iterable[Tuple[Dict[str, str], float]]],
+              metric_type: str = "gauge") -> Gauge:
+        return self.register(Gauge(name, help, collect, metric_type))
+
+    def render(self) -> str:
+        lines = []
+        for metric in self._metrics.values():
+            lines.extend(metric.render())
+        return "\n".join(lines) + "\n"
+
+class MongoCommandMetrics(monitoring.CommandListener):
+    """Records the latency of every MongoDB command the driver sends, by command name."""
+
+    def __init__(self, registry: "MetricsRegistry"):
+        self.latency = registry.histogram(
+            "mongodb_command_seconds", "Latency of MongoDB commands as measured by the driver.", ("command",)
+        )
+        self.failures = registry.counter(
+            "mongodb_command_failures_total", "MongoDB commands that failed.", ("command",)
+        )
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        pass
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self.latency.observe(event.duration_micros / 1e6, command=event.command_name)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self.latency.observe(event.duration_micros / 1e6, command=event.command_name)
+        self.failures.inc(command=event.command_name)
+
+# Create singleton instances
+metrics = MetricsRegistry()
+mongo_command_metrics = MongoCommandMetrics(metrics)
+search_seconds = metrics.histogram(
+    "search_seconds", "Time to answer a search request, by endpoint.", ("endpoint",)
+)
+search_stage_seconds = metrics.histogram(
+    "search_stage_seconds",
+    "Time spent in each stage of a search: code_lookup, embedding, ensure_index, index_search, dedup and hydration.",
+    ("stage",),
+)
@@ -6,8 +6,8 @@ from .user import (
     TokenData
 )
 from .course import Course
-from .roadmap import Roadmap
-from .search import SearchInput
+from .roadmap import Roadmap, RoadmapBulkChange
+from .search import SearchInput, BatchSearchInput
 
 __all__ = [
     "User",
@@ -17,5 +17,7 @@ __all__ = [
     "TokenData",
     "Course",
     "Roadmap",
-    "SearchInput"
+    "RoadmapBulkChange",
+    "SearchInput",
+    "BatchSearchInput"
 ] 
\ No newline at end of file
@@ -1,6 +1,6 @@
-from typing import Optional
+from typing import List, Optional
 from datetime import datetime
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
 from datetime import datetime
 from typing import Optional
 
@@ -33,4 +33,9 @@ class RoadmapChange(BaseModel):
     toTerm: Optional[str]
     fromYear: Optional[int] = None
     fromTerm: Optional[str] = None
-    toTrash: Optional[bool] = False  # New field for trash operations
\ No newline at end of file
+    toTrash: Optional[bool] = False  # New field for trash operations
+
+class RoadmapBulkChange(BaseModel):
+    changes: List[RoadmapChange] = Field(..., min_length=1, max_length=200)
+    # apply all changes in a MongoDB transaction (needs a replica set)
+    atomic: bool = False
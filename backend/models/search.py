@@ -1,4 +1,8 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, Field
+from typing import List
 
 class SearchInput(BaseModel):
-    text: str 
\ No newline at end of file
+    text: str 
+
+class BatchSearchInput(BaseModel):
+    texts: List[str] = Field(..., min_length=1, max_length=100)
@@ -0,0 +1,27 @@
+from typing import Any
+
+import orjson
+from bson import ObjectId
+from fastapi.responses import JSONResponse
+from pydantic import BaseModel
+
+def orjson_default(obj: Any) -> Any:
+    # orjson handles datetime, UUID and (with OPT_SERIALIZE_NUMPY) numpy values itself
+    if isinstance(obj, ObjectId):
+        return str(obj)
+    if isinstance(obj, BaseModel):
+        return obj.model_dump(mode="json")
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+def dumps(content: Any) -> bytes:
+    return orjson.dumps(content, default=orjson_default, option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS)
+
+class ORJSONResponse(JSONResponse):
+    """
+    JSON response rendered with orjson. It is the app's default response class;
+    routes on hot paths return it directly with plain dicts, which also skips
+    FastAPI's jsonable_encoder pass over the content.
+    """
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
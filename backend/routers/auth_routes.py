@@ -4,7 +4,7 @@ from datetime import datetime, timedelta
 from uuid import uuid4
 import re
 from ..models.user import UserInDB, UserOnboarding
-from ..auth import create_access_token, get_current_active_user
+from ..auth import create_access_token, get_current_active_user, user_cache
 from ..config import Settings
 from ..database import user_collection
 from ..utils import send_verification_email
@@ -39,6 +39,7 @@ async def request_verification(
         {"email": email},
         {"$set": {"verification_token": token, "token_expiration": expiration}}
     )
+    user_cache.invalidate(email)
 
     # here, we determine whether or not we're in development mode or production mode
     # based on the mode, we have different backend domains, therefore different verification urls
@@ -50,7 +51,7 @@ async def request_verification(
     # Build the verification link using the front-end domain
     verification_url = f"{backend_domain}/api/verify?token={token}&email={email}"
 
-    # Send verification email
+    # Queue the verification email, it is sent in the background
     try:
         send_verification_email(email, verification_url)
     except Exception as e:
@@ -87,6 +88,7 @@ async def verify_email(token: str, email: str):
         {"email": email},
         {"$unset": {"verification_token": "", "token_expiration": ""}}
     )
+    user_cache.invalidate(email)
 
     # Issue JWT token
     access_token = create_access_token(data={"sub": email})
@@ -105,4 +107,5 @@ async def onboarding_user(user_data: UserOnboarding, current_user: UserInDB = De
         {"email": current_user.email},
         {"$set": {"major": user_data.major, "year": user_data.year, "full_name": current_user.full_name}}
     )
+    user_cache.invalidate(current_user.email)
     return {"message": "User updated successfully"}
\ No newline at end of file
@@ -1,29 +1,94 @@
-from fastapi import APIRouter, HTTPException, Depends, Query
+from fastapi import APIRouter, HTTPException, Depends, Query, Request, Response
 from bson import ObjectId
+from bson.errors import InvalidId
 from datetime import datetime
-import os
-from openai import OpenAI
 from ..database import course_collection
 from ..models.course import Course
-from ..models.search import SearchInput
+from ..models.search import SearchInput, BatchSearchInput
 from ..models.user import UserInDB
-from ..auth import get_current_active_user
+from ..auth import get_current_active_user, require_internal_access, user_cache
 from ..vector_search import vector_search
+from ..catalog_watcher import catalog_watcher
+from ..embeddings import embedding_service, normalize_query
+from ..course_codes import course_code_index
+from ..course_suggest import MAX_SUGGESTIONS, course_suggest_index
+from ..course_cache import CachedCourse, course_count_cache, course_detail_cache, course_summary_cache
+from ..config import Settings
+from ..metrics import search_seconds, search_stage_seconds
+from ..responses import ORJSONResponse
+from .. import singleflight
+from ..singleflight import SingleFlight
+from typing import Dict, Iterable, List, Optional
 import asyncio
+import base64
+import binascii
 import logging
 import numpy as np
+import time
 
 router = APIRouter()
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+
+def is_code_query(text: str) -> bool:
+    # any query with three digits in a row (like "COMP SCI 300") is searched against the course code embeddings
+    return any(text[i:i+3].isdigit() for i in range(len(text)-2))
+
+def needs_vector_search(code_matches: List[Dict], k: int) -> bool:
+    # vector search is the fallback when the course code index has no answer,
+    # and tops up partial answers when CODE_LOOKUP_FILL is set
+    if not code_matches:
+        return True
+    return Settings.CODE_LOOKUP_FILL and len(code_matches) < k
+
+def merge_matches(code_matches: List[Dict], vector_matches: List[Dict], k: int) -> List[Dict]:
+    # course code matches come first, vector matches fill the remaining slots
+    seen = {match['id'] for match in code_matches}
+    merged = list(code_matches)
+    merged.extend(match for match in vector_matches if match['id'] not in seen)
+    return merged[:k]
+
+async def ensure_index(use_code_embedding: bool) -> None:
+    # Build the index if there is none yet; a stale index is rebuilt in the background
+    # while this and other requests keep searching the current one
+    if (vector_search.code_index if use_code_embedding else vector_search.title_index) is None:
+        logging.info("Building index...")
+        # the rebuild is shared with other requests, a client going away mustn't cancel it
+        await asyncio.shield(vector_search.rebuild_in_background(course_collection, use_code_embedding, use_cache=True))
+    elif vector_search.is_stale(use_code_embedding):
+        logging.debug("Index is stale, rebuilding in the background...")
+        vector_search.rebuild_in_background(course_collection, use_code_embedding)
+
+async def fetch_course_summaries(course_ids: Iterable[str]) -> Dict[str, dict]:
+    # title and credits of many courses keyed by course id, from the cache or a single projected query
+    return await course_summary_cache.get_many(course_collection, course_ids)
+
+def hydrate_matches(matches: List[Dict], courses: Dict[str, dict]) -> List[Dict]:
+    # search results in similarity order, matches whose course no longer exists are skipped
+    return [{
+        'id': match['id'],
+        'title': courses[match['id']]['title'],
+        'credits': courses[match['id']]['credits'],
+        'similarity': match['similarity']
+    } for match in matches if match['id'] in courses]
+
+def encode_cursor(course_id: ObjectId) -> str:
+    # the cursor is the last _id of a page, opaque to the frontend
+    return base64.urlsafe_b64encode(course_id.binary).decode().rstrip("=")
+
+def decode_cursor(cursor: str) -> ObjectId:
+    try:
+        return ObjectId(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+    except (ValueError, TypeError, binascii.Error, InvalidId):
+        raise HTTPException(status_code=400, detail="Invalid cursor")
 
 @router.get("/courses")
 async def get_courses(
     # "Query" is a Fast API class
     # the "page" value is based on where the user is scrolling to
     page: int = Query(1, ge=1),
+    # "cursor" is the "next_cursor" of the previous page, it replaces "page" when given
+    cursor: Optional[str] = Query(None),
 ):
     limit = 18
-    skip = (page - 1) * limit
     
     # "Projection" is a Python dictionary that tells MongoDB what fields
     # we want to return when we turn the cursor into a list
@@ -36,131 +101,239 @@ async def get_courses(
         # Add other fields you want to include
     }
     
-    # Total number of courses in the database
-    total_courses: int = await course_collection.count_documents({})
+    # Total number of courses in the database, counted at most every few minutes
+    total_courses: int = await course_count_cache.get(course_collection)
     
-    # "cursor" is just a "query", a "plan" of how we'll be fetching the data
-    # to_list() is where we actually executes the query and get the data
-    # when we use find({}), that means we're not filtering any data
-    # we're just fetching the data based on the order of the data in the database
-    cursor = course_collection.find({}, projection).skip(skip).limit(limit)
-    courses = await cursor.to_list()
+    # Courses are listed in _id order. With a cursor the next page starts right after
+    # the last _id of the previous one, which the _id index finds directly however deep
+    # the user has scrolled; "page" still skips over the earlier pages
+    # One extra course is fetched to know whether there is another page
+    if cursor is not None:
+        query_cursor = course_collection.find({"_id": {"$gt": decode_cursor(cursor)}}, projection)
+    else:
+        query_cursor = course_collection.find({}, projection).skip((page - 1) * limit)
+    courses = await query_cursor.sort("_id", 1).limit(limit + 1).to_list()
+    has_more = len(courses) > limit
+    courses = courses[:limit]
+    next_cursor = encode_cursor(courses[-1]["_id"]) if has_more else None
     
     # This converts the MongoDB ObjectId into a normal string id
     for course in courses:
         course["id"] = str(course["_id"])
         del course["_id"]
     
-    return {
+    return ORJSONResponse({
         "courses": courses,
-        "has_more": (skip + limit) < total_courses,
+        "has_more": has_more,
+        "next_cursor": next_cursor,
         "total": total_courses
+    })
+
+@router.get("/cache-stats", dependencies=[Depends(require_internal_access)])
+async def get_cache_stats():
+    # hit ratios and sizes of the in-process caches of this worker
+    return {
+        "course_details": course_detail_cache.stats(),
+        "course_summaries": course_summary_cache.stats(),
+        "embeddings": embedding_service.stats(),
+        "users": user_cache.stats(),
+        # concurrent identical searches, embeddings and index rebuilds that shared one execution
+        "coalescing": {name: group.stats() for name, group in singleflight.groups.items()},
     }
 
+@router.get("/courses/suggest")
+async def suggest_courses(
+    q: str = Query(..., max_length=200),
+    limit: int = Query(8, ge=1, le=MAX_SUGGESTIONS),
+):
+    # Typeahead for the search box, answered from memory without an embedding or a database query
+    start = time.perf_counter()
+    suggestions = course_suggest_index.suggest(q, limit=limit)
+    search_seconds.observe(time.perf_counter() - start, endpoint="courses/suggest")
+    return ORJSONResponse(suggestions)
+
+def not_modified(request: Request, course: CachedCourse) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is None:
+        return False
+    tags = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in tags or course.etag in tags or f"W/{course.etag}" in tags
+
 @router.get("/courses/{course_id}")
-async def get_course(course_id: str):
+async def get_course(course_id: str, request: Request):
     
-    projection = {
-        "_id": 1,
-        "title": 1,
-        "course_designation": 1, # check with frontend, the course designation isn't showing
-        "credits": 1,
-        "description": 1,
-        "last_taught": 1,
-        "learning_outcomes": 1,
-        "repeatable": 1,
-        "requisites": 1
-    }
+    # The projected course is rendered once and cached until the course changes
+    course = await course_detail_cache.get(course_collection, course_id)
     
-    course = await course_collection.find_one({"_id": ObjectId(course_id)}, projection)
+    if course is None:
+        raise HTTPException(status_code=404, detail="Course not found")
     
-    if course:
-        course["id"] = str(course["_id"])
-        del course["_id"]
-        return course
-    
-    raise HTTPException(status_code=404, detail="Course not found")
+    # Clients may keep the response but have to revalidate it, unchanged courses get an empty 304
+    headers = {
+        "ETag": course.etag,
+        "Cache-Control": "public, no-cache",
+    }
+    if not_modified(request, course):
+        return Response(status_code=304, headers=headers)
+    return Response(content=course.body, media_type="application/json", headers=headers)
 
-@router.post("/search-courses")
-async def search_courses(search_input: SearchInput):
-    try:
-        logging.info("=== Search Request ===")
-        # Capitalize the search text
-        capitalized_search = search_input.text.upper()
-        logging.info(f"Original search text: {search_input.text}")
-        logging.info(f"Capitalized search text: {capitalized_search}")
-        
-        use_code_embedding = any(
-            capitalized_search[i:i+3].isdigit() 
-            for i in range(len(capitalized_search)-2)
-        )
-        logging.info(f"Detected course code? {use_code_embedding}")
-        logging.info(f"Using {'code_embeddings' if use_code_embedding else 'title_embedding'} for search")
+# concurrent searches for the same text share one embedding, index lookup and hydration
+search_flight = SingleFlight("search")
+
+async def run_search(capitalized_search: str) -> List[Dict]:
+    """The ranked results of one search, the work behind /search-courses."""
+    # Designation queries ("COMP SCI 300", "CS 30") are looked up directly, no embedding needed
+    with search_stage_seconds.time(stage="code_lookup"):
+        similar_courses = course_code_index.lookup(capitalized_search, limit=18)
+    logging.debug("Found %d course code matches", len(similar_courses))
+    
+    if needs_vector_search(similar_courses, 18):
+        use_code_embedding = is_code_query(capitalized_search)
+        logging.debug("Using %s for search", "code_embeddings" if use_code_embedding else "title_embedding")
         
-        # Get embedding for capitalized search term
-        response = client.embeddings.create(
-            input=capitalized_search,
-            model="text-embedding-3-small"
-        )
-        search_embedding = response.data[0].embedding
+        # Get embedding for capitalized search term (cached, doesn't block the event loop)
+        with search_stage_seconds.time(stage="embedding"):
+            search_embedding = await embedding_service.embed(capitalized_search)
 
         # Normalize the search embedding
         norm = np.linalg.norm(search_embedding)
         if norm > 0:
-            search_embedding = [x / norm for x in search_embedding]
+            search_embedding = search_embedding / norm
         else:
             logging.warning("Received zero vector as search embedding")
         
-        logging.info("Generated and normalized embedding successfully")
-        
-        # Check if index needs to be built/rebuilt
-        if not (vector_search.code_index if use_code_embedding else vector_search.title_index) or \
-           (vector_search.last_update and (datetime.now() - vector_search.last_update).days > 0):
-            logging.info("Building/rebuilding index...")
-            await vector_search.build_index(course_collection, use_code_embedding)
+        with search_stage_seconds.time(stage="ensure_index"):
+            await ensure_index(use_code_embedding)
         
-        # Get similar courses using FAISS
-        similar_courses = await vector_search.search(
+        # Get similar courses using FAISS (records the index_search and dedup stages)
+        vector_matches = await vector_search.search(
             search_embedding, 
             k=18,
             use_code_embedding=use_code_embedding
         )
-        logging.info(f"Found {len(similar_courses)} similar courses")
-        
-        # Fetch full course details for matched IDs
-        courses_with_scores = []
-        for match in similar_courses:
-            course = await course_collection.find_one({"_id": ObjectId(match['id'])})
-            if course:
-                courses_with_scores.append({
-                    'id': str(course['_id']),
-                    'title': course['title'],
-                    'credits': course['credits'],
-                    'similarity': match['similarity']
-                })
+        similar_courses = merge_matches(similar_courses, vector_matches, 18)
+    
+    # Fetch the title and credits of every match at once
+    with search_stage_seconds.time(stage="hydration"):
+        courses = await fetch_course_summaries(match['id'] for match in similar_courses)
+        courses_with_scores = hydrate_matches(similar_courses, courses)
+    return courses_with_scores
+
+@router.post("/search-courses")
+async def search_courses(search_input: SearchInput):
+    start = time.perf_counter()
+    try:
+        # Capitalize the search text and collapse its whitespace, as it is embedded
+        capitalized_search = normalize_query(search_input.text)
+        logging.debug("Search request: %r", capitalized_search)
         
-        if courses_with_scores:
-            logging.info(f"Top match: {courses_with_scores[0]}")
-        else:
-            logging.info("No matches found.")
+        # the index searched (title or code) is part of the key next to the normalized text
+        mode = "code" if is_code_query(capitalized_search) else "title"
+        courses_with_scores = await search_flight.do(
+            (mode, capitalized_search), lambda: run_search(capitalized_search)
+        )
         
-        logging.info("=== Search Complete ===")
+        logging.debug("Found %d similar courses, top match: %s",
+                      len(courses_with_scores), courses_with_scores[0] if courses_with_scores else None)
         
-        return courses_with_scores
+        return ORJSONResponse(courses_with_scores)
 
     except Exception as e:
         logging.error(f"Error in search_courses: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        search_seconds.observe(time.perf_counter() - start, endpoint="search-courses")
+
+@router.post("/search-courses/batch")
+async def batch_search_courses(search_input: BatchSearchInput):
+    start = time.perf_counter()
+    try:
+        logging.debug("Batch search request (%d queries)", len(search_input.texts))
+        # normalized like single searches, so a query is routed, cached and answered the same way in both
+        capitalized_searches = [normalize_query(text) for text in search_input.texts]
+        
+        # Designation queries are answered from the course code index, the rest need embeddings
+        with search_stage_seconds.time(stage="code_lookup"):
+            matches_per_query = [course_code_index.lookup(text, limit=18) for text in capitalized_searches]
+        vector_positions = [
+            position for position, matches in enumerate(matches_per_query)
+            if needs_vector_search(matches, 18)
+        ]
+        
+        # One embeddings request for every query that isn't cached yet
+        with search_stage_seconds.time(stage="embedding"):
+            search_embeddings = dict(zip(
+                vector_positions,
+                await embedding_service.embed_many([capitalized_searches[position] for position in vector_positions])
+            )) if vector_positions else {}
+        
+        # Route each query to the title or code index, then search each index once
+        for use_code_embedding in (False, True):
+            positions = [
+                position for position in vector_positions
+                if is_code_query(capitalized_searches[position]) == use_code_embedding
+            ]
+            if not positions:
+                continue
+            with search_stage_seconds.time(stage="ensure_index"):
+                await ensure_index(use_code_embedding)
+            results = await vector_search.search_many(
+                [search_embeddings[position] for position in positions],
+                k=18,
+                use_code_embedding=use_code_embedding
+            )
+            for position, matches in zip(positions, results):
+                matches_per_query[position] = merge_matches(matches_per_query[position], matches, 18)
+        
+        # Fetch the course details of every match in one query
+        with search_stage_seconds.time(stage="hydration"):
+            courses = await fetch_course_summaries(
+                {match['id'] for matches in matches_per_query for match in matches}
+            )
+            results = [{
+                "query": text,
+                "results": hydrate_matches(matches, courses)
+            } for text, matches in zip(search_input.texts, matches_per_query)]
+        
+        return ORJSONResponse(results)
+
+    except Exception as e:
+        logging.error(f"Error in batch_search_courses: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+    finally:
+        search_seconds.observe(time.perf_counter() - start, endpoint="search-courses/batch")
 
 # Add startup event to app's main.py
 @router.on_event("startup")
 async def startup_event():
+    # A local embedding model is loaded off the event loop before the indexes need its dimension
+    await embedding_service.load()
     # Build both indexes at startup
     await asyncio.gather(
-        vector_search.build_index(course_collection, use_code_embedding=False),  # title index
-        vector_search.build_index(course_collection, use_code_embedding=True)    # code index
+        asyncio.shield(vector_search.rebuild_in_background(course_collection, use_code_embedding=False, use_cache=True)),  # title index
+        asyncio.shield(vector_search.rebuild_in_background(course_collection, use_code_embedding=True, use_cache=True)),   # code index
+        course_code_index.build(course_collection),                                                                        # designations
+        course_suggest_index.build(course_collection),                                                                     # typeahead
     )
     logging.info("Successfully built both title and code indexes at startup")
+    # Pick up index versions published by other workers
+    vector_search.watch_artifacts()
+
+    # Apply catalog edits to the indexes as they happen instead of waiting for a rebuild
+    if Settings.CATALOG_WATCH_ENABLED:
+        catalog_watcher.subscribe(vector_search.apply_change)
+        catalog_watcher.subscribe(course_code_index.apply_change)
+        catalog_watcher.subscribe(course_suggest_index.apply_change)
+        catalog_watcher.subscribe(course_summary_cache.apply_change)
+        catalog_watcher.subscribe(course_count_cache.apply_change)
+        catalog_watcher.subscribe(course_detail_cache.apply_change)
+        catalog_watcher.start(course_collection)
+
+@router.on_event("shutdown")
+async def shutdown_event():
+    await catalog_watcher.stop()
+    await vector_search.stop_watching()
+    await embedding_service.close()
 
 @router.get("/search")
 async def search_courses(query: str):
@@ -1,45 +1,50 @@
 from fastapi import APIRouter, Depends, HTTPException
-from typing import List
+from typing import Dict, List
 from bson import ObjectId
 from datetime import datetime
-from ..models.roadmap import RoadmapChange
+import logging
+from pymongo import DeleteOne, UpdateOne
+from ..models.roadmap import RoadmapChange, RoadmapBulkChange
 from ..auth import get_current_active_user
-from ..database import course_collection, roadmap_collection
+from ..database import client, course_collection, roadmap_collection
+from ..course_cache import course_summary_cache
+from ..responses import ORJSONResponse
 
 router = APIRouter()
 
-@router.get("/roadmap", response_model=List[dict])
-async def get_roadmap(current_user = Depends(get_current_active_user)):
-    try:
-        # Find all roadmap entries for the user
-        roadmap_entries = await roadmap_collection.find(
-            {"userId": current_user.id}
-        ).to_list(length=None)
+async def find_roadmap_entries(user_id: str) -> List[dict]:
+    # Find all roadmap entries for the user
+    return await roadmap_collection.find(
+        {"userId": user_id},
+        {"_id": 0, "courseId": 1, "year": 1, "term": 1, "addedAt": 1}
+    ).to_list(length=None)
 
-        # Get all course IDs from roadmap entries
-        course_ids = [ObjectId(entry["courseId"]) for entry in roadmap_entries]
-        
-        # Get course details for all courses in roadmap
-        courses = await course_collection.find(
-            {"_id": {"$in": course_ids}}
-        ).to_list(length=None)
-        
-        # Create a lookup dictionary for courses
-        course_lookup = {str(course["_id"]): course for course in courses}
+def format_roadmap(roadmap_entries: List[dict], course_lookup: Dict[str, dict]) -> List[dict]:
+    # Transform the data to include course details, entries of courses that no longer exist are left out
+    return [{
+        "id": str(entry["courseId"]),
+        "title": course_lookup[str(entry["courseId"])].get("title", "No title"),
+        "credits": course_lookup[str(entry["courseId"])].get("credits", 0),
+        "year": entry["year"],
+        "term": entry["term"],
+        "addedAt": entry["addedAt"]
+    } for entry in roadmap_entries if str(entry["courseId"]) in course_lookup]
 
-        # Transform the data to include course details
-        transformed_roadmap = [{
-            "id": str(entry["courseId"]),
-            "title": course_lookup[str(entry["courseId"])]["title"],
-            "credits": course_lookup[str(entry["courseId"])]["credits"],
-            "year": entry["year"],
-            "term": entry["term"],
-            "addedAt": entry["addedAt"]
-        } for entry in roadmap_entries]
+async def load_roadmap(user_id: str) -> List[dict]:
+    roadmap_entries = await find_roadmap_entries(user_id)
+    
+    # Get the title and credits of all courses in roadmap (not the whole documents with their embeddings)
+    course_lookup = await course_summary_cache.get_many(
+        course_collection, (str(entry["courseId"]) for entry in roadmap_entries)
+    )
+    return format_roadmap(roadmap_entries, course_lookup)
 
-        return transformed_roadmap
+@router.get("/roadmap", response_model=List[dict])
+async def get_roadmap(current_user = Depends(get_current_active_user)):
+    try:
+        return ORJSONResponse(await load_roadmap(current_user.id))
     except Exception as e:
-        print(f"Error in get_roadmap: {str(e)}")
+        logging.error(f"Error in get_roadmap: {str(e)}", exc_info=True)
         raise HTTPException(status_code=500, detail=str(e))
 
 @router.post("/roadmap/change")
@@ -48,11 +53,8 @@ async def change_roadmap(
     current_user = Depends(get_current_active_user)
 ):
     try:
-        print(f"\n=== Processing Roadmap Change ===")
-        print(f"Course ID: {change.courseId}")
-        print(f"To Term: {change.toTerm} {change.toYear}")
-        print(f"From Term: {change.fromTerm} {change.fromYear if change.fromTerm else 'None'}")
-        print(f"User ID: {current_user.id}")
+        logging.debug("Roadmap change of user %s: course %s from %s %s to %s %s", current_user.id, change.courseId,
+                      change.fromTerm, change.fromYear if change.fromTerm else None, change.toTerm, change.toYear)
         
         try:
             course_object_id = ObjectId(change.courseId)
@@ -74,29 +76,30 @@ async def change_roadmap(
                 "term": change.fromTerm
             })
 
-        # Add to new term
-        await roadmap_collection.update_one(
-            {
-                "userId": current_user.id,
-                "courseId": course_object_id,
-                "year": change.toYear,
-                "term": change.toTerm
-            },
-            {
-                "$set": {
+        # Add to new term, unless the course was dropped on the trash (it has no new term then)
+        if not change.toTrash:
+            await roadmap_collection.update_one(
+                {
                     "userId": current_user.id,
                     "courseId": course_object_id,
                     "year": change.toYear,
-                    "term": change.toTerm,
-                    "addedAt": datetime.utcnow()
-                }
-            },
-            upsert=True
-        )
+                    "term": change.toTerm
+                },
+                {
+                    "$set": {
+                        "userId": current_user.id,
+                        "courseId": course_object_id,
+                        "year": change.toYear,
+                        "term": change.toTerm,
+                        "addedAt": datetime.utcnow()
+                    }
+                },
+                upsert=True
+            )
 
         return {
             "message": "Roadmap updated successfully",
-            "action": "moved" if change.fromTerm else "added",
+            "action": "removed" if change.toTrash else "moved" if change.fromTerm else "added",
             "course": {
                 "id": str(course["_id"]),
                 "title": course["title"],
@@ -106,8 +109,83 @@ async def change_roadmap(
             }
         }
     except HTTPException as e:
-        print(f"HTTP Exception occurred: {e.detail}")
+        logging.debug("HTTP exception occurred: %s", e.detail)
         raise e
     except Exception as e:
-        print(f"Unexpected error: {str(e)}")
-        raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
+        logging.error(f"Unexpected error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
+
+def roadmap_operations(user_id: str, course_object_id: ObjectId, change: RoadmapChange, now: datetime) -> list:
+    # the same writes /roadmap/change makes: remove from the old term, then upsert into the new one
+    # unless the course went to the trash
+    operations = []
+    if change.fromTerm:
+        operations.append(DeleteOne({
+            "userId": user_id,
+            "courseId": course_object_id,
+            "year": change.fromYear,
+            "term": change.fromTerm
+        }))
+    if not change.toTrash:
+        term = {
+            "userId": user_id,
+            "courseId": course_object_id,
+            "year": change.toYear,
+            "term": change.toTerm
+        }
+        operations.append(UpdateOne(term, {"$set": {**term, "addedAt": now}}, upsert=True))
+    return operations
+
+@router.post("/roadmap/bulk-change")
+async def bulk_change_roadmap(
+    bulk_change: RoadmapBulkChange,
+    current_user = Depends(get_current_active_user)
+):
+    try:
+        logging.debug("Processing %d roadmap changes of user %s", len(bulk_change.changes), current_user.id)
+        
+        course_object_ids = []
+        for change in bulk_change.changes:
+            try:
+                course_object_ids.append(ObjectId(change.courseId))
+            except Exception:
+                raise HTTPException(status_code=400, detail=f"Invalid course ID format: {change.courseId}")
+
+        # Check that every course exists with a single query
+        existing = await course_collection.find(
+            {"_id": {"$in": course_object_ids}},
+            {"_id": 1}
+        ).to_list(length=None)
+        missing = set(course_object_ids) - {course["_id"] for course in existing}
+        if missing:
+            raise HTTPException(
+                status_code=404,
+                detail=f"Course not found with ID: {', '.join(sorted(str(course_id) for course_id in missing))}"
+            )
+
+        # Apply all changes in order with one bulk_write
+        now = datetime.utcnow()
+        operations = [
+            operation
+            for change, course_object_id in zip(bulk_change.changes, course_object_ids)
+            for operation in roadmap_operations(current_user.id, course_object_id, change, now)
+        ]
+        if bulk_change.atomic:
+            async with await client.start_session() as session:
+                async with session.start_transaction():
+                    result = await roadmap_collection.bulk_write(operations, ordered=True, session=session)
+        else:
+            result = await roadmap_collection.bulk_write(operations, ordered=True)
+        logging.debug("Removed %d, added %d, updated %d roadmap entries",
+                      result.deleted_count, result.upserted_count, result.modified_count)
+
+        return {
+            "message": "Roadmap updated successfully",
+            "roadmap": await load_roadmap(current_user.id)
+        }
+    except HTTPException as e:
+        logging.debug("HTTP exception occurred: %s", e.detail)
+        raise e
+    except Exception as e:
+        logging.error(f"Unexpected error: {str(e)}", exc_info=True)
+        raise HTTPException(status_code=500, detail=str(e))
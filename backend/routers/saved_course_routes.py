@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException
 from bson import ObjectId
+from pymongo.errors import DuplicateKeyError
 from datetime import datetime
-from typing import List
+from typing import Dict, List
 
 from ..database import saved_course_collection, course_collection
 from ..models.search import SearchInput
 from ..models.user import UserInDB
 from ..auth import get_current_active_user
+from ..embeddings import embedding_service
+from ..course_cache import course_summary_cache
 
 router = APIRouter()
 
@@ -32,38 +35,46 @@ async def save_course(course_id: str, current_user: UserInDB = Depends(get_curre
         "saved_at": datetime.utcnow()
     }
 
-    result = await saved_course_collection.insert_one(saved_course)
+    try:
+        result = await saved_course_collection.insert_one(saved_course)
+        saved_course_id = result.inserted_id
+    except DuplicateKeyError:
+        # a concurrent save (double click, second tab) got there first, the course is saved either way
+        existing_save = await saved_course_collection.find_one(
+            {"user_id": current_user.id, "course_id": course_id}, {"_id": 1}
+        )
+        saved_course_id = existing_save["_id"] if existing_save else None
     return {
         "message": "Course saved successfully",
-        "saved_course_id": str(result.inserted_id)
+        "saved_course_id": str(saved_course_id)
     }
 
-@router.get("/saved-courses")
-async def get_saved_courses(current_user: UserInDB = Depends(get_current_active_user)):
-    saved_courses = await saved_course_collection.find({
-        "user_id": current_user.id
-    }).to_list(length=None)
-
-    course_ids = [ObjectId(sc["course_id"]) for sc in saved_courses]
-    courses = await course_collection.find({"_id": {"$in": course_ids}}).to_list(length=None)
+async def find_saved_course_ids(user_id: str) -> List[str]:
+    saved_courses = await saved_course_collection.find(
+        {"user_id": user_id},
+        {"_id": 0, "course_id": 1}
+    ).to_list(length=None)
+    return [sc["course_id"] for sc in saved_courses]
 
+def format_saved_courses(course_ids: List[str], courses: Dict[str, dict]) -> List[dict]:
+    # saved courses that no longer exist are left out
     return [{
-        "id": str(course["_id"]),
-        "title": course.get("title", "No title"),
-        "credits": course.get("credits", 0),
-    } for course in courses] 
+        "id": course_id,
+        "title": courses[course_id].get("title", "No title"),
+        "credits": courses[course_id].get("credits", 0),
+    } for course_id in course_ids if course_id in courses]
 
-import os
-from openai import OpenAI
-client = OpenAI(api_key=os.getenv('OPENAI_API_KEY'))
+@router.get("/saved-courses")
+async def get_saved_courses(current_user: UserInDB = Depends(get_current_active_user)):
+    course_ids = await find_saved_course_ids(current_user.id)
+    # title and credits only, from the course summary cache or one projected query
+    courses = await course_summary_cache.get_many(course_collection, course_ids)
+    return format_saved_courses(course_ids, courses)
 
 @router.post("/get-embedding")
 async def get_embedding(search_input: SearchInput):
     try:
-        response = client.embeddings.create(
-            input=search_input.text,
-            model="text-embedding-3-small"
-        )
-        return {"embedding": response.data[0].embedding}  # Return as JSON object
+        embedding = await embedding_service.embed(search_input.text)
+        return {"embedding": embedding.tolist()}  # Return as JSON object
     except Exception as e:
         raise HTTPException(status_code=500, detail=str(e))
\ No newline at end of file
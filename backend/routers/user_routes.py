@@ -1,22 +1,48 @@
 from fastapi import APIRouter, Depends
-from ..models.user import User
+import asyncio
+from ..models.user import UserInDB
 from ..auth import get_current_active_user
-from ..database import user_collection
+from ..database import course_collection
+from ..course_cache import course_summary_cache
+from ..responses import ORJSONResponse
+from .saved_course_routes import find_saved_course_ids, format_saved_courses
+from .roadmap_routes import find_roadmap_entries, format_roadmap
 
 router = APIRouter()
 
-@router.get("/profile")
-async def get_user_profile(current_user: User = Depends(get_current_active_user)):
-    # use mongodb function "find_one" to find the current user data with his/her email
-    user = await user_collection.find_one(
-    {"email": current_user.email}
-)   
+def profile_data(current_user: UserInDB) -> dict:
     # the user_data object contains the attributes that will be returning to the frontend
     user_data = {
         "full_name": current_user.full_name,
         "email": current_user.email,
-        "major": user["major"],
-        "year": user["year"]
+        "major": current_user.major,
+        "year": current_user.year
     }
 
-    return user_data 
\ No newline at end of file
+    return user_data
+
+@router.get("/profile")
+async def get_user_profile(current_user: UserInDB = Depends(get_current_active_user)):
+    # the current user is already loaded (and cached) by get_current_active_user,
+    # so the profile is answered without another database query
+    return profile_data(current_user)
+
+@router.get("/me/bootstrap")
+async def bootstrap_user(current_user: UserInDB = Depends(get_current_active_user)):
+    # everything the frontend needs on load in one request, the same data as
+    # /profile, /saved-courses and /roadmap
+    # the saved course ids and roadmap entries are read concurrently with tight projections,
+    # then the title and credits of all their courses are fetched once
+    saved_course_ids, roadmap_entries = await asyncio.gather(
+        find_saved_course_ids(current_user.id),
+        find_roadmap_entries(current_user.id),
+    )
+    courses = await course_summary_cache.get_many(
+        course_collection,
+        saved_course_ids + [str(entry["courseId"]) for entry in roadmap_entries]
+    )
+    return ORJSONResponse({
+        "profile": profile_data(current_user),
+        "saved_courses": format_saved_courses(saved_course_ids, courses),
+        "roadmap": format_roadmap(roadmap_entries, courses),
+    }) 
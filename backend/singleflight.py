@@ -0,0 +1,57 @@
+import asyncio
+from typing import Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+# every SingleFlight by name, for /metrics and /cache-stats
+groups: Dict[str, "SingleFlight"] = {}
+
+class SingleFlight:
+    """
+    Coalesces concurrent work: while a call for a key is running, further calls
+    for the same key wait for its result instead of starting their own. Nothing
+    is cached, the next call after it finishes runs again.
+
+    Waiters are shielded from each other, a cancelled caller (e.g. a client that
+    went away) doesn't cancel the work the others are waiting for.
+    """
+
+    def __init__(self, name: str):
+        self.name = name
+        self._running: Dict[Hashable, asyncio.Task] = {}
+        # calls that did the work, and calls that joined one already running
+        self.executed = 0
+        self.coalesced = 0
+        groups[name] = self
+
+    def in_flight(self, key: Hashable) -> bool:
+        return key in self._running
+
+    def start(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> "asyncio.Task[T]":
+        """The running task for key, or a new one running work()."""
+        task = self._running.get(key)
+        if task is not None:
+            self.coalesced += 1
+            return task
+        task = asyncio.ensure_future(work())
+        self._running[key] = task
+        self.executed += 1
+        task.add_done_callback(lambda _: self._finished(key, task))
+        return task
+
+    async def do(self, key: Hashable, work: Callable[[], Awaitable[T]]) -> T:
+        """Run work() for key, or wait for the call already running for it; exceptions are shared too."""
+        return await asyncio.shield(self.start(key, work))
+
+    def _finished(self, key: Hashable, task: asyncio.Task) -> None:
+        if self._running.get(key) is task:
+            del self._running[key]
+
+    def stats(self) -> Dict:
+        calls = self.executed + self.coalesced
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "coalesced_rate": self.coalesced / calls if calls else 0.0,
+            "in_flight": len(self._running),
+        }
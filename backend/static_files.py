@@ -0,0 +1,161 @@
+"""
+Static serving of the built frontend (frontend/dist) in production.
+
+index.html is held in memory, every other file is served from disk together with
+its precompressed .br / .gz sidecar files. Vite's hashed files under assets/ never
+change, so they are cached by browsers and CDNs for a year; everything else has
+to be revalidated, which the ETags make cheap.
+
+The sidecars are written at build time (bin/post_compile) with
+    python -m backend.static_files frontend/dist
+workers only check for them at startup, files without them are served uncompressed.
+"""
+import gzip
+import hashlib
+import logging
+import mimetypes
+import os
+import sys
+from typing import Dict, Iterator, Optional, Tuple
+
+from starlette.requests import Request
+from starlette.responses import FileResponse, Response
+
+from backend.compression import COMPRESSIBLE_TYPES, brotli, negotiate_encoding, supported_encodings
+
+# file extension of each precompressed variant
+VARIANT_SUFFIXES = {"br": ".br", "gzip": ".gz"}
+# files smaller than this gain nothing from compression
+PRECOMPRESS_MINIMUM_SIZE = 1024
+
+IMMUTABLE = "public, max-age=31536000, immutable"
+REVALIDATE = "public, no-cache"
+
+def content_type(path: str) -> str:
+    media_type, _ = mimetypes.guess_type(path)
+    return media_type or "application/octet-stream"
+
+def compress(data: bytes, encoding: str) -> bytes:
+    # static files are compressed once, so use the slowest, smallest settings
+    if encoding == "br":
+        return brotli.compress(data, quality=11)
+    return gzip.compress(data, compresslevel=9, mtime=0)
+
+def outdated_variants(dist_dir: str) -> Iterator[Tuple[str, str]]:
+    """(file, encoding) of every missing or outdated .br / .gz sidecar of the files in dist_dir."""
+    for root, _, files in os.walk(dist_dir):
+        for name in files:
+            path = os.path.join(root, name)
+            if name.endswith(tuple(VARIANT_SUFFIXES.values())) or not content_type(path).startswith(COMPRESSIBLE_TYPES):
+                continue
+            stat = os.stat(path)
+            if stat.st_size < PRECOMPRESS_MINIMUM_SIZE:
+                continue
+            for encoding in supported_encodings():
+                variant = path + VARIANT_SUFFIXES[encoding]
+                if not os.path.exists(variant) or os.stat(variant).st_mtime < stat.st_mtime:
+                    yield path, encoding
+
+def precompress(dist_dir: str) -> int:
+    """Write the missing or outdated .br / .gz sidecars of the files in dist_dir, returns how many were written."""
+    written = 0
+    for path, encoding in list(outdated_variants(dist_dir)):
+        with open(path, "rb") as f:
+            data = f.read()
+        variant = path + VARIANT_SUFFIXES[encoding]
+        # written next to the target and renamed, so a running server never serves a partial file
+        tmp_path = f"{variant}.{os.getpid()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(compress(data, encoding))
+        os.replace(tmp_path, variant)
+        written += 1
+    return written
+
+class StaticFile:
+    """A file of the build with its representations: encoding (None for identity) -> (path, size, ETag)."""
+
+    def __init__(self, path: str, immutable: bool):
+        self.media_type = content_type(path)
+        self.cache_control = IMMUTABLE if immutable else REVALIDATE
+        self.variants: Dict[Optional[str], tuple] = {}
+        for encoding, suffix in [(None, ""), *VARIANT_SUFFIXES.items()]:
+            variant = path + suffix
+            if os.path.exists(variant):
+                stat = os.stat(variant)
+                self.variants[encoding] = (variant, stat.st_size, f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"')
+
+class StaticFrontend:
+    def __init__(self, dist_dir: str):
+        self.dist_dir = os.path.abspath(dist_dir)
+        # compressing the build is a build step, every worker doing it at import would repeat the work
+        missing = sum(1 for _ in outdated_variants(self.dist_dir))
+        if missing:
+            logging.warning(f"{missing} precompressed static files are missing or outdated, "
+                            f"run python -m backend.static_files {dist_dir} after building the frontend")
+
+        # the SPA shell is served for every client-side route, so it is kept in memory with its variants
+        with open(os.path.join(self.dist_dir, "index.html"), "rb") as f:
+            index_html = f.read()
+        self.index_variants: Dict[Optional[str], tuple] = {None: (index_html, f'"{hashlib.blake2b(index_html, digest_size=12).hexdigest()}"')}
+        for encoding in supported_encodings():
+            body = compress(index_html, encoding)
+            self.index_variants[encoding] = (body, f'"{hashlib.blake2b(body, digest_size=12).hexdigest()}"')
+
+        # every other file of the build, by its URL path
+        self.files: Dict[str, StaticFile] = {}
+        for root, _, files in os.walk(self.dist_dir):
+            for name in files:
+                path = os.path.join(root, name)
+                url_path = os.path.relpath(path, self.dist_dir).replace(os.sep, "/")
+                if url_path == "index.html" or name.endswith(tuple(VARIANT_SUFFIXES.values())):
+                    continue
+                # Vite puts content-hashed file names under assets/
+                self.files[url_path] = StaticFile(path, immutable=url_path.startswith("assets/"))
+
+    @staticmethod
+    def _not_modified(request: Request, etag: str) -> bool:
+        if_none_match = request.headers.get("if-none-match")
+        if if_none_match is None:
+            return False
+        tags = [tag.strip() for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags or f"W/{etag}" in tags
+
+    def _encoding(self, request: Request, available) -> Optional[str]:
+        return negotiate_encoding(
+            request.headers.get("accept-encoding", ""),
+            tuple(encoding for encoding in supported_encodings() if encoding in available)
+        )
+
+    def index_response(self, request: Request) -> Response:
+        encoding = self._encoding(request, self.index_variants)
+        body, etag = self.index_variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": REVALIDATE, "Vary": "Accept-Encoding"}
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if self._not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        if request.method == "HEAD":
+            # the headers of the GET response, without its body
+            return Response(media_type="text/html", headers={**headers, "Content-Length": str(len(body))})
+        return Response(content=body, media_type="text/html", headers=headers)
+
+    def file_response(self, request: Request, url_path: str) -> Optional[Response]:
+        """The response for a file of the build, None if there is no such file."""
+        static_file = self.files.get(url_path)
+        if static_file is None:
+            return None
+        encoding = self._encoding(request, static_file.variants)
+        path, _, etag = static_file.variants[encoding]
+        headers = {"ETag": etag, "Cache-Control": static_file.cache_control}
+        if len(static_file.variants) > 1:
+            headers["Vary"] = "Accept-Encoding"
+        if encoding:
+            headers["Content-Encoding"] = encoding
+        if self._not_modified(request, etag):
+            return Response(status_code=304, headers=headers)
+        # FileResponse only sends the headers for HEAD requests
+        return FileResponse(path, media_type=static_file.media_type, headers=headers)
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    print(f"Wrote {precompress(sys.argv[1] if len(sys.argv) > 1 else 'frontend/dist')} precompressed files")
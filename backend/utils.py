@@ -1,7 +1,7 @@
 # from passlib.context import CryptContext
-import smtplib
 from email.mime.text import MIMEText
 from backend.config import Settings
+from backend.mailer import mailer
 
 # pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 
@@ -13,7 +13,7 @@ from backend.config import Settings
 # def verify_password(plain_password: str, hashed_password: str) -> bool:
 #     return pwd_context.verify(plain_password, hashed_password) 
 
-def send_verification_email(email: str, verification_url: str):
+def verification_email(email: str, verification_url: str) -> MIMEText:
     subject = "Verify Your Email for UW Match"
     body = f"""
     Hello,
@@ -28,14 +28,12 @@ def send_verification_email(email: str, verification_url: str):
     msg["Subject"] = subject
     msg["From"] = Settings.SMTP_USERNAME
     msg["To"] = email
+    return msg
 
-    try:
-        with smtplib.SMTP(Settings.SMTP_HOST, Settings.SMTP_PORT) as server:
-            server.starttls()
-            server.login(Settings.SMTP_USERNAME, Settings.SMTP_PASSWORD)
-            server.send_message(msg)
-    except Exception as e:
-        raise Exception(f"Failed to send email: {str(e)}")
+def send_verification_email(email: str, verification_url: str):
+    # the email is sent in the background by the mailer, this only queues it
+    mailer.enqueue(verification_email(email, verification_url))
     
 if __name__ == "__main__":
-    send_verification_email("eliu59@wisc.edu", "soduhjf")
\ No newline at end of file
+    with mailer.connect() as server:
+        server.send_message(verification_email("eliu59@wisc.edu", "soduhjf"))
\ No newline at end of file
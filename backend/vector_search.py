@@ -1,164 +1,852 @@
 from datetime import datetime
+import asyncio
+import threading
+from collections import deque
 import faiss
 import numpy as np
-from typing import List, Dict
-from bson import ObjectId
+from typing import AsyncIterator, List, Dict, Optional
+from bson import ObjectId, Timestamp
 import logging
 import os
 import time
+from backend.config import Settings
+from backend.course_codes import parse_designation
+from backend.embeddings import EmbeddingProvider, embedding_service
+from backend.index_artifacts import Artifact, ArtifactStore, MmapFlatIndex
+from backend.metrics import search_stage_seconds
+from backend.singleflight import SingleFlight
+
+try:
+    import resource
+except ImportError:  # not available on Windows
+    resource = None
+
+# supported FAISS index types, "flat" is the exact brute-force baseline
+INDEX_TYPES = ("flat", "ivf_flat", "hnsw", "ivf_pq", "sq_fp16", "sq8", "pq")
+# index types that store compressed codes; their top candidates are re-ranked
+# with exact scores from the full-precision vectors kept in a memory-mapped file
+QUANTIZED_TYPES = ("ivf_pq", "sq_fp16", "sq8", "pq")
+
+def default_index_params() -> Dict:
+    """Index tuning parameters taken from the app settings."""
+    return {
+        "nlist": Settings.IVF_NLIST,
+        "nprobe": Settings.IVF_NPROBE,
+        "hnsw_m": Settings.HNSW_M,
+        "ef_construction": Settings.HNSW_EF_CONSTRUCTION,
+        "ef_search": Settings.HNSW_EF_SEARCH,
+        "pq_m": Settings.PQ_M,
+        "pq_nbits": Settings.PQ_NBITS,
+    }
+
+def create_index(index_type: str, dimension: int, n_vectors: int, params: Dict = None):
+    """Create an empty (possibly untrained) inner-product FAISS index of the given type."""
+    if index_type not in INDEX_TYPES:
+        raise ValueError(f"Unknown index type {index_type!r}, expected one of {INDEX_TYPES}")
+    params = {**default_index_params(), **(params or {})}
+
+    if index_type == "flat":
+        return faiss.IndexFlatIP(dimension)
+
+    if index_type == "sq_fp16":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_fp16, faiss.METRIC_INNER_PRODUCT)
+
+    if index_type == "sq8":
+        return faiss.IndexScalarQuantizer(dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT)
+
+    if index_type in ("pq", "ivf_pq"):
+        if dimension % params["pq_m"] != 0:
+            raise ValueError(f"PQ_M={params['pq_m']} does not divide dimension {dimension}")
+        # the product quantizer needs at least 2^nbits training points
+        if n_vectors < 2 ** params["pq_nbits"]:
+            logging.warning(f"Only {n_vectors} vectors, too few to train a product quantizer; using a flat index")
+            return faiss.IndexFlatIP(dimension)
+        if index_type == "pq":
+            return faiss.IndexPQ(dimension, params["pq_m"], params["pq_nbits"], faiss.METRIC_INNER_PRODUCT)
+
+    if index_type == "hnsw":
+        index = faiss.IndexHNSWFlat(dimension, params["hnsw_m"], faiss.METRIC_INNER_PRODUCT)
+        index.hnsw.efConstruction = params["ef_construction"]
+        index.hnsw.efSearch = params["ef_search"]
+        return index
+
+    # IVF indexes need roughly 39 training points per cluster, so clamp nlist for small catalogs
+    nlist = params["nlist"] or int(4 * np.sqrt(n_vectors))
+    nlist = max(1, min(nlist, n_vectors // 39))
+
+    if index_type == "ivf_pq":
+        # "np" skips polysemous training, which we never search with and which takes minutes at 1536 dimensions
+        description = f"IVF{nlist},PQ{params['pq_m']}x{params['pq_nbits']}np"
+    else:
+        description = f"IVF{nlist},Flat"
+
+    index = faiss.index_factory(dimension, description, faiss.METRIC_INNER_PRODUCT)
+    set_search_params(index, params)
+    return index
+
+def set_search_params(index, params: Dict = None) -> None:
+    """Apply query-time knobs (nprobe for IVF, efSearch for HNSW) to an index."""
+    params = {**default_index_params(), **(params or {})}
+    space = faiss.ParameterSpace()
+    base = faiss.downcast_index(index)
+    if isinstance(base, (faiss.IndexIDMap, faiss.IndexIDMap2)):
+        base = faiss.downcast_index(base.index)
+    if isinstance(base, faiss.IndexIVF):
+        space.set_index_parameter(index, "nprobe", params["nprobe"])
+    elif isinstance(base, faiss.IndexHNSW):
+        space.set_index_parameter(index, "efSearch", params["ef_search"])
+
+def rerank(queries: np.ndarray, I: np.ndarray, exact_vectors) -> tuple:
+    """
+    Re-score candidate ids with exact inner products and re-sort each row.
+    exact_vectors maps an array of vector ids to their full-precision rows.
+    Returns (D, I) like index.search, missing candidates stay -1 at the end.
+    """
+    found = I >= 0
+    scores = np.full(I.shape, -np.inf, dtype=np.float32)
+    rows, _ = np.nonzero(found)
+    if len(rows):
+        scores[found] = np.einsum("ij,ij->i", exact_vectors(I[found]), queries[rows])
+    order = np.argsort(-scores, axis=1, kind="stable")
+    I = np.take_along_axis(I, order, axis=1)
+    D = np.take_along_axis(scores, order, axis=1)
+    I[np.isneginf(D)] = -1
+    return D, I
+
+def peak_rss_mb() -> float:
+    """Peak resident memory of this process in MB (0 where it can't be measured)."""
+    if resource is None:
+        return 0.0
+    # ru_maxrss is in KB on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+class IndexSnapshot:
+    """
+    A FAISS index together with its id tables. Rebuilds produce a new snapshot
+    that replaces the old one in a single assignment, so a search always sees
+    an index and id tables that belong together.
+
+    Vector ids map to compact int32 course ordinals, and a single table maps
+    each ordinal to its course ObjectId string.
+
+    The main index is loaded from a published artifact and never modified, so it
+    can stay memory-mapped and shared between workers. Catalog changes tombstone
+    removed vectors (ordinal -1) and add new ones to a small in-memory delta index,
+    both are merged into the main index when the next version is published.
+    """
+
+    def __init__(self, index, vector_ordinals: np.ndarray, course_table: List[str], version: int, built_at: datetime,
+                 kind: str = "flat", vectors: Optional[np.ndarray] = None, artifact_version: Optional[str] = None):
+        self.index = index
+        # vectors added by catalog changes since the artifact was published, created on first use
+        self.delta = None
+        # vector id -> course ordinal, -1 for removed vectors
+        # the array may have spare capacity at the end, only the first `size` entries are used
+        self._ordinals = np.asarray(vector_ordinals, dtype=np.int32)
+        self.size = len(self._ordinals)
+        # course ordinal -> course id, and back
+        self.course_table = course_table
+        self.ordinal_of = {course_id: ordinal for ordinal, course_id in enumerate(course_table)}
+        self.version = version
+        self.built_at = built_at
+        self.kind = kind
+        # full-precision vectors (memory-mapped from the artifact) of flat and quantized indexes,
+        # quantized indexes re-rank their candidates with them; only the rows that are read get paged in
+        self.vectors = vectors
+        self.extra_vectors: Dict[int, np.ndarray] = {}
+        # artifact version the main index was loaded from, None for an index only held in memory
+        self.artifact_version = artifact_version
+        # held while catalog changes modify the snapshot or it is merged for publishing
+        self.lock = threading.Lock()
+
+    @classmethod
+    def from_artifact(cls, artifact: Artifact, version: int = 0) -> "IndexSnapshot":
+        meta = artifact.meta
+        return cls(artifact.index, artifact.vector_ordinals, artifact.course_table, version,
+                   datetime.fromisoformat(meta["built_at"]), meta["kind"], artifact.vectors, artifact.version)
+
+    @property
+    def vector_ordinals(self) -> np.ndarray:
+        return self._ordinals[:self.size]
+
+    @property
+    def reranked(self) -> bool:
+        return self.kind in QUANTIZED_TYPES and self.vectors is not None
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal + (self.delta.ntotal if self.delta is not None else 0)
+
+    @property
+    def live_vectors(self) -> int:
+        # ntotal still counts tombstoned vectors of the main index until the next version is published
+        return int(np.count_nonzero(self.vector_ordinals >= 0))
+
+    def exact_vectors(self, vector_ids: np.ndarray) -> np.ndarray:
+        """Full-precision rows of the given vector ids."""
+        rows = np.empty((len(vector_ids), self.index.d), dtype=np.float32)
+        on_disk = vector_ids < (len(self.vectors) if self.vectors is not None else 0)
+        if on_disk.any():
+            rows[on_disk] = self.vectors[vector_ids[on_disk]]
+        for row in np.flatnonzero(~on_disk):
+            rows[row] = self.extra_vectors[int(vector_ids[row])]
+        return rows
+
+    def search(self, queries: np.ndarray, fetch: int):
+        """Top `fetch` hits of each query over the main and delta indexes, like index.search."""
+        D = np.empty((len(queries), 0), dtype=np.float32)
+        I = np.empty((len(queries), 0), dtype=np.int64)
+        if self.index.ntotal:
+            D, I = self.index.search(queries, min(fetch, self.index.ntotal))
+        if self.delta is not None and self.delta.ntotal:
+            delta_D, delta_I = self.delta.search(queries, min(fetch, self.delta.ntotal))
+            D, I = np.hstack([D, delta_D]), np.hstack([I, delta_I])
+            order = np.argsort(-D, axis=1, kind="stable")[:, :fetch]
+            D, I = np.take_along_axis(D, order, axis=1), np.take_along_axis(I, order, axis=1)
+        if self.reranked:
+            D, I = rerank(queries, I, self.exact_vectors)
+        return D, I
+
+    def best_per_course(self, D: np.ndarray, I: np.ndarray):
+        """
+        Collapse one row of FAISS results to the best hit per course.
+        Returns (ordinals, similarities), both ordered by descending similarity.
+        """
+        # approximate indexes pad missing results with -1
+        found = (I >= 0) & (I < self.size)
+        ordinals = self.vector_ordinals[I[found]]
+        similarities = D[found]
+        live = ordinals >= 0
+        ordinals, similarities = ordinals[live], similarities[live]
+        # hits come sorted by similarity, so the first hit of each course is its best one
+        _, first = np.unique(ordinals, return_index=True)
+        first.sort()
+        return ordinals[first], similarities[first]
+
+    def remove_course(self, course_id: str) -> int:
+        """Drop every vector of a course, returns how many were removed."""
+        ordinal = self.ordinal_of.get(course_id)
+        if ordinal is None:
+            return 0
+        with self.lock:
+            vector_ids = np.flatnonzero(self.vector_ordinals == ordinal).astype(np.int64)
+            if not len(vector_ids):
+                return 0
+            # the main index is read-only, the -1 ordinals act as tombstones until the next full build
+            self._ordinals[vector_ids] = -1
+            if self.delta is not None:
+                self.delta.remove_ids(vector_ids)
+            for vector_id in vector_ids.tolist():
+                self.extra_vectors.pop(vector_id, None)
+            return len(vector_ids)
+
+    def upsert_course(self, course: Dict, embedding_field: str, dimension: int) -> int:
+        """Replace the vectors of one course, returns how many vectors were removed or added."""
+        course_id = str(course["_id"])
+        removed = self.remove_course(course_id)
+
+        value = course.get(embedding_field)
+        if not value:
+            return removed
+        # code_embeddings holds a list of embeddings, title_embedding a single one
+        vectors = np.asarray(value if embedding_field == "code_embeddings" else [value], dtype=np.float32)
+        if vectors.ndim != 2 or vectors.shape[1] != dimension:
+            logging.warning(f"Course {course_id} has {embedding_field} of shape {vectors.shape}, skipping")
+            return removed
+        norms = np.linalg.norm(vectors, axis=1)
+        vectors = vectors[norms > 0] / norms[norms > 0, None]
+
+        with self.lock:
+            ordinal = self.ordinal_of.get(course_id)
+            if ordinal is None:
+                ordinal = self.ordinal_of[course_id] = len(self.course_table)
+                self.course_table.append(course_id)
+            if self.size + len(vectors) > len(self._ordinals):
+                grown = np.full(max(self.size + len(vectors), 2 * len(self._ordinals)), -1, dtype=np.int32)
+                grown[:self.size] = self.vector_ordinals
+                self._ordinals = grown
+            vector_ids = np.arange(self.size, self.size + len(vectors), dtype=np.int64)
+            if self.delta is None:
+                self.delta = faiss.IndexIDMap2(faiss.IndexFlatIP(dimension))
+            self.delta.add_with_ids(vectors, vector_ids)
+            self._ordinals[vector_ids] = ordinal
+            self.size += len(vectors)
+            self.extra_vectors.update(zip(vector_ids.tolist(), vectors))
+        return removed + len(vectors)
+
+    def merged(self, store: ArtifactStore, name: str):
+        """
+        The main index with the delta vectors added and the tombstoned ones removed,
+        and the id tables, ready to publish. Returns (index, vector_ordinals, course_table, vectors).
+        """
+        with self.lock:
+            course_table = list(self.course_table)
+            added_ids = np.asarray(sorted(self.extra_vectors), dtype=np.int64)
+            # the surviving vectors are renumbered 0..n-1, so vector ids stay row numbers
+            live_ids = np.flatnonzero(self.vector_ordinals >= 0).astype(np.int64)
+            dead_ids = np.flatnonzero(self.vector_ordinals < 0).astype(np.int64)
+            vector_ordinals = self.vector_ordinals[live_ids]
+            index = None
+            if self.kind != "flat":
+                if self.artifact_version is not None:
+                    # a memory-mapped index is read-only, the copy read here is only used for writing
+                    index = store.read_writable_index(name, self.artifact_version)
+                else:
+                    index = faiss.clone_index(self.index)
+                if len(added_ids):
+                    index.add_with_ids(self.exact_vectors(added_ids), added_ids)
+                if len(dead_ids):
+                    index = self._compacted(index, live_ids, dead_ids)
+            vectors = None
+            if self.vectors is not None:
+                vectors = self.exact_vectors(live_ids)
+        return index, vector_ordinals, course_table, vectors
+
+    def _compacted(self, index, live_ids: np.ndarray, dead_ids: np.ndarray):
+        """index (an IndexIDMap2) without the dead vectors, the live ones renumbered to their rank in live_ids."""
+        new_ids = np.full(self.size, -1, dtype=np.int64)
+        new_ids[live_ids] = np.arange(len(live_ids), dtype=np.int64)
+        inner = faiss.downcast_index(index.index)
+        if isinstance(inner, faiss.IndexFlatCodes):
+            # flat code arrays (PQ, SQ) shift the remaining vectors down, which IndexIDMap2 tracks
+            index.remove_ids(faiss.IDSelectorBatch(dead_ids))
+            ids = faiss.vector_to_array(index.id_map)
+            faiss.copy_array_to_vector(new_ids[ids], index.id_map)
+            index.construct_rev_map()
+            return index
+        # IVF lists and HNSW graphs can't drop vectors that way, the live vectors go into an
+        # emptied copy instead, which keeps the IVF training
+        ids = faiss.vector_to_array(index.id_map)
+        live = new_ids[ids] >= 0
+        if self.vectors is not None:
+            # quantized vectors are re-encoded from the full-precision ones, not from their decoded codes
+            vectors = self.exact_vectors(ids[live])
+        else:
+            if isinstance(inner, faiss.IndexIVF):
+                inner.make_direct_map()
+            vectors = inner.reconstruct_n(0, inner.ntotal)[live]
+        empty = faiss.clone_index(inner)
+        empty.reset()
+        compacted = faiss.IndexIDMap2(empty)
+        compacted.add_with_ids(vectors, new_ids[ids[live]])
+        return compacted
 
 class VectorSearchManager:
-    def __init__(self):
-        self.dimension = 1536  # text-embedding-3-small dimension
-        self.title_index = None
-        self.code_index = None
-        self.title_course_ids = []
-        self.code_course_ids = []
+    # catalog changes remembered for replaying on indexes built or published while they arrived
+    CHANGE_LOG_SIZE = 10000
+
+    def __init__(self, provider: Optional[EmbeddingProvider] = None):
+        # where catalog vectors come from, it has to be the provider queries are embedded with
+        self.provider = provider or embedding_service.provider
+        # the live snapshot of each index, "title" and "code"
+        self.snapshots: Dict[str, IndexSnapshot] = {"title": None, "code": None}
         self.last_update = None
-        
-    async def build_index(self, course_collection, use_code_embedding: bool = False) -> None:
+        # index type used for each index, see INDEX_TYPES
+        self.title_index_type = Settings.TITLE_INDEX_TYPE
+        self.code_index_type = Settings.CODE_INDEX_TYPE
+        # versioned index files shared with the other workers
+        self.store = ArtifactStore(Settings.INDEX_ARTIFACT_DIR, Settings.INDEX_ARTIFACT_KEEP)
+        # running background rebuilds by index type, and the recent catalog changes as (cluster time, course id, course)
+        self._rebuilds = SingleFlight("index_rebuild")
+        self._change_log: Dict[str, deque] = {
+            "title": deque(maxlen=self.CHANGE_LOG_SIZE),
+            "code": deque(maxlen=self.CHANGE_LOG_SIZE),
+        }
+        # cluster time of the last applied change, it orders changes the same way in every worker
+        self._last_change_time: Optional[Timestamp] = None
+        self._versions = {"title": 0, "code": 0}
+        # indexes changed by catalog updates that still have to be published
+        self._dirty = set()
+        self._flush_task = None
+        self._watch_task = None
+
+    @property
+    def dimension(self) -> int:
+        return self.provider.dimension
+
+    @property
+    def title_index(self):
+        snapshot = self.snapshots["title"]
+        return snapshot.index if snapshot else None
+
+    @property
+    def code_index(self):
+        snapshot = self.snapshots["code"]
+        return snapshot.index if snapshot else None
+
+    def is_building(self, use_code_embedding: bool) -> bool:
+        return self._rebuilds.in_flight("code" if use_code_embedding else "title")
+
+    def is_stale(self, use_code_embedding: bool, max_age_days: int = 1) -> bool:
+        snapshot = self.snapshots["code" if use_code_embedding else "title"]
+        return snapshot is None or (datetime.now() - snapshot.built_at).days >= max_age_days
+
+    def status(self) -> Dict:
+        """Build state of both indexes: building, ready, version and built_at."""
+        status = {}
+        for use_code_embedding in (False, True):
+            index_type = "code" if use_code_embedding else "title"
+            snapshot = self.snapshots[index_type]
+            status[index_type] = {
+                "building": self.is_building(use_code_embedding),
+                "ready": snapshot is not None,
+                "version": snapshot.version if snapshot else 0,
+                "built_at": snapshot.built_at.isoformat() if snapshot else None,
+                "index_type": self.code_index_type if use_code_embedding else self.title_index_type,
+                "vectors": snapshot.live_vectors if snapshot else 0,
+                "tombstones": snapshot.ntotal - snapshot.live_vectors if snapshot else 0,
+                "artifact": snapshot.artifact_version if snapshot else None,
+            }
+        return status
+
+    def _artifact_meta(self, use_code_embedding: bool) -> Dict:
+        # a published index is only reused if it was built the way this worker would build it
+        return {
+            "embedding_model": self.provider.name,
+            "kind": self.code_index_type if use_code_embedding else self.title_index_type,
+            "dimension": self.dimension,
+        }
+
+    def _swap_in(self, index_type: str, snapshot: IndexSnapshot, changes_since: Optional[Timestamp]) -> IndexSnapshot:
+        """Make a freshly built or loaded index the live snapshot."""
+        self._versions[index_type] += 1
+        snapshot.version = self._versions[index_type]
+        # catalog changes after the ones the index contains (it was built or published while they arrived)
+        # are replayed on it first, replaying a change the index already has is harmless
+        embedding_field = "code_embeddings" if index_type == "code" else "title_embedding"
+        for cluster_time, course_id, course in list(self._change_log[index_type]):
+            if changes_since is not None and cluster_time <= changes_since:
+                continue
+            if course is None:
+                snapshot.remove_course(course_id)
+            else:
+                snapshot.upsert_course(course, embedding_field, self.dimension)
+        self.snapshots[index_type] = snapshot
+        return snapshot
+
+    async def _load_artifact(self, use_code_embedding: bool, version: Optional[str] = None) -> bool:
+        """Swap in the current (or given) published version, returns False if there is none to use."""
+        index_type = "code" if use_code_embedding else "title"
+        snapshot = self.snapshots[index_type]
+        version = version or self.store.current_version(index_type)
+        if version is None:
+            return False
+        if snapshot is not None and snapshot.artifact_version == version:
+            return True
+        loop = asyncio.get_running_loop()
+        try:
+            artifact = await loop.run_in_executor(
+                None, self.store.load, index_type, version, self._artifact_meta(use_code_embedding)
+            )
+        except FileNotFoundError:
+            # the publisher pruned the version after it was listed, a newer one is current by now
+            latest = self.store.current_version(index_type)
+            if latest is None or latest == version:
+                logging.warning(f"Index artifact {index_type}/{version} is missing")
+                return False
+            logging.info(f"Index artifact {index_type}/{version} was pruned, loading {latest} instead")
+            return await self._load_artifact(use_code_embedding, latest)
+        if artifact is None:
+            return False
+        if not isinstance(artifact.index, MmapFlatIndex):
+            set_search_params(artifact.index)
+        changes_until = artifact.meta["changes_until"]
+        changes_since = Timestamp(*changes_until) if changes_until else None
+        snapshot = self._swap_in(index_type, IndexSnapshot.from_artifact(artifact), changes_since)
+        self.last_update = snapshot.built_at
+        logging.info(f"Loaded {index_type} index version {version} ({artifact.meta['kind']}).")
+        return True
+
+    def rebuild_in_background(self, course_collection, use_code_embedding: bool = False,
+                              use_cache: bool = False) -> asyncio.Task:
+        """
+        Rebuild an index from MongoDB into a shadow index without blocking the caller.
+        Searches keep using the current index until the new one is swapped in.
+        Returns the running task, callers that need the index can await it. The task is
+        shared with other callers, so await it through asyncio.shield().
+        """
+        index_type = "code" if use_code_embedding else "title"
+        # callers that arrive while a rebuild of this index runs get that rebuild's task
+        building = self.is_building(use_code_embedding)
+        task = self._rebuilds.start(index_type, lambda: self.build_index(course_collection, use_code_embedding, use_cache))
+        if not building:
+            task.add_done_callback(self._log_rebuild_result)
+            # a stale index on a worker that doesn't publish triggers this on every search, so it stays out of INFO
+            logging.debug("Started background rebuild of the %s index", index_type)
+        return task
+
+    @staticmethod
+    def _log_rebuild_result(task: asyncio.Task) -> None:
+        if not task.cancelled() and task.exception():
+            logging.error("Background index rebuild failed", exc_info=task.exception())
+
+    async def build_index(self, course_collection, use_code_embedding: bool = False, use_cache: bool = True) -> None:
         start_time = time.time()
+        # changes after this one may be missed by the cursor and are replayed on the new index
+        changes_until = self._last_change_time
         index_type = "code" if use_code_embedding else "title"
+        kind = self.code_index_type if use_code_embedding else self.title_index_type
+        loop = asyncio.get_running_loop()
+
+        # Only one worker builds and publishes, the others load the version it publishes
+        publisher = self.store.try_become_publisher()
+        if use_cache or not publisher:
+            if await self._load_artifact(use_code_embedding):
+                return
+            if not publisher:
+                logging.info(f"Waiting for another worker to publish the {index_type} index...")
+                deadline = time.time() + Settings.INDEX_ARTIFACT_WAIT
+                while time.time() < deadline:
+                    await asyncio.sleep(1)
+                    if await self._load_artifact(use_code_embedding):
+                        return
+                logging.warning(f"No {index_type} index was published in time, building it in this worker")
         logging.info(f"Starting to build {index_type} vector search index...")
-        
-        # Try loading cached index
-        index_file = f"faiss_{index_type}_index.idx"
-        ids_file = f"{index_type}_course_ids.txt"
-        
-        if os.path.exists(index_file):
-            if use_code_embedding:
-                self.code_index = faiss.read_index(index_file)
-                with open(ids_file, "r") as f:
-                    self.code_course_ids = f.read().splitlines()
-            else:
-                self.title_index = faiss.read_index(index_file)
-                with open(ids_file, "r") as f:
-                    self.title_course_ids = f.read().splitlines()
-            logging.info(f"Loaded cached {index_type} FAISS index.")
-            return
-        
-        # Debug: Print sample document
-        sample_doc = await course_collection.find_one({"code_embeddings": {"$exists": True}})
-        if sample_doc and use_code_embedding:
-            print(f"\nSample document structure:")
-            print(f"code_embeddings type: {type(sample_doc.get('code_embeddings'))}")
-            print(f"Number of embeddings: {len(sample_doc.get('code_embeddings', []))}")
-        
-        # Query for embeddings
+
+        # Query for embeddings, or for the texts to embed when the provider has no stored catalog vectors
         embedding_field = "code_embeddings" if use_code_embedding else "title_embedding"
-        courses = await course_collection.find(
-            {embedding_field: {"$exists": True}},
-            {"_id": 1, embedding_field: 1}
-        ).to_list(length=None)
-        
-        if not courses:
+        source_field = self._source_field(use_code_embedding)
+        capacity = await self._count_vectors(course_collection, source_field, use_code_embedding)
+        if not capacity:
             logging.warning(f"No courses found with {index_type} embeddings")
             return
-            
-        # Extract embeddings and IDs
-        embeddings = []
-        course_ids = []
-        
-        print(f"\nProcessing {len(courses)} courses...")
-        for course in courses:
-            if use_code_embedding:
-                # Handle array of code embeddings
-                if course.get(embedding_field):
-                    for embedding in course[embedding_field]:
-                        norm = np.linalg.norm(embedding)
-                        if norm > 0:
-                            normalized_embedding = embedding / norm
-                            embeddings.append(normalized_embedding)
-                            course_ids.append(str(course['_id']))
-                        else:
-                            logging.warning(f"Zero vector encountered for course {course['_id']}")
-                    print(f"Added {len(course[embedding_field])} embeddings for course {course['_id']}")
-            else:
-                # Handle single title embedding
-                if course.get(embedding_field):
-                    norm = np.linalg.norm(course[embedding_field])
-                    if norm > 0:
-                        normalized_embedding = course[embedding_field] / norm
-                        embeddings.append(normalized_embedding)
-                        course_ids.append(str(course['_id']))
-                    else:
-                        logging.warning(f"Zero vector encountered for course {course['_id']}")
-        
-        if not embeddings:
+
+        # Vectors are streamed from the cursor in fixed-size batches into one preallocated matrix,
+        # the CPU-bound work (normalizing, adding to FAISS) runs in the default executor
+        # vector ids are row numbers in the matrix, IndexIDMap2 keeps them stable when vectors are merged in
+        # flat indexes are searched directly on the (memory-mapped) matrix and need no FAISS index
+        index = None if kind == "flat" else faiss.IndexIDMap2(create_index(kind, self.dimension, capacity))
+        # indexes that need training (IVF) are trained on the whole matrix once it is filled
+        add_per_batch = index is None or index.is_trained
+        matrix = np.empty((capacity, self.dimension), dtype=np.float32)
+        # course ordinal of every row, and the ordinal -> course id table
+        ordinals = np.empty(capacity, dtype=np.int32)
+        course_table = []
+        count = 0
+        batch_size = Settings.INDEX_BUILD_BATCH_SIZE
+
+        batch_vectors, batch_ordinals = [], []
+        cursor = course_collection.find(
+            {source_field: {"$exists": True}},
+            {"_id": 1, source_field: 1},
+            batch_size=batch_size
+        )
+        async for course in self._with_embeddings(cursor, use_code_embedding):
+            value = course.get(embedding_field)
+            if not value:
+                continue
+            # code_embeddings holds a list of embeddings, title_embedding a single one
+            vectors = value if use_code_embedding else [value]
+            batch_vectors.extend(vectors)
+            batch_ordinals.extend([len(course_table)] * len(vectors))
+            course_table.append(str(course['_id']))
+            if len(batch_vectors) >= batch_size:
+                matrix, ordinals, count = await loop.run_in_executor(
+                    None, self._ingest_batch, index, matrix, ordinals, count, batch_vectors, batch_ordinals, add_per_batch
+                )
+                batch_vectors, batch_ordinals = [], []
+        if batch_vectors:
+            matrix, ordinals, count = await loop.run_in_executor(
+                None, self._ingest_batch, index, matrix, ordinals, count, batch_vectors, batch_ordinals, add_per_batch
+            )
+
+        if not count:
             logging.warning(f"No valid {index_type} embeddings found")
             return
-            
-        print(f"\nTotal embeddings collected: {len(embeddings)}")
-        print(f"Unique courses: {len(set(course_ids))}")
-        
-        # Build FAISS index
-        embeddings_array = np.array(embeddings, dtype=np.float32)
-        index = faiss.IndexFlatIP(self.dimension)
-        index.add(embeddings_array)
-        
-        # Save index and IDs
-        if use_code_embedding:
-            self.code_index = index
-            self.code_course_ids = course_ids
+
+        if not add_per_batch:
+            await loop.run_in_executor(None, self._train_and_add, index, matrix[:count])
+
+        logging.info(f"{index_type}: {count} embeddings from {len(course_table)} unique courses")
+
+        # Publish the new index, then swap in the memory-mapped version so this worker shares it too
+        built_at = datetime.now()
+        # the vectors are kept for flat indexes (searched directly) and quantized ones (re-ranking)
+        vectors = matrix[:count] if kind == "flat" or kind in QUANTIZED_TYPES else None
+        meta = {
+            **self._artifact_meta(use_code_embedding),
+            "index_type": index_type,
+            "built_at": built_at.isoformat(),
+            "changes_until": self._timestamp_json(changes_until),
+            "count": count,
+        }
+        try:
+            version = await loop.run_in_executor(
+                None, self.store.publish, index_type, index, ordinals[:count], course_table, vectors, meta
+            )
+        except OSError:
+            logging.exception(f"Could not publish the {index_type} index, keeping it in memory")
+            snapshot = IndexSnapshot(
+                index if index is not None else MmapFlatIndex(vectors),
+                ordinals[:count], course_table, 0, built_at, kind, vectors
+            )
+            self._swap_in(index_type, snapshot, changes_until)
+            self.last_update = built_at
         else:
-            self.title_index = index
-            self.title_course_ids = course_ids
-            
-        self.last_update = datetime.now()
-        
-        # Cache the index
-        faiss.write_index(index, index_file)
-        with open(ids_file, "w") as f:
-            for course_id in course_ids:
-                f.write(f"{course_id}\n")
-        
+            del matrix, vectors, index
+            await self._load_artifact(use_code_embedding, version)
+
         end_time = time.time()
-        logging.info(f"{index_type} vector search index built in {end_time - start_time:.2f} seconds with {len(embeddings)} embeddings")
+        logging.info(
+            f"{index_type} vector search index ({kind}) built in {end_time - start_time:.2f} seconds "
+            f"with {count} embeddings, peak RSS {peak_rss_mb():.0f} MB"
+        )
 
-    async def search(self, query_vector: List[float], k: int = 10, use_code_embedding: bool = False) -> List[Dict]:
-        index = self.code_index if use_code_embedding else self.title_index
-        course_ids = self.code_course_ids if use_code_embedding else self.title_course_ids
-        
-        if not index:
+    async def _count_vectors(self, course_collection, source_field: str, use_code_embedding: bool) -> int:
+        """Upper bound on the number of vectors, used to preallocate the build matrix."""
+        if not use_code_embedding or not self.provider.has_stored_embeddings:
+            # designations embedded at build time are counted per course, the matrix grows for cross-listings
+            return await course_collection.count_documents({source_field: {"$exists": True}})
+        field = f"${source_field}"
+        result = await course_collection.aggregate([
+            {"$match": {source_field: {"$exists": True}}},
+            {"$group": {
+                "_id": None,
+                "total": {"$sum": {"$cond": [{"$isArray": field}, {"$size": field}, 0]}}
+            }},
+        ]).to_list(length=1)
+        return result[0]["total"] if result else 0
+
+    def _source_field(self, use_code_embedding: bool) -> str:
+        # the course field vectors are read from, or embedded from
+        if self.provider.has_stored_embeddings:
+            return "code_embeddings" if use_code_embedding else "title_embedding"
+        return "course_designation" if use_code_embedding else "title"
+
+    @staticmethod
+    def _course_texts(course: Dict, use_code_embedding: bool) -> List[str]:
+        # one text per vector: the title, or every code of a (possibly cross-listed) designation
+        if not use_code_embedding:
+            return [course["title"]] if course.get("title") else []
+        designation = course.get("course_designation")
+        if not designation:
             return []
+        return [f"{subject} {number}" for subject, number in parse_designation(designation)] or [designation]
+
+    async def _embed_courses(self, courses: List[Dict], use_code_embedding: bool) -> None:
+        """Set the embedding field of each course from its texts, all of them in one provider call."""
+        embedding_field = "code_embeddings" if use_code_embedding else "title_embedding"
+        texts_per_course = [self._course_texts(course, use_code_embedding) for course in courses]
+        texts = [text for course_texts in texts_per_course for text in course_texts]
+        embeddings = await self.provider.embed_texts(texts) if texts else None
+        position = 0
+        for course, course_texts in zip(courses, texts_per_course):
+            if not course_texts:
+                course.pop(embedding_field, None)
+                continue
+            # in the shape of the stored fields: a list of embeddings for codes, one embedding for the title
+            vectors = embeddings[position:position + len(course_texts)].tolist()
+            position += len(course_texts)
+            course[embedding_field] = vectors if use_code_embedding else vectors[0]
+
+    async def _with_embeddings(self, cursor, use_code_embedding: bool) -> AsyncIterator[Dict]:
+        """The courses of the cursor with their vectors, embedded in batches if the provider has no stored ones."""
+        if self.provider.has_stored_embeddings:
+            async for course in cursor:
+                yield course
+            return
+        batch = []
+        async for course in cursor:
+            batch.append(course)
+            if len(batch) >= Settings.INDEX_BUILD_BATCH_SIZE:
+                await self._embed_courses(batch, use_code_embedding)
+                for embedded in batch:
+                    yield embedded
+                batch = []
+        if batch:
+            await self._embed_courses(batch, use_code_embedding)
+            for embedded in batch:
+                yield embedded
+
+    def _ingest_batch(self, index, matrix: np.ndarray, ordinals: np.ndarray, count: int,
+                      batch_vectors: List, batch_ordinals: List[int], add_to_index: bool):
+        """Normalize one batch in a single vectorized step and append it to the matrix (and index)."""
+        batch = np.asarray(batch_vectors, dtype=np.float32)
+        batch_ordinals = np.asarray(batch_ordinals, dtype=np.int32)
+        norms = np.linalg.norm(batch, axis=1)
+        keep = norms > 0
+        if not keep.all():
+            logging.warning(f"Skipped {int((~keep).sum())} zero vectors")
+            batch, batch_ordinals, norms = batch[keep], batch_ordinals[keep], norms[keep]
+        batch /= norms[:, None]
+
+        # the catalog can grow between counting and reading, so grow the buffers if needed
+        end = count + len(batch)
+        if end > len(matrix):
+            grown = np.empty((max(end, 2 * len(matrix)), self.dimension), dtype=np.float32)
+            grown[:count] = matrix[:count]
+            matrix = grown
+            ordinals = np.resize(ordinals, len(matrix))
+        matrix[count:end] = batch
+        ordinals[count:end] = batch_ordinals
+        if add_to_index and index is not None:
+            index.add_with_ids(matrix[count:end], np.arange(count, end, dtype=np.int64))
+        return matrix, ordinals, end
+
+    @staticmethod
+    def _train_and_add(index, vectors: np.ndarray) -> None:
+        index.train(vectors)
+        index.add_with_ids(vectors, np.arange(len(vectors), dtype=np.int64))
+
+    async def apply_change(self, change: Dict) -> None:
+        """Apply one course_collection change stream event to both indexes."""
+        course_id = str(change["documentKey"]["_id"])
+        operation = change["operationType"]
+
+        if operation == "update":
+            description = change.get("updateDescription", {})
+            changed_fields = list(description.get("updatedFields", {})) + description.get("removedFields", [])
+            # only changes of what the vectors come from matter to the indexes
+            source_fields = (self._source_field(False), self._source_field(True))
+            if not any(field.split(".")[0] in source_fields for field in changed_fields):
+                return
+
+        course = None if operation == "delete" else change.get("fullDocument")
+        if course is not None and not self.provider.has_stored_embeddings:
+            # embedded from the new texts before anything else, so changes stay in cluster time order
+            course = dict(course)
+            for use_code_embedding in (False, True):
+                await self._embed_courses([course], use_code_embedding)
+        # change stream events carry the cluster time of their operation
+        cluster_time = change.get("clusterTime") or Timestamp(int(time.time()), 0)
+        self._last_change_time = cluster_time
+        for use_code_embedding in (False, True):
+            index_type = "code" if use_code_embedding else "title"
+            # a running rebuild or another worker's publish may miss this change, it is replayed on their result
+            self._change_log[index_type].append((cluster_time, course_id, course))
+            snapshot = self.snapshots[index_type]
+            if snapshot is None:
+                continue
+            if course is None:
+                changed = snapshot.remove_course(course_id)
+            else:
+                embedding_field = "code_embeddings" if use_code_embedding else "title_embedding"
+                changed = snapshot.upsert_course(course, embedding_field, self.dimension)
+            if changed:
+                self._dirty.add(use_code_embedding)
+        logging.info(f"Applied {operation} of course {course_id} to the vector indexes")
+        self._schedule_flush()
+
+    def _schedule_flush(self) -> None:
+        # catalog imports send bursts of changes, so a new version is published once things calm down
+        if self._dirty and (self._flush_task is None or self._flush_task.done()):
+            self._flush_task = asyncio.create_task(self._flush_cache())
+
+    async def _flush_cache(self) -> None:
+        await asyncio.sleep(Settings.INDEX_CACHE_FLUSH_DELAY)
+        # every worker applies the changes, only the publisher writes them out
+        if not self.store.try_become_publisher():
+            self._dirty.clear()
+            return
+        loop = asyncio.get_running_loop()
+        while self._dirty:
+            use_code_embedding = self._dirty.pop()
+            index_type = "code" if use_code_embedding else "title"
+            snapshot = self.snapshots[index_type]
+            if snapshot is None or self.is_building(use_code_embedding):
+                continue
+            changes_until = self._last_change_time
+            index, vector_ordinals, course_table, vectors = await loop.run_in_executor(
+                None, snapshot.merged, self.store, index_type
+            )
+            meta = {
+                **self._artifact_meta(use_code_embedding),
+                "index_type": index_type,
+                "built_at": snapshot.built_at.isoformat(),
+                "changes_until": self._timestamp_json(changes_until),
+                "count": len(vector_ordinals),
+            }
+            version = await loop.run_in_executor(
+                None, self.store.publish, index_type, index, vector_ordinals, course_table, vectors, meta
+            )
+            await self._load_artifact(use_code_embedding, version)
+
+    @staticmethod
+    def _timestamp_json(timestamp: Optional[Timestamp]) -> Optional[List[int]]:
+        return [timestamp.time, timestamp.inc] if timestamp is not None else None
+
+    def watch_artifacts(self) -> asyncio.Task:
+        """Start reloading indexes whenever another worker publishes a new version."""
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch_artifacts())
+        return self._watch_task
+
+    async def _watch_artifacts(self) -> None:
+        while True:
+            await asyncio.sleep(Settings.INDEX_ARTIFACT_POLL_INTERVAL)
+            for use_code_embedding in (False, True):
+                if self.is_building(use_code_embedding):
+                    continue
+                try:
+                    await self._load_artifact(use_code_embedding)
+                except Exception:
+                    logging.exception("Failed to reload a published index")
+
+    async def stop_watching(self) -> None:
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def search(self, query_vector: List[float], k: int = 10, use_code_embedding: bool = False) -> List[Dict]:
+        results = await self.search_many([query_vector], k=k, use_code_embedding=use_code_embedding)
+        return results[0]
+
+    async def search_many(self, query_vectors, k: int = 10, use_code_embedding: bool = False) -> List[List[Dict]]:
+        """Search several queries with one matrix index.search call, results are in input order."""
+        # take the snapshot once so a swap in the middle of this search can't mix two indexes
+        snapshot = self.snapshots["code" if use_code_embedding else "title"]
+        queries = np.array(query_vectors, dtype=np.float32).reshape(-1, self.dimension)
+        if snapshot is None or not snapshot.ntotal or not len(queries):
+            return [[] for _ in range(len(queries))]
         
-        print(f"\nPerforming {'code' if use_code_embedding else 'title'} search...")
-        print(f"Total embeddings in index: {index.ntotal}")
+        logging.debug("Performing %s search for %d queries over %d embeddings",
+                      "code" if use_code_embedding else "title", len(queries), snapshot.ntotal)
         
-        # Normalize the query vector
-        query_array = np.array(query_vector, dtype=np.float32)
-        norm = np.linalg.norm(query_array)
-        if norm > 0:
-            query_array = query_array / norm
-        else:
+        # Normalize the query vectors
+        norms = np.linalg.norm(queries, axis=1)
+        if not norms.all():
             logging.warning("Received zero vector as query")
+        queries[norms > 0] /= norms[norms > 0, None]
         
-        query_array = np.expand_dims(query_array, axis=0)
-        
-        # Search
-        D, I = index.search(query_array, k * 3)  # Search for more results to account for duplicates
-        
-        # Format results with deduplication
-        results_dict = {}
-        for distance, idx in zip(D[0], I[0]):
-            if idx < len(course_ids):
-                course_id = course_ids[idx]
-                # Keep the highest similarity score for each course
-                if course_id not in results_dict or distance > results_dict[course_id]['similarity']:
-                    results_dict[course_id] = {
-                        'id': course_id,
-                        'similarity': float(distance)
-                    }
-                    print(f"Course {course_id}: similarity = {distance:.4f}")
-        
-        # Convert to list and sort by similarity
-        results = list(results_dict.values())
-        results.sort(key=lambda x: x['similarity'], reverse=True)
-        
-        print(f"\nFound {len(results)} unique courses after deduplication")
+        # Search for more results than needed since a course can have several vectors,
+        # and keep widening the search for the queries that have fewer than k unique courses
+        # until they do or the index is exhausted.
+        # Quantized indexes fetch extra candidates and re-rank them with exact scores
+        ntotal = snapshot.ntotal
+        fetch = min(k * 3 * (Settings.RERANK_OVERFETCH if snapshot.reranked else 1), ntotal)
+        hits = [None] * len(queries)
+        remaining = np.arange(len(queries))
+        search_time = dedup_time = 0.0
+        while len(remaining):
+            start = time.perf_counter()
+            D, I = snapshot.search(queries[remaining], fetch)
+            search_time += time.perf_counter() - start
+            start = time.perf_counter()
+            short = []
+            for row, query_number in enumerate(remaining):
+                hits[query_number] = snapshot.best_per_course(D[row], I[row])
+                if len(hits[query_number][0]) < k:
+                    short.append(query_number)
+            dedup_time += time.perf_counter() - start
+            if fetch >= ntotal:
+                break
+            remaining = np.asarray(short, dtype=np.int64)
+            fetch = min(fetch * 4, ntotal)
+        search_stage_seconds.observe(search_time, stage="index_search")
+        search_stage_seconds.observe(dedup_time, stage="dedup")
         
-        # Return only the top k results
-        return results[:k]
+        # Return only the top k results of each query
+        return [
+            [
+                {'id': snapshot.course_table[ordinal], 'similarity': float(similarity)}
+                for ordinal, similarity in zip(ordinals[:k], similarities[:k])
+            ]
+            for ordinals, similarities in hits
+        ]
 
 # Create singleton instance
 vector_search = VectorSearchManager()
\ No newline at end of file
@@ -0,0 +1,57 @@
+import asyncio
+import os
+
+# the settings are read once at import, these keep backend importable without a .env
+os.environ.setdefault("SECRET_KEY", "test")
+os.environ.setdefault("CATALOG_WATCH_ENABLED", "false")
+
+import pytest
+from bson import ObjectId
+from mongomock_motor import AsyncMongoMockClient
+
+from backend.benchmarks.suite import FakeEmbeddingProvider
+from backend.config import Settings
+from backend.index_artifacts import ArtifactStore
+from backend.vector_search import VectorSearchManager
+
+# titles share no words, so the fake provider puts every course far from the others
+COURSES = [
+    ("Introduction to Programming", "COMP SCI 200"),
+    ("Organic Chemistry", "CHEM 343"),
+    ("Linear Algebra", "MATH 340"),
+    ("Microeconomic Theory", "ECON 301"),
+    ("Cellular Biology", "BIOLOGY 151"),
+    ("Renaissance Art History", "ART HIST 202"),
+    ("Thermodynamics", "M E 361"),
+    ("Statistical Inference", "STAT 312"),
+]
+
+@pytest.fixture
+def provider():
+    return FakeEmbeddingProvider(dimension=64)
+
+@pytest.fixture
+def courses():
+    return [
+        {"_id": ObjectId(), "title": title, "course_designation": designation, "credits": 3}
+        for title, designation in COURSES
+    ]
+
+@pytest.fixture
+def course_collection(courses):
+    collection = AsyncMongoMockClient().uwmatch.courses
+    asyncio.run(collection.insert_many([dict(course) for course in courses]))
+    return collection
+
+@pytest.fixture
+def make_manager(provider, tmp_path, monkeypatch):
+    """Managers sharing one artifact store, like the workers of a deployment."""
+    monkeypatch.setattr(Settings, "INDEX_CACHE_FLUSH_DELAY", 0)
+
+    def make(index_type: str = "flat") -> VectorSearchManager:
+        manager = VectorSearchManager(provider)
+        manager.store = ArtifactStore(str(tmp_path / "index_artifacts"), keep=2)
+        manager.title_index_type = manager.code_index_type = index_type
+        return manager
+
+    return make
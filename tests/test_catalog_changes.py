@@ -0,0 +1,173 @@
+"""
+Catalog change stream events applied to the vector indexes, searched before the
+change is published, after it is published and from a worker that loads it.
+"""
+import asyncio
+import itertools
+
+import pytest
+from bson import ObjectId, Timestamp
+
+INDEX_TYPES = ["flat", "hnsw", "ivf_flat", "sq8"]
+
+# the fake provider scores a course 1 for its own title and about 0 for titles sharing no words
+MATCH_SIMILARITY = 0.5
+
+_cluster_times = itertools.count(1)
+
+def change(operation: str, course: dict, **fields) -> dict:
+    """A change stream event like catalog_watcher hands out, full document looked up."""
+    event = {
+        "operationType": operation,
+        "documentKey": {"_id": course["_id"]},
+        "clusterTime": Timestamp(1700000000, next(_cluster_times)),
+        **fields,
+    }
+    if operation != "delete":
+        event["fullDocument"] = course
+    return event
+
+async def found(manager, text: str, use_code_embedding: bool = False) -> list:
+    """Ids of the courses matching text."""
+    [query] = await manager.provider.embed_texts([text])
+    results = await manager.search(query.tolist(), k=3, use_code_embedding=use_code_embedding)
+    return [result["id"] for result in results if result["similarity"] > MATCH_SIMILARITY]
+
+async def build(manager, course_collection) -> None:
+    for use_code_embedding in (False, True):
+        await manager.build_index(course_collection, use_code_embedding, use_cache=False)
+
+async def publish(manager) -> None:
+    if manager._flush_task is not None:
+        await manager._flush_task
+
+async def reader(make_manager, index_type: str):
+    """Another worker, loading the published versions."""
+    manager = make_manager(index_type)
+    for use_code_embedding in (False, True):
+        assert await manager._load_artifact(use_code_embedding)
+    return manager
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_insert(index_type, make_manager, course_collection):
+    async def main():
+        manager = make_manager(index_type)
+        await build(manager, course_collection)
+        course = {"_id": ObjectId(), "title": "Quantum Basket Weaving", "course_designation": "WEAVING 101"}
+        assert str(course["_id"]) not in await found(manager, course["title"])
+
+        await manager.apply_change(change("insert", course))
+        assert await found(manager, course["title"]) == [str(course["_id"])]
+        assert await found(manager, "WEAVING 101", True) == [str(course["_id"])]
+
+        await publish(manager)
+        assert manager.snapshots["title"].delta is None
+        assert await found(manager, course["title"]) == [str(course["_id"])]
+        other = await reader(make_manager, index_type)
+        assert await found(other, course["title"]) == [str(course["_id"])]
+        assert await found(other, "WEAVING 101", True) == [str(course["_id"])]
+
+    asyncio.run(main())
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_replace(index_type, make_manager, course_collection, courses):
+    async def main():
+        manager = make_manager(index_type)
+        await build(manager, course_collection)
+        course = courses[1]
+        assert await found(manager, "Organic Chemistry") == [str(course["_id"])]
+
+        replaced = {**course, "title": "Medieval Poetry", "course_designation": "LITTRANS 231"}
+        await manager.apply_change(change("replace", replaced))
+        for searcher in (manager, None):
+            if searcher is None:
+                await publish(manager)
+                searcher = await reader(make_manager, index_type)
+            assert await found(searcher, "Medieval Poetry") == [str(course["_id"])]
+            assert str(course["_id"]) not in await found(searcher, "Organic Chemistry")
+            assert await found(searcher, "LITTRANS 231", True) == [str(course["_id"])]
+            assert str(course["_id"]) not in await found(searcher, "CHEM 343", True)
+        # the replaced vectors are compacted away on publish
+        assert manager.status()["title"]["tombstones"] == 0
+        assert manager.status()["title"]["vectors"] == len(courses)
+
+    asyncio.run(main())
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_update(index_type, make_manager, course_collection, courses):
+    async def main():
+        manager = make_manager(index_type)
+        await build(manager, course_collection)
+        course = courses[2]
+
+        updated = {**course, "title": "Abstract Topology"}
+        await manager.apply_change(change("update", updated, updateDescription={
+            "updatedFields": {"title": updated["title"]}, "removedFields": [],
+        }))
+        assert await found(manager, "Abstract Topology") == [str(course["_id"])]
+
+        await publish(manager)
+        other = await reader(make_manager, index_type)
+        assert await found(other, "Abstract Topology") == [str(course["_id"])]
+        assert str(course["_id"]) not in await found(other, "Linear Algebra")
+        assert await found(other, "MATH 340", True) == [str(course["_id"])]
+
+    asyncio.run(main())
+
+def test_update_of_other_fields_is_ignored(make_manager, course_collection, courses):
+    async def main():
+        manager = make_manager()
+        await build(manager, course_collection)
+        versions = {index_type: manager.snapshots[index_type].artifact_version for index_type in ("title", "code")}
+
+        await manager.apply_change(change("update", {**courses[3], "credits": 4}, updateDescription={
+            "updatedFields": {"credits": 4}, "removedFields": [],
+        }))
+        assert manager._flush_task is None
+        assert await found(manager, "Microeconomic Theory") == [str(courses[3]["_id"])]
+        assert {index_type: manager.snapshots[index_type].artifact_version for index_type in versions} == versions
+
+    asyncio.run(main())
+
+@pytest.mark.parametrize("index_type", INDEX_TYPES)
+def test_delete(index_type, make_manager, course_collection, courses):
+    async def main():
+        manager = make_manager(index_type)
+        await build(manager, course_collection)
+        course = courses[4]
+        assert await found(manager, "Cellular Biology") == [str(course["_id"])]
+
+        await manager.apply_change(change("delete", course))
+        assert str(course["_id"]) not in await found(manager, "Cellular Biology")
+        assert str(course["_id"]) not in await found(manager, "BIOLOGY 151", True)
+        assert manager.status()["title"]["tombstones"] == 1
+
+        await publish(manager)
+        assert manager.status()["title"]["vectors"] == len(courses) - 1
+        assert manager.status()["title"]["tombstones"] == 0
+        other = await reader(make_manager, index_type)
+        assert str(course["_id"]) not in await found(other, "Cellular Biology")
+        assert str(course["_id"]) not in await found(other, "BIOLOGY 151", True)
+        # the rest of the catalog is still found where it was
+        assert await found(other, "Thermodynamics") == [str(courses[6]["_id"])]
+
+    asyncio.run(main())
+
+def test_changes_in_a_burst_are_published_once(make_manager, course_collection, courses):
+    async def main():
+        manager = make_manager()
+        await build(manager, course_collection)
+        version = manager.snapshots["title"].artifact_version
+
+        await manager.apply_change(change("delete", courses[0]))
+        await manager.apply_change(change("replace", {**courses[5], "title": "Baroque Music"}))
+        await publish(manager)
+        assert manager.snapshots["title"].artifact_version != version
+        assert manager.store.current_version("title") == manager.snapshots["title"].artifact_version
+        assert manager.snapshots["title"].delta is None
+
+        other = await reader(make_manager, "flat")
+        assert str(courses[0]["_id"]) not in await found(other, "Introduction to Programming")
+        assert await found(other, "Baroque Music") == [str(courses[5]["_id"])]
+
+    asyncio.run(main())
@@ -0,0 +1,230 @@
+"""
+CatalogWatcher against a stand-in change stream, and against a real MongoDB when
+MONGODB_TEST_URI is set: a replica set for the change stream and its resume, a
+standalone server for the fallback when change streams are unsupported, e.g.
+
+    MONGODB_TEST_URI="mongodb://localhost:27017/?replicaSet=rs0" python -m pytest tests/test_catalog_watcher.py
+"""
+import asyncio
+import os
+import time
+
+import pytest
+from bson import ObjectId
+from pymongo import MongoClient
+from pymongo.errors import OperationFailure, PyMongoError
+
+from backend.catalog_watcher import CHANGE_STREAMS_UNSUPPORTED, CatalogWatcher
+
+class FakeStream:
+    def __init__(self, events):
+        self._events = iter(events)
+        self.resume_token = None
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        return False
+
+    def __aiter__(self):
+        return self
+
+    async def __anext__(self):
+        for event in self._events:
+            self.resume_token = {"_data": event["_id"]}
+            return event
+        # an open stream waits for the next change
+        await asyncio.Event().wait()
+
+class FakeCollection:
+    """The watch() of a Motor collection, serving a list of events or failing with error."""
+
+    def __init__(self, events=(), error: PyMongoError = None):
+        self.events = list(events)
+        self.error = error
+        # resume_after of every watch() call
+        self.resumed_after = []
+
+    def watch(self, pipeline, full_document=None, resume_after=None):
+        self.resumed_after.append(resume_after)
+        if self.error is not None:
+            raise self.error
+        # a resumed stream only sees the events after its token
+        events = self.events
+        if resume_after is not None:
+            events = events[[event["_id"] for event in events].index(resume_after["_data"]) + 1:]
+        return FakeStream(events)
+
+def event(operation: str, course_id: ObjectId, token: str) -> dict:
+    return {"_id": token, "operationType": operation, "documentKey": {"_id": course_id}}
+
+async def settle() -> None:
+    # lets the watcher task run until it waits on its stream
+    for _ in range(10):
+        await asyncio.sleep(0)
+
+def test_dispatches_every_event_to_every_handler():
+    async def main():
+        events = [event("insert", ObjectId(), "1"), event("delete", ObjectId(), "2")]
+        received, awaited = [], []
+
+        def failing(change):
+            raise RuntimeError("handler bug")
+
+        async def handler(change):
+            awaited.append(change)
+
+        watcher = CatalogWatcher()
+        # a failing handler doesn't keep the change from the others
+        watcher.subscribe(failing)
+        watcher.subscribe(received.append)
+        # subscribing twice doesn't deliver twice
+        watcher.subscribe(handler)
+        watcher.subscribe(handler)
+        watcher.start(FakeCollection(events))
+        await settle()
+        assert watcher.running
+        await watcher.stop()
+        assert received == events
+        assert awaited == events
+
+    asyncio.run(main())
+
+def test_resumes_after_the_last_event():
+    async def main():
+        collection = FakeCollection([event("insert", ObjectId(), "1")])
+        received = []
+        watcher = CatalogWatcher()
+        watcher.subscribe(received.append)
+        watcher.start(collection)
+        await settle()
+        await watcher.stop()
+
+        # changes while the watcher was stopped are picked up when it starts again
+        collection.events.append(event("update", ObjectId(), "2"))
+        watcher.start(collection)
+        await settle()
+        await watcher.stop()
+        assert collection.resumed_after == [None, {"_data": "1"}]
+        assert [change["_id"] for change in received] == ["1", "2"]
+
+    asyncio.run(main())
+
+def test_gives_up_without_change_streams():
+    async def main():
+        collection = FakeCollection(error=OperationFailure(
+            "The $changeStream stage is only supported on replica sets", code=CHANGE_STREAMS_UNSUPPORTED
+        ))
+        watcher = CatalogWatcher()
+        watcher.start(collection)
+        await asyncio.wait_for(watcher._task, timeout=1)
+        assert not watcher.running
+        assert collection.resumed_after == [None]
+
+    asyncio.run(main())
+
+@pytest.fixture
+def mongodb():
+    """The URI and hello reply of the test server."""
+    uri = os.getenv("MONGODB_TEST_URI")
+    if not uri:
+        pytest.skip("MONGODB_TEST_URI is not set")
+    client = MongoClient(uri, serverSelectionTimeoutMS=2000)
+    try:
+        hello = client.admin.command("hello")
+    except PyMongoError as e:
+        pytest.skip(f"MongoDB at MONGODB_TEST_URI is not reachable: {e}")
+    finally:
+        client.close()
+    return uri, hello
+
+@pytest.fixture
+def test_database(mongodb):
+    """The name of a scratch database, dropped afterwards."""
+    uri, _ = mongodb
+    name = f"uwmatch_test_{ObjectId()}"
+    yield name
+    client = MongoClient(uri)
+    client.drop_database(name)
+    client.close()
+
+async def eventually(probe, expected, timeout: float = 10) -> None:
+    """Wait until the coroutine function probe returns expected."""
+    deadline = time.monotonic() + timeout
+    while await probe() != expected:
+        assert time.monotonic() < deadline, "timed out waiting for the change"
+        await asyncio.sleep(0.1)
+
+def test_replica_set_changes_reach_the_indexes(mongodb, test_database, make_manager, courses):
+    uri, hello = mongodb
+    if "setName" not in hello:
+        pytest.skip("MONGODB_TEST_URI is not a replica set")
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def main():
+        client = AsyncIOMotorClient(uri)
+        course_collection = client[test_database].courses
+        await course_collection.insert_many([dict(course) for course in courses])
+        manager = make_manager()
+        for use_code_embedding in (False, True):
+            await manager.build_index(course_collection, use_code_embedding, use_cache=False)
+
+        async def matches(title: str) -> list:
+            [query] = await manager.provider.embed_texts([title])
+            results = await manager.search(query.tolist(), k=3)
+            return [result["id"] for result in results if result["similarity"] > 0.5]
+
+        watcher = CatalogWatcher()
+        seen = []
+        watcher.subscribe(seen.append)
+        watcher.subscribe(manager.apply_change)
+        watcher.start(course_collection)
+        try:
+            # the stream only sees changes made after it opened, touch a course until one arrives
+            async def watching():
+                await course_collection.update_one({"_id": courses[0]["_id"]}, {"$inc": {"credits": 1}})
+                return bool(seen)
+            await eventually(watching, True)
+
+            course_id = ObjectId()
+            await course_collection.insert_one({"_id": course_id, "title": "Quantum Basket Weaving"})
+            await eventually(lambda: matches("Quantum Basket Weaving"), [str(course_id)])
+
+            await course_collection.update_one({"_id": course_id}, {"$set": {"title": "Medieval Poetry"}})
+            await eventually(lambda: matches("Medieval Poetry"), [str(course_id)])
+            assert str(course_id) not in await matches("Quantum Basket Weaving")
+
+            await course_collection.delete_one({"_id": courses[1]["_id"]})
+            await eventually(lambda: matches("Organic Chemistry"), [])
+
+            # a change made while nobody watched arrives once the watcher resumes
+            await watcher.stop()
+            await course_collection.replace_one({"_id": courses[2]["_id"]}, {"title": "Abstract Topology"})
+            watcher.start(course_collection)
+            await eventually(lambda: matches("Abstract Topology"), [str(courses[2]["_id"])])
+        finally:
+            await watcher.stop()
+            client.close()
+
+    asyncio.run(main())
+
+def test_standalone_server_is_not_watched(mongodb, test_database):
+    uri, hello = mongodb
+    if "setName" in hello:
+        pytest.skip("MONGODB_TEST_URI is a replica set")
+    from motor.motor_asyncio import AsyncIOMotorClient
+
+    async def main():
+        client = AsyncIOMotorClient(uri)
+        watcher = CatalogWatcher()
+        watcher.start(client[test_database].courses)
+        try:
+            # the watcher stops by itself, catalog changes then wait for the next rebuild
+            await asyncio.wait_for(watcher._task, timeout=10)
+            assert not watcher.running
+        finally:
+            await watcher.stop()
+            client.close()
+
+    asyncio.run(main())